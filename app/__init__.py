@@ -1,30 +1,46 @@
 # app/__init__.py
+#
+# Importing this package (or any module under it) stays cheap: extensions,
+# blueprints and CLI groups are imported inside create_app(), and the
+# module-level `app` is only built on first access (see __getattr__ below).
 import os
+import sys
 from flask import Flask, redirect, request, jsonify
-from flask_cors import CORS
-from flask_migrate import Migrate
-from flask_wtf.csrf import generate_csrf
-from flask_login import LoginManager
-from flask_apscheduler import APScheduler
-from flask_socketio import SocketIO
-
-from .models import db, User
-from .api.user_routes import user_routes
-from .api.auth_routes import auth_routes
-from .api.stock_routes import stock_routes
-from .api.portfolio_routes import portfolio_routes
-from .api.order_routes import order_routes
-from .api.watchlist_routes import watchlist_routes
-from .config import Config
-from .seeds import seed_commands  # CLI seed commands
-
-def create_app():
+
+def create_app(role=None):
+    """
+    role (or APP_ROLE) picks what the process runs:
+      - web:    HTTP and Socket.IO only (default)
+      - all:    web plus the background worker, for single-process setups
+    The background worker on its own runs via `flask worker`.
+    """
+    from flask_cors import CORS
+    from flask_wtf.csrf import generate_csrf
+    from flask_login import LoginManager
+    from flask_socketio import SocketIO
+
+    from .models import db, User
+    from .api.user_routes import user_routes
+    from .api.auth_routes import auth_routes
+    from .api.stock_routes import stock_routes
+    from .api.portfolio_routes import portfolio_routes
+    from .api.order_routes import order_routes
+    from .api.watchlist_routes import watchlist_routes
+    from .config import Config
+    from .seeds import seed_commands  # CLI seed commands
+    from .bench import bench_commands  # CLI benchmarks
+    from .feed import feed_commands  # local Finnhub stand-in
+
+    role = role or os.environ.get('APP_ROLE', 'web')
     app = Flask(__name__, static_folder='../react-vite/dist', static_url_path='/')
     app.config.from_object(Config)
 
     # Initialize extensions
     db.init_app(app)
-    Migrate(app, db)
+    # Flask-Migrate pulls in Alembic, which only the `flask db` commands need.
+    if os.environ.get('FLASK_RUN_FROM_CLI'):
+        from flask_migrate import Migrate
+        Migrate(app, db)
     CORS(app)
     
     # Flask-Login
@@ -41,14 +57,25 @@ def create_app():
     app.register_blueprint(stock_routes, url_prefix='/api/stocks')
     app.register_blueprint(order_routes, url_prefix='/api/orders')
     app.register_blueprint(watchlist_routes, url_prefix='/api/watchlists')
+
+    # Opt-in request metrics (REQUEST_METRICS=1), served at /api/metrics.
+    if os.environ.get('REQUEST_METRICS') == '1':
+        from .services.request_metrics import init_request_metrics
+        from .api.metrics_routes import metrics_routes
+        init_request_metrics(app)
+        app.register_blueprint(metrics_routes, url_prefix='/api/metrics')
     
     # Add CLI commands (e.g., for seeding)
     app.cli.add_command(seed_commands)
+    app.cli.add_command(bench_commands)
+    app.cli.add_command(feed_commands)
     
-    # Setup APScheduler for scheduled tasks
-    scheduler = APScheduler()
-    scheduler.init_app(app)
-    scheduler.start()
+    # `flask worker`; app.worker is only imported when the command runs.
+    @app.cli.command('worker')
+    def worker():
+        """Run the scheduler, price feed and order execution."""
+        from .worker import run_worker
+        run_worker(app)
     
     @app.before_request
     def https_redirect():
@@ -95,19 +122,40 @@ def create_app():
         return app.send_static_file('index.html')
     
     # Initialize Flask-SocketIO and store on app.config for global access.
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent')
+    # Under the gevent gunicorn worker gevent is already loaded; elsewhere
+    # (CLI commands, `flask run`) threading mode avoids importing it.
+    async_mode = os.environ.get('SOCKETIO_ASYNC_MODE') or ('gevent' if 'gevent' in sys.modules else 'threading')
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode=async_mode)
     app.config['socketio'] = socketio
+    from .services.live_updates import register_socket_handlers, subscribe_price_updates
+    register_socket_handlers(socketio)
+    # Price batches arrive through the broker (BROKER_URL), whichever process holds the feed.
+    subscribe_price_updates(socketio)
     
-    # Start global Finnhub WebSocket thread if FINNHUB_API_KEY is set.
-    if os.environ.get("FINNHUB_API_KEY"):
-        from .services.finnhub_ws import run_finnhub_ws
+    # Scheduler, price feed and order execution run in the worker. With
+    # role=all every process starts one, but only the holder of the worker
+    # lock runs it; the others wait on standby to take over.
+    if role == 'all':
+        from .worker import run_worker
         import threading
-        ws_thread = threading.Thread(target=run_finnhub_ws, args=(app,), daemon=True)
-        ws_thread.start()
+        worker_thread = threading.Thread(target=run_worker, args=(app,), daemon=True)
+        worker_thread.start()
+    else:
+        # The worker is another process (this covers `flask worker` itself,
+        # which builds its app here); an in-process broker cannot reach it.
+        from .services.broker import warn_if_process_local
+        warn_if_process_local()
     
     return app
 
-app = create_app()
+
+def __getattr__(name):
+    # `app` is created on first access, e.g. by gunicorn (app:app), the
+    # flask CLI (FLASK_APP=app) or `from app import app`.
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # To run the server:
 #   from app import app; from flask_socketio import SocketIO; app.config['socketio'].run(app, debug=True)
@@ -0,0 +1,60 @@
+import hashlib
+from flask import make_response, request
+from sqlalchemy import func
+from app.models import Stock, db
+from app.services.price_cache import price_cache
+
+# Every cached read is per user (or, like stock details, writes the session
+# and sends its cookie): keep it out of shared caches and revalidate on
+# every use.
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def etag(version):
+    """
+    Opaque ETag for a version tuple. The query string is part of it, since
+    projections change the body but not the data.
+    """
+    return hashlib.sha1(repr((request.query_string, version)).encode()).hexdigest()[:27]
+
+
+def cache_seqs(stock_ids):
+    """
+    Price cache sequence numbers of the stocks' live prices (0 when the
+    cache has none), so a price that has not been flushed yet, or an entry
+    that expired, still changes the version.
+    """
+    entries = (price_cache.get(stock_id) for stock_id in stock_ids)
+    return tuple(entry.seq if entry else 0 for entry in entries)
+
+
+def stocks_version(stock_ids):
+    """
+    Version of the serialized stocks: one aggregate query plus their
+    cache sequence numbers.
+    """
+    if not stock_ids:
+        return ()
+    row = (
+        db.session.query(func.count(Stock.id), func.max(Stock.last_updated), func.max(Stock.updated_at))
+        .filter(Stock.id.in_(stock_ids))
+        .one()
+    )
+    return tuple(row) + cache_seqs(sorted(stock_ids))
+
+
+def conditional(version, build, cache_control):
+    """
+    Answer with 304 and no body if If-None-Match has the ETag of
+    `version`; otherwise with whatever `build()` returns. Both carry the
+    ETag and Cache-Control.
+    """
+    tag = etag(version)
+    if request.if_none_match.contains_weak(tag):
+        response = make_response("", 304)
+    else:
+        response = make_response(build())
+    # Weak: the same data may be encoded differently (e.g. compressed).
+    response.set_etag(tag, weak=True)
+    response.headers["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,13 @@
+from flask import Blueprint, Response
+from app.services.metrics import registry
+
+metrics_routes = Blueprint('metrics', __name__)
+
+
+@metrics_routes.route('')
+def get_metrics():
+    """
+    Request latency, SQL and payload metrics for this process, in the
+    Prometheus text format. Only registered when REQUEST_METRICS=1.
+    """
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
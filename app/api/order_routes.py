@@ -1,9 +1,10 @@
-from decimal import Decimal
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from datetime import datetime
-from app.models import Order, Portfolio, db, OrderTypeEnum, OrderStatusEnum, Holding, Stock
-from app.jobs.is_market_open import is_market_open_now
+from app.models import Order, Portfolio, db, OrderStatusEnum
+from app.services.order_book import order_book
+from app.services.order_execution import place_order, OrderRejected, OrderConflict
+from app.api.query_params import order_history_page
 
 order_routes = Blueprint('orders', __name__)
 
@@ -40,86 +41,33 @@ def create_order():
             errors["scheduled_time"] = "Invalid scheduled_time format. Must be ISO 8601."
             return jsonify({"message": "Validation error", "errors": errors}), 400
 
-    # Create the order with initial pending status.
-    order = Order(
-        portfolio_id=data["portfolio_id"],
-        stock_id=data["stock_id"],
-        order_type=OrderTypeEnum(data["order_type"]),
-        quantity=data["quantity"],
-        target_price=data.get("target_price"),
-        scheduled_time=scheduled_time,
-        status=OrderStatusEnum.pending,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
-    )
-    db.session.add(order)
-
-    # Determine if this is an immediate order:
-    immediate = (data.get("target_price") is None) and (scheduled_time is None)
-    if immediate:
-        # Check if the market is open.
-        if not is_market_open_now():
-            return jsonify({"message": "Market is closed. Order not executed."}), 400
-
-        # Retrieve the current stock data.
-        stock_obj = Stock.query.get(data["stock_id"])
-        if not stock_obj:
-            return jsonify({"message": "Stock not found"}), 404
-
-        fill_price = stock_obj.market_price  # Use current market price
-
-        # Use Decimal arithmetic for accuracy.
-        quantity_decimal = Decimal(str(data["quantity"]))
-        fill_price_decimal = Decimal(str(fill_price))
-        cost = quantity_decimal * fill_price_decimal
-        now = datetime.utcnow()
-
-        if data["order_type"] == "buy":
-            # Check if the portfolio has enough funds.
-            if portfolio.portfolio_balance < cost:
-                return jsonify({"message": "Insufficient funds in portfolio"}), 400
-
-            # Execute order.
-            order.status = OrderStatusEnum.executed
-            order.executed_price = fill_price
-            order.executed_at = now
-
-            # **Deduct funds from the portfolio balance only**
-            portfolio.portfolio_balance -= cost
-
-            # Update holdings.
-            holding = Holding.query.filter_by(
-                portfolio_id=portfolio.id, stock_id=data["stock_id"]
-            ).first()
-            if holding:
-                holding.quantity += quantity_decimal
-            else:
-                new_holding = Holding(
-                    portfolio_id=portfolio.id,
-                    stock_id=data["stock_id"],
-                    quantity=quantity_decimal,
-                    created_at=now,
-                    updated_at=now
-                )
-                db.session.add(new_holding)
-        elif data["order_type"] == "sell":
-            holding = Holding.query.filter_by(
-                portfolio_id=portfolio.id, stock_id=data["stock_id"]
-            ).first()
-            if not holding or holding.quantity < quantity_decimal:
-                return jsonify({"message": "Not enough shares to sell"}), 400
-
-            order.status = OrderStatusEnum.executed
-            order.executed_price = fill_price
-            order.executed_at = now
-
-            proceeds = quantity_decimal * fill_price_decimal
-            portfolio.portfolio_balance += proceeds
-            holding.quantity -= quantity_decimal
-        else:
-            return jsonify({"message": "Invalid order type"}), 400
+    # Optional idempotency key (header or body): retries of the same
+    # request return the order created the first time.
+    idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+    if idempotency_key and len(idempotency_key) > 64:
+        errors["idempotency_key"] = "Idempotency key must be at most 64 characters."
+        return jsonify({"message": "Validation error", "errors": errors}), 400
 
-    db.session.commit()
+    # Immediate orders (no target_price and no scheduled_time) execute at the
+    # market price with the portfolio and holding rows locked.
+    try:
+        order, replayed = place_order(
+            portfolio_id=portfolio.id,
+            stock_id=data["stock_id"],
+            order_type=data["order_type"],
+            quantity=data["quantity"],
+            target_price=data.get("target_price"),
+            scheduled_time=scheduled_time,
+            idempotency_key=idempotency_key,
+        )
+    except OrderRejected as e:
+        return jsonify({"message": e.message}), e.status
+    except OrderConflict:
+        return jsonify({"message": "Order conflicted with a concurrent update, please retry"}), 409
+
+    if replayed:
+        return jsonify({"order": order.to_dict()}), 200, {"Idempotent-Replayed": "true"}
+    order_book.upsert(order)
     return jsonify({"order": order.to_dict()}), 201
 
 
@@ -143,8 +91,9 @@ def update_order(order_id):
       - Status Code: 404
       - Body: { "message": "Order not found or cannot be updated" }
     """
-    order = Order.query.get(order_id)
-    if not order:
+    # Lock the row so a concurrent fill cannot execute it mid-update.
+    order = Order.query.filter_by(id=order_id).with_for_update().first()
+    if not order or order.status != OrderStatusEnum.pending:
         return jsonify({"message": "Order not found or cannot be updated"}), 404
 
     # Ensure the order belongs to a portfolio owned by the current user.
@@ -170,6 +119,7 @@ def update_order(order_id):
 
     order.updated_at = datetime.utcnow()
     db.session.commit()
+    order_book.upsert(order)
 
     return jsonify({"order": order.to_dict()}), 200
 
@@ -177,16 +127,20 @@ def update_order(order_id):
 @order_routes.route('/<int:order_id>', methods=['DELETE'])
 @login_required
 def delete_order(order_id):
-    order = Order.query.get(order_id)
+    order = Order.query.filter_by(id=order_id).with_for_update().first()
     if not order:
         return jsonify({"message": "Order not found"}), 404
 
     if order.portfolio.user_id != current_user.id:
         return jsonify({"message": "Forbidden"}), 403
 
+    if order.status == OrderStatusEnum.executed:
+        return jsonify({"message": "Executed orders cannot be cancelled"}), 400
+
     order.deleted_at = datetime.utcnow()
     order.status = OrderStatusEnum.cancelled  # updated to set status to cancelled
     db.session.commit()
+    order_book.remove(order.id)
 
     return jsonify({
          "order": order.to_dict(),
@@ -197,8 +151,20 @@ def delete_order(order_id):
 @order_routes.route('', methods=['GET'])
 @login_required
 def get_all_orders_for_user():
+    """
+    Lists the current user's orders, newest first.
+    Optional query parameters: status, ticker, from, to, limit, cursor.
+    When paginating, the cursor for the next page is returned in the
+    X-Next-Cursor header.
+    """
     user_id = current_user.id
     # Query for all orders from all portfolios belonging to this user
-    orders = Order.query.join(Portfolio).filter(Portfolio.user_id == user_id).all()
-    
-    return jsonify([order.to_dict() for order in orders])
+    query = Order.query.join(Portfolio).filter(Portfolio.user_id == user_id)
+    orders, next_cursor, errors = order_history_page(query)
+    if errors:
+        return jsonify({"message": "Validation error", "errors": errors}), 400
+
+    response = jsonify([order.to_dict() for order in orders])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
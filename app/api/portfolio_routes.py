@@ -1,16 +1,37 @@
 from flask import Blueprint, jsonify, request
-from decimal import Decimal
 from flask_login import login_required, current_user
 from datetime import datetime
-from app.models import Portfolio, User, Holding, Order, db
+from app.models import Portfolio, User, Holding, Order, OrderStatusEnum, db
+from app.services.valuation import holdings_values
+from app.services.money import from_cents, to_cents
+from app.api.query_params import portfolio_projection, portfolio_load_options, project, order_history_page
+from app.api.http_cache import conditional, stocks_version, PRIVATE_CACHE_CONTROL
+from sqlalchemy import case, func
 
 portfolio_routes = Blueprint('portfolios', __name__)
 
+
+def _amount_cents(value):
+    """
+    Parse a dollar amount from a request body into integer cents.
+    Returns None if it is not a non-negative number.
+    """
+    try:
+        cents = to_cents(value)
+    except (ArithmeticError, TypeError, ValueError):
+        return None
+    return cents if cents >= 0 else None
+
+
 @portfolio_routes.route('/', methods=['GET'])
 @login_required
 def get_portfolios():
     """
     Retrieve all portfolios associated with the current user.
+    Optional query parameters:
+      - view=summary: only id, name, portfolio_balance, portfolio_value, gains_loss
+      - fields=a,b: only these keys
+      - include=holdings,orders: which nested collections to embed (default: both)
     ---
     Successful Response:
       - Status Code: 200
@@ -38,41 +59,49 @@ def get_portfolios():
     if not current_user:
         return jsonify({"message": "User not found"}), 404
 
-    portfolios = Portfolio.query.filter_by(user_id=current_user.id).all()
-    return jsonify({"portfolios": [portfolio.to_dict() for portfolio in portfolios]}), 200
+    fields, include = portfolio_projection()
+    # Only load the relationships that will be serialized.
+    portfolios = Portfolio.query.options(*portfolio_load_options(include)).filter_by(user_id=current_user.id).all()
+    # Value every portfolio with one aggregate query instead of per-holding lookups.
+    values = holdings_values(user_id=current_user.id)
+    return jsonify({"portfolios": [
+        project(portfolio.to_dict(holdings_value=values.get(portfolio.id), include=include), fields)
+        for portfolio in portfolios
+    ]}), 200
 
 @portfolio_routes.route('/', methods=['POST'])
 @login_required
 def create_portfolio():
     data = request.get_json()
     name = data.get("name")
-    portfolio_balance = data.get("portfolio_balance", 0)
+    portfolio_balance = _amount_cents(data.get("portfolio_balance", 0))
 
     errors = {}
     if not name:
         errors["name"] = "Portfolio name is required"
-    if portfolio_balance < 0:
+    if portfolio_balance is None:
         errors["portfolio_balance"] = "Portfolio balance must be a non-negative number"
     if errors:
         return jsonify({"message": "Validation error", "errors": errors}), 400
 
     # Check if the user has enough total cash_balance to fund this portfolio:
-    if current_user.cash_balance < portfolio_balance:
+    cash_balance = to_cents(current_user.cash_balance or 0)
+    if cash_balance < portfolio_balance:
         return jsonify({"message": "Insufficient funds in user's cash balance"}), 400
 
     # Create the portfolio AND set initial_investment to match the amount funded:
     portfolio = Portfolio(
         user_id=current_user.id,
         name=name,
-        portfolio_balance=portfolio_balance,
-        initial_investment=portfolio_balance,  # <-- Set it here
+        portfolio_balance=from_cents(portfolio_balance),
+        initial_investment=from_cents(portfolio_balance),  # <-- Set it here
         created_at=datetime.utcnow(),
         updated_at=datetime.utcnow()
     )
     db.session.add(portfolio)
 
     # Deduct the funds from the user's overall cash balance
-    current_user.cash_balance -= portfolio_balance
+    current_user.cash_balance = from_cents(cash_balance - portfolio_balance)
     db.session.commit()
 
     return jsonify({"portfolio": portfolio.to_dict()}), 201
@@ -109,9 +138,13 @@ def update_portfolio(id):
     # Optional: Adjusting portfolio_balance might require additional logic,
     # such as transferring funds between portfolio and user's cash_balance.
     if "portfolio_balance" in data:
-        new_balance = data["portfolio_balance"]
+        new_balance = _amount_cents(data["portfolio_balance"])
+        if new_balance is None:
+            return jsonify({"message": "Validation error", "errors": {
+                "portfolio_balance": "Portfolio balance must be a non-negative number"
+            }}), 400
         # For simplicity, let's assume we're updating the portfolio_balance without transferring funds.
-        portfolio.portfolio_balance = new_balance
+        portfolio.portfolio_balance = from_cents(new_balance)
 
     portfolio.updated_at = datetime.utcnow()
     db.session.commit()
@@ -120,41 +153,6 @@ def update_portfolio(id):
 @portfolio_routes.route('/<int:id>', methods=['DELETE'])
 @login_required
 def delete_portfolio(id):
-    portfolio = Portfolio.query.get_or_404(id)
-    if portfolio.user_id != current_user.id:
-        return jsonify({"message": "Forbidden"}), 403
-
-    # Prevent deletion if there are active holdings
-    if portfolio.holdings and len(portfolio.holdings) > 0:
-        return jsonify({
-            "message": "Portfolio deletion error",
-            "errors": {
-                "holdings": "Please liquidate all holdings before deleting the portfolio."
-            }
-        }), 400
-
-    # Transfer remaining funds from portfolio back to user's cash_balance.
-    from decimal import Decimal
-    current_user.cash_balance = float(Decimal(str(current_user.cash_balance)) + portfolio.portfolio_balance)
-
-    db.session.delete(portfolio)
-    db.session.commit()
-    return jsonify({"message": "Portfolio deleted successfully"}), 200
-
-    portfolio = Portfolio.query.get_or_404(id)
-    if portfolio.user_id != current_user.id:
-        return jsonify({"message": "Forbidden"}), 403
-
-    # Convert current_user.cash_balance to Decimal and add portfolio.portfolio_balance,
-    # then convert back to float for storage (since SQLite doesn't support Decimal natively)
-    from decimal import Decimal
-    new_balance = Decimal(str(current_user.cash_balance)) + portfolio.portfolio_balance
-    current_user.cash_balance = float(new_balance)
-
-    db.session.delete(portfolio)
-    db.session.commit()
-    return jsonify({"message": "Portfolio deleted successfully"}), 200
-
     """
     Deletes an existing portfolio.
     Only allowed if the portfolio belongs to the current user.
@@ -172,8 +170,19 @@ def delete_portfolio(id):
     if portfolio.user_id != current_user.id:
         return jsonify({"message": "Forbidden"}), 403
 
-    # Transfer remaining funds back to user's cash_balance.
-    current_user.cash_balance = Decimal(str(current_user.cash_balance)) + portfolio.portfolio_balance
+    # Prevent deletion if there are active holdings
+    if portfolio.holdings and len(portfolio.holdings) > 0:
+        return jsonify({
+            "message": "Portfolio deletion error",
+            "errors": {
+                "holdings": "Please liquidate all holdings before deleting the portfolio."
+            }
+        }), 400
+
+    # Transfer remaining funds from portfolio back to user's cash_balance.
+    current_user.cash_balance = from_cents(
+        to_cents(current_user.cash_balance or 0) + to_cents(portfolio.portfolio_balance or 0)
+    )
 
     db.session.delete(portfolio)
     db.session.commit()
@@ -228,7 +237,9 @@ def get_holdings_for_portfolio(portfolio_id):
 @login_required
 def get_orders_for_portfolio(portfolio_id):
     """
-    Retrieves all orders for a given portfolio.
+    Retrieves all orders for a given portfolio, newest first.
+    Optional query parameters: status, ticker, from, to, limit, cursor.
+    When paginating, "next_cursor" holds the cursor for the next page.
     
     Successful Response:
       - Status Code: 200
@@ -263,18 +274,53 @@ def get_orders_for_portfolio(portfolio_id):
     if portfolio.user_id != current_user.id:
         return jsonify({"message": "Forbidden"}), 403
 
-    orders = portfolio.orders
-    if not orders:
+    orders, next_cursor, errors = order_history_page(Order.query.filter(Order.portfolio_id == portfolio.id))
+    if errors:
+        return jsonify({"message": "Validation error", "errors": errors}), 400
+    if not orders and not request.args:
         return jsonify({"message": "Orders not found for the portfolio"}), 404
 
-    return jsonify({"orders": [order.to_dict() for order in orders]}), 200
+    return jsonify({"orders": [order.to_dict() for order in orders], "next_cursor": next_cursor}), 200
 
 
 @portfolio_routes.route('/<int:id>', methods=['GET'])
 @login_required
 def get_portfolio(id):
-    portfolio = Portfolio.query.get_or_404(id)
+    """
+    Retrieve one portfolio. Accepts the same view/fields/include
+    parameters as the portfolio listing. Supports If-None-Match: the ETag
+    is checked with a few narrow queries before anything is loaded.
+    """
+    fields, include = portfolio_projection()
+    owner_id, row_version, updated_at = (
+        Portfolio.query.with_entities(Portfolio.user_id, Portfolio.version, Portfolio.updated_at)
+        .filter(Portfolio.id == id).first_or_404()
+    )
     # Ensure the portfolio belongs to the current user
-    if portfolio.user_id != current_user.id:
+    if owner_id != current_user.id:
         return jsonify({"message": "Forbidden"}), 403
-    return jsonify({"portfolio": portfolio.to_dict()}), 200
\ No newline at end of file
+
+    # Holdings are versioned rows; their stocks change with every price.
+    holdings = (
+        Holding.query.with_entities(Holding.id, Holding.version, Holding.stock_id)
+        .filter(Holding.portfolio_id == id).order_by(Holding.id).all()
+    )
+    etag_version = (id, row_version, updated_at, tuple(map(tuple, holdings)),
+                    stocks_version({stock_id for _, _, stock_id in holdings}))
+    if "orders" in include:
+        etag_version += tuple(
+            db.session.query(
+                func.count(Order.id), func.max(Order.updated_at),
+                func.sum(case((Order.status == OrderStatusEnum.pending, 1), else_=0)),
+            ).filter(Order.portfolio_id == id).one()
+        )
+
+    def build():
+        portfolio = Portfolio.query.options(*portfolio_load_options(include)).get_or_404(id)
+        # Without holdings in the response, value them with the aggregate query.
+        holdings_value = None
+        if "holdings" not in include:
+            holdings_value = holdings_values(portfolio_ids=[portfolio.id]).get(portfolio.id)
+        return jsonify({"portfolio": project(portfolio.to_dict(holdings_value=holdings_value, include=include), fields)}), 200
+
+    return conditional(etag_version, build, PRIVATE_CACHE_CONTROL)
\ No newline at end of file
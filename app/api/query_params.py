@@ -0,0 +1,147 @@
+import base64
+import binascii
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from app.models import Portfolio, Holding, Order, OrderStatusEnum, Stock
+
+# Relationships a portfolio response can embed.
+PORTFOLIO_RELATIONS = ("holdings", "orders")
+# What ?view=summary returns: enough to render a sidebar.
+PORTFOLIO_SUMMARY_FIELDS = ("id", "name", "portfolio_balance", "portfolio_value", "gains_loss")
+
+
+def list_arg(name):
+    """
+    Parses a comma-separated query parameter into a set, or None if absent.
+    """
+    raw = request.args.get(name)
+    if raw is None:
+        return None
+    return {part.strip() for part in raw.split(",") if part.strip()}
+
+
+def portfolio_projection():
+    """
+    Reads the projection parameters of a portfolio request.
+      - ?view=summary  -> id, name, cash, value and P&L only
+      - ?fields=a,b    -> only these top-level keys
+      - ?include=x,y   -> which of holdings/orders to embed
+    Without any of them the full portfolio (holdings and orders) is returned.
+    Returns (fields or None, include set).
+    """
+    fields = list_arg("fields")
+    if request.args.get("view") == "summary":
+        fields = set(PORTFOLIO_SUMMARY_FIELDS)
+
+    include = list_arg("include")
+    if include is None:
+        include = set(PORTFOLIO_RELATIONS) if fields is None else fields
+    include = {name for name in include if name in PORTFOLIO_RELATIONS}
+    if fields is not None:
+        fields = fields | include
+    return fields, include
+
+
+def portfolio_load_options(include):
+    """
+    Eager-loads exactly the relationships that will be serialized.
+    """
+    options = []
+    if "holdings" in include:
+        options.append(selectinload(Portfolio.holdings).joinedload(Holding.stock))
+    if "orders" in include:
+        options.append(selectinload(Portfolio.orders).joinedload(Order.stock))
+    return options
+
+
+def project(data, fields):
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
+
+
+# Largest page an order history request may ask for.
+MAX_ORDER_PAGE = 500
+
+
+def encode_cursor(order):
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), int(order_id)
+
+
+def order_history_page(query):
+    """
+    Applies the order history parameters to an Order query:
+      - status=pending,executed   filter by status
+      - ticker=AAPL               filter by stock ticker
+      - from=/to=                 ISO 8601 bounds on created_at
+      - limit=N&cursor=...        keyset pagination on (created_at, id), newest first
+    Filters and paging run in SQL and the stock is loaded in the same query.
+    Returns (orders, next_cursor, errors). Without limit/cursor every
+    matching order is returned and next_cursor is None.
+    """
+    errors = {}
+
+    statuses = list_arg("status")
+    if statuses:
+        try:
+            query = query.filter(Order.status.in_([OrderStatusEnum(s) for s in statuses]))
+        except ValueError:
+            errors["status"] = "Status must be one of pending, executed, cancelled."
+
+    ticker = request.args.get("ticker")
+    if ticker:
+        query = (
+            query.join(Stock, Stock.id == Order.stock_id)
+            .filter(Stock.ticker_symbol == ticker.upper())
+            .options(contains_eager(Order.stock))
+        )
+    else:
+        query = query.options(joinedload(Order.stock))
+
+    for name, compare in (("from", Order.created_at.__ge__), ("to", Order.created_at.__le__)):
+        if request.args.get(name):
+            try:
+                query = query.filter(compare(datetime.fromisoformat(request.args[name])))
+            except ValueError:
+                errors[name] = f"Invalid '{name}' format. Must be ISO 8601."
+
+    limit = request.args.get("limit")
+    cursor = request.args.get("cursor")
+    if limit is not None:
+        try:
+            limit = int(limit)
+            if not 1 <= limit <= MAX_ORDER_PAGE:
+                raise ValueError
+        except ValueError:
+            errors["limit"] = f"Limit must be an integer between 1 and {MAX_ORDER_PAGE}."
+    elif cursor:
+        limit = MAX_ORDER_PAGE
+    if cursor:
+        try:
+            created_at, order_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                Order.created_at < created_at,
+                and_(Order.created_at == created_at, Order.id < order_id),
+            ))
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            errors["cursor"] = "Invalid cursor."
+
+    if errors:
+        return None, None, errors
+
+    query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    if limit is None:
+        return query.all(), None, {}
+
+    # Fetch one extra row to learn whether there is a next page.
+    orders = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(orders[limit - 1]) if len(orders) > limit else None
+    return orders[:limit], next_cursor, {}
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify, session
-from sqlalchemy import or_
-from app.models import Stock, db
-from app.services.finnhub_api import finnhub_client 
+from sqlalchemy import or_, case
+from datetime import datetime
+from app.models import Stock, PriceBar, BAR_INTERVALS, db
+from app.services.stock_search import search_index, INDEX_ENABLED
+from app.api.http_cache import conditional, cache_seqs, stocks_version, PRIVATE_CACHE_CONTROL
 
 stock_routes = Blueprint('stocks', __name__)
 
@@ -10,8 +12,12 @@ def search_stocks():
     """
     Searches the local stocks database for matches based on a query string.
     
-    Query Parameter:
+    Query Parameters:
       - q: the search query (e.g., 'Apple')
+      - limit: maximum number of results (default 20, at most 100)
+
+    Results are ranked: exact ticker, ticker prefix, company name prefix,
+    word prefix, then any substring match.
     
     Successful Response (200):
       {
@@ -29,12 +35,32 @@ def search_stocks():
     if not query_str:
         return jsonify({"message": "Query parameter 'q' is required."}), 400
 
-    results = Stock.query.filter(
-        or_(
-            Stock.ticker_symbol.ilike(f"%{query_str}%"),
-            Stock.company_name.ilike(f"%{query_str}%")
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify({"message": "Validation error", "errors": {"limit": "Limit must be an integer."}}), 400
+
+    if INDEX_ENABLED:
+        # In-memory prefix/trigram index; rebuilt when stocks change.
+        search_index.ensure_fresh()
+        ids = search_index.search(query_str, limit)
+        stocks_by_id = {stock.id: stock for stock in Stock.query.filter(Stock.id.in_(ids)).all()} if ids else {}
+        results = [stocks_by_id[stock_id] for stock_id in ids if stock_id in stocks_by_id]
+    else:
+        # SQL fallback. On Postgres the pg_trgm GIN indexes serve the ILIKEs.
+        query_upper = query_str.strip().upper()
+        rank = case(
+            (Stock.ticker_symbol == query_upper, 0),
+            (Stock.ticker_symbol.ilike(f"{query_str}%"), 1),
+            (Stock.company_name.ilike(f"{query_str}%"), 2),
+            else_=3,
         )
-    ).all()
+        results = Stock.query.filter(
+            or_(
+                Stock.ticker_symbol.ilike(f"%{query_str}%"),
+                Stock.company_name.ilike(f"%{query_str}%")
+            )
+        ).order_by(rank, Stock.ticker_symbol).limit(limit).all()
 
     if not results:
         return jsonify({"message": "No stocks found"}), 404
@@ -47,6 +73,7 @@ def get_stock_details(stock_id):
     """
     Retrieves detailed information for a specific stock by its numeric ID.
     Also updates the session with this stock ID as recently viewed.
+    Supports If-None-Match; the ETag follows the row and its live price.
     """
     stock = Stock.query.get(stock_id)
     if not stock:
@@ -59,12 +86,16 @@ def get_stock_details(stock_id):
     recent_ids.insert(0, stock.id)
     session["recent_stock_ids"] = recent_ids[:10]  # keep only the 10 most recent
 
-    return jsonify({"stock": stock.to_dict()}), 200
+    # Private: the response sets the session cookie, and a revalidation has
+    # to reach us to record the view.
+    version = (stock.id, stock.last_updated, stock.updated_at) + cache_seqs([stock.id])
+    return conditional(version, lambda: (jsonify({"stock": stock.to_dict()}), 200), PRIVATE_CACHE_CONTROL)
 @stock_routes.route('/recent', methods=['GET'])
 def get_recent_stocks():
     """
     Retrieves a list of recently searched stocks for the current user.
     For this example, we're using the Flask session to store recently searched stock IDs.
+    Supports If-None-Match; a match is answered from one aggregate query.
     Response:
       {
         "stocks": [
@@ -77,11 +108,74 @@ def get_recent_stocks():
     if not recent_ids:
         return jsonify({"stocks": []}), 200
 
-    # Query stocks based on the list of recent IDs.
-    stocks = Stock.query.filter(Stock.id.in_(recent_ids)).all()
-    # Create a dictionary keyed by ID for ordering.
-    stocks_dict = {stock.id: stock for stock in stocks}
-    # Order the stocks as stored in the session.
-    ordered_stocks = [stocks_dict[stock_id] for stock_id in recent_ids if stock_id in stocks_dict]
+    def build():
+        # Query stocks based on the list of recent IDs.
+        stocks = Stock.query.filter(Stock.id.in_(recent_ids)).all()
+        # Create a dictionary keyed by ID for ordering.
+        stocks_dict = {stock.id: stock for stock in stocks}
+        # Order the stocks as stored in the session.
+        ordered_stocks = [stocks_dict[stock_id] for stock_id in recent_ids if stock_id in stocks_dict]
+        return jsonify({"stocks": [stock.to_dict() for stock in ordered_stocks]}), 200
+
+    # The list comes from this user's session, so it is private.
+    version = (tuple(recent_ids),) + stocks_version(recent_ids)
+    return conditional(version, build, PRIVATE_CACHE_CONTROL)
+
+
+@stock_routes.route('/<int:stock_id>/bars', methods=['GET'])
+def get_stock_bars(stock_id):
+    """
+    Retrieves OHLCV bars recorded from the live trade feed.
+
+    Query Parameters:
+      - interval: 1m, 5m, 1h or 1d (default 1m)
+      - from / to: ISO 8601 bounds on the bar start (default: the last 500 bars)
+
+    Successful Response (200):
+      {
+        "stock_id": 1,
+        "interval": "1m",
+        "bars": [
+          { "start": "2025-03-18T14:31:00", "open": 150.1, "high": 150.4, "low": 149.9, "close": 150.2, "volume": 1200.0 },
+          ...
+        ]
+      }
+    """
+    interval = request.args.get("interval", "1m")
+    if interval not in BAR_INTERVALS:
+        return jsonify({"message": "Validation error", "errors": {"interval": f"Interval must be one of {', '.join(BAR_INTERVALS)}."}}), 400
+
+    bounds = {}
+    for name in ("from", "to"):
+        if request.args.get(name):
+            try:
+                bounds[name] = datetime.fromisoformat(request.args[name])
+            except ValueError:
+                return jsonify({"message": "Validation error", "errors": {name: f"Invalid '{name}' format. Must be ISO 8601."}}), 400
+
+    # Only the indexed columns are selected so the read can be served from the index.
+    query = PriceBar.query.with_entities(
+        PriceBar.start, PriceBar.open, PriceBar.high, PriceBar.low, PriceBar.close, PriceBar.volume
+    ).filter(PriceBar.stock_id == stock_id, PriceBar.interval == interval)
+    if "from" in bounds:
+        query = query.filter(PriceBar.start >= bounds["from"])
+    if "to" in bounds:
+        query = query.filter(PriceBar.start <= bounds["to"])
+
+    if bounds:
+        rows = query.order_by(PriceBar.start).all()
+    else:
+        rows = list(reversed(query.order_by(PriceBar.start.desc()).limit(500).all()))
 
-    return jsonify({"stocks": [stock.to_dict() for stock in ordered_stocks]}), 200
\ No newline at end of file
+    bars = [
+        {
+            "start": start.isoformat(),
+            "open": float(open_),
+            "high": float(high),
+            "low": float(low),
+            "close": float(close),
+            "volume": float(volume),
+        }
+        for start, open_, high, low, close, volume in rows
+    ]
+    return jsonify({"stock_id": stock_id, "interval": interval, "bars": bars}), 200
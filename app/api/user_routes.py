@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from app.models import User, Portfolio, Watchlist, db
+from app.services.valuation import holdings_values
+from app.services.money import from_cents, to_cents
+from app.api.query_params import portfolio_projection, portfolio_load_options, project
 
 user_routes = Blueprint('users', __name__)
 
@@ -55,8 +58,15 @@ def update_user(id):
     if 'username' in data:
         user.username = data['username']
     if 'cash_balance' in data:
-        # Possibly add logic or validation here
-        user.cash_balance = data['cash_balance']
+        try:
+            cash_balance = to_cents(data['cash_balance'])
+        except (ArithmeticError, TypeError, ValueError):
+            cash_balance = -1
+        if cash_balance < 0:
+            return jsonify({"message": "Validation error", "errors": {
+                "cash_balance": "Cash balance must be a non-negative number"
+            }}), 400
+        user.cash_balance = from_cents(cash_balance)
 
     db.session.commit()
     return jsonify({"user": user.to_dict()}), 200
@@ -84,9 +94,15 @@ def get_user_portfolios():
     Retrieve all portfolios associated with the current user.
     This endpoint requires authentication and returns only the portfolios
     belonging to the logged-in user.
+    Supports the same view/fields/include parameters as GET /api/portfolios/.
     """
-    portfolios = Portfolio.query.filter_by(user_id=current_user.id).all()
-    return jsonify({"portfolios": [portfolio.to_dict() for portfolio in portfolios]}), 200
+    fields, include = portfolio_projection()
+    portfolios = Portfolio.query.options(*portfolio_load_options(include)).filter_by(user_id=current_user.id).all()
+    values = holdings_values(user_id=current_user.id)
+    return jsonify({"portfolios": [
+        project(portfolio.to_dict(holdings_value=values.get(portfolio.id), include=include), fields)
+        for portfolio in portfolios
+    ]}), 200
 
 @user_routes.route('/watchlists', methods=['GET'])
 @login_required
@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from datetime import datetime
 from app.models import Watchlist, WatchlistStock, db
+from app.api.http_cache import conditional, stocks_version, PRIVATE_CACHE_CONTROL
 
 watchlist_routes = Blueprint('watchlists', __name__)
 
@@ -121,11 +122,28 @@ def remove_stock_from_watchlist(watchlist_id, stock_id):
 def get_watchlist(watchlist_id):
     """
     Retrieves one watchlist by ID, including its stocks array.
+    Supports If-None-Match; the ETag follows the watchlist, its entries
+    and their stocks' prices.
     """
-    watchlist = Watchlist.query.get_or_404(watchlist_id)
-    if watchlist.user_id != current_user.id:
+    owner_id, updated_at = (
+        Watchlist.query.with_entities(Watchlist.user_id, Watchlist.updated_at)
+        .filter(Watchlist.id == watchlist_id).first_or_404()
+    )
+    if owner_id != current_user.id:
         return jsonify({"message": "Forbidden"}), 403
-    return jsonify({"watchlist": watchlist.to_dict()}), 200
+
+    entries = (
+        WatchlistStock.query.with_entities(WatchlistStock.id, WatchlistStock.stock_id)
+        .filter(WatchlistStock.watchlist_id == watchlist_id).order_by(WatchlistStock.id).all()
+    )
+    version = (watchlist_id, updated_at, tuple(map(tuple, entries)),
+               stocks_version({stock_id for _, stock_id in entries}))
+
+    def build():
+        watchlist = Watchlist.query.get_or_404(watchlist_id)
+        return jsonify({"watchlist": watchlist.to_dict()}), 200
+
+    return conditional(version, build, PRIVATE_CACHE_CONTROL)
 
 @watchlist_routes.route('/<int:watchlist_id>', methods=['DELETE'])
 @login_required
@@ -0,0 +1,94 @@
+import click
+from flask.cli import AppGroup
+
+# Creates a bench group to hold the performance benchmarks
+# So we can type `flask bench --help`. Each command imports its module when
+# it runs so registering the group costs nothing at startup.
+bench_commands = AppGroup('bench')
+
+
+# Creates the `flask bench quotes` command
+@bench_commands.command('quotes')
+@click.option('--symbols', default=200, help='Number of symbols to refresh.')
+@click.option('--latency', default=0.05, help='Simulated upstream latency in seconds.')
+@click.option('--workers', default=8, help='Refresher thread pool size.')
+def quotes(symbols, latency, workers):
+    from .quotes import bench_quotes
+    bench_quotes(symbols, latency, workers)
+
+
+# Creates the `flask bench valuation` command
+@bench_commands.command('valuation')
+@click.option('--portfolios', default=20, help='Number of portfolios for the user.')
+@click.option('--holdings', default=25, help='Holdings per portfolio.')
+def valuation(portfolios, holdings):
+    from .valuation import bench_valuation
+    bench_valuation(portfolios, holdings)
+
+
+
+# Creates the `flask bench fanout` command
+@bench_commands.command('fanout')
+@click.option('--clients', default=1000, help='Number of simulated sockets.')
+@click.option('--stocks', default=500, help='Number of tickers in the universe.')
+@click.option('--watch', default=10, help='Ticker rooms joined per socket.')
+@click.option('--changed', default=100, help='Price changes per flush.')
+@click.option('--ticks', default=10, help='Number of flushes to replay.')
+def fanout(clients, stocks, watch, changed, ticks):
+    from .fanout import bench_fanout
+    bench_fanout(clients, stocks, watch, changed, ticks)
+
+
+
+# Creates the `flask bench startup` command; exits 1 on a regression
+@bench_commands.command('startup')
+@click.option('--repeat', default=3, help='Fresh interpreters per measurement.')
+@click.option('--max-import-ms', default=900.0, help='Budget for module imports of `import app; app.app`.')
+@click.option('--max-routes-ms', default=2000.0, help='Budget for `flask routes`.')
+@click.option('--max-first-request-ms', default=1500.0, help='Budget for create_app plus the first request.')
+def startup(repeat, max_import_ms, max_routes_ms, max_first_request_ms):
+    from .startup import bench_startup
+    if not bench_startup(repeat, max_import_ms, max_routes_ms, max_first_request_ms):
+        raise SystemExit(1)
+
+
+
+# Creates the `flask bench evaluation` command
+@bench_commands.command('evaluation')
+@click.option('--sizes', default='10000,100000,1000000', help='Comma-separated pending order counts.')
+@click.option('--stocks', default=500, help='Number of stocks.')
+def evaluation(sizes, stocks):
+    from .evaluation import bench_evaluation
+    bench_evaluation([int(size) for size in sizes.split(',')], stocks)
+
+
+
+# Creates the `flask bench money` command
+@bench_commands.command('money')
+@click.option('--holdings', default=100000, help='Holdings to value.')
+@click.option('--fills', default=100000, help='Fills to apply.')
+def money(holdings, fills):
+    from .money import bench_money
+    bench_money(holdings, fills)
+
+
+
+# Creates the `flask bench calendar` command
+@bench_commands.command('calendar')
+@click.option('--calls', default=100000, help='Number of is-open checks.')
+def calendar(calls):
+    from .market_calendar import bench_calendar
+    bench_calendar(calls)
+
+
+
+# Creates the `flask bench ingest` command
+@bench_commands.command('ingest')
+@click.option('--file', 'path', default=None, help='Recorded frame file (FINNHUB_RECORD_FILE); synthetic if omitted.')
+@click.option('--frames', default=50000, help='Synthetic frames to generate.')
+@click.option('--tickers', default=200, help='Synthetic tickers.')
+@click.option('--trades-per-frame', default=10, help='Trades per synthetic frame.')
+@click.option('--capacity', default=10000, help='Ring buffer capacity.')
+def ingest(path, frames, tickers, trades_per_frame, capacity):
+    from .ingest import bench_ingest
+    bench_ingest(path, frames, tickers, trades_per_frame, capacity)
@@ -0,0 +1,102 @@
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app.models import OrderTypeEnum
+from app.services.order_book import OrderBook
+from app.services.order_vector import PendingOrderArrays, encode_row, price_vector
+
+
+def _synthetic(order_count, stock_count, rng):
+    """
+    Pending order rows and a price per stock. 10% market orders, 10%
+    scheduled (half of those in the future), the rest limits spread
+    around the current price.
+    """
+    now = datetime.utcnow()
+    prices = {stock_id: Decimal(rng.randint(1000, 50000)) / 100 for stock_id in range(1, stock_count + 1)}
+    rows = []
+    for order_id in range(1, order_count + 1):
+        stock_id = rng.randint(1, stock_count)
+        order_type = OrderTypeEnum.buy if rng.random() < 0.5 else OrderTypeEnum.sell
+        kind = rng.random()
+        target = None if kind < 0.1 else (prices[stock_id] * Decimal(rng.uniform(0.9, 1.1))).quantize(Decimal("0.01"))
+        scheduled = now + timedelta(minutes=rng.choice((-5, 5))) if 0.1 <= kind < 0.2 else None
+        rows.append((order_id, stock_id, order_type, target, scheduled))
+    return rows, prices
+
+
+def _object_loop(rows, prices, now):
+    """
+    The per-order evaluation the sweep did before the order book:
+    Decimal(str(...)) conversions on every iteration.
+    """
+    fills = {}
+    for order_id, stock_id, order_type, target_price, scheduled_time in rows:
+        if scheduled_time and scheduled_time > now:
+            continue
+        current_price = Decimal(str(prices[stock_id]))
+        if target_price is None:
+            fills[order_id] = current_price
+            continue
+        target = Decimal(str(target_price))
+        if order_type == OrderTypeEnum.buy and current_price <= target:
+            fills[order_id] = current_price
+        elif order_type == OrderTypeEnum.sell and current_price >= target:
+            fills[order_id] = current_price
+    return fills
+
+
+def _book(book, prices):
+    book.release_due()
+    fills = {}
+    for stock_id in book.limit_stock_ids():
+        for order_id in book.crossing(stock_id, prices[stock_id]):
+            fills[order_id] = prices[stock_id]
+    for stock_id, order_ids in book.market_orders().items():
+        for order_id in order_ids:
+            fills[order_id] = prices[stock_id]
+    return fills
+
+
+def _vector(arrays, vector, now):
+    order_ids, cents = arrays.fillable(vector, now=now)
+    return dict(zip(order_ids.tolist(), cents.tolist()))
+
+
+def _ms(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def bench_evaluation(sizes, stock_count):
+    """
+    Evaluates the same synthetic pending set with the per-object Decimal
+    loop, the order book and the NumPy arrays, and checks that all three
+    select the same orders. Build is the one-off load into each structure,
+    evaluate is one sweep. The arrays are built from the integer rows the
+    database returns to PendingOrderArrays.load().
+    """
+    rng = random.Random(17)
+    print(f"{'orders':>9}  {'path':8} {'build ms':>10} {'evaluate ms':>12} {'fills':>8}")
+    for size in sizes:
+        rows, prices = _synthetic(size, stock_count, rng)
+        now = datetime.utcnow()
+
+        loop_ms, loop_fills = _ms(_object_loop, rows, prices, now)
+
+        book = OrderBook()
+        book_build_ms, _ = _ms(book.rebuild, rows)
+        book_ms, book_fills = _ms(_book, book, prices)
+
+        encoded = [encode_row(*row) for row in rows]
+        arrays_build_ms, arrays = _ms(PendingOrderArrays.from_rows, encoded)
+        vector = price_vector(prices)
+        vector_ms, vector_fills = _ms(_vector, arrays, vector, now)
+
+        print(f"{size:>9}  {'objects':8} {'-':>10} {loop_ms:12.1f} {len(loop_fills):8}")
+        print(f"{'':>9}  {'book':8} {book_build_ms:10.1f} {book_ms:12.1f} {len(book_fills):8}")
+        print(f"{'':>9}  {'vector':8} {arrays_build_ms:10.1f} {vector_ms:12.1f} {len(vector_fills):8}")
+        if not (set(loop_fills) == set(book_fills) == set(vector_fills)):
+            print("           fill sets differ!")
@@ -0,0 +1,83 @@
+import random
+import time
+from decimal import Decimal
+from flask import current_app
+from app.models import db, Stock
+from app.services.live_updates import emit_price_deltas, stock_room
+
+
+def bench_fanout(client_count, stock_count, watch_count, changed_count, ticks):
+    """
+    Registers `client_count` simulated Socket.IO clients, puts each in
+    `watch_count` random ticker rooms out of `stock_count`, and replays
+    `ticks` flushes of `changed_count` price changes through:
+
+      - broadcast: one full Stock.to_dict() `stock_update` per ticker to everyone
+      - rooms:     one `stock_updates` delta per ticker room
+
+    Reports messages delivered per second and bytes sent per client.
+    """
+    app = current_app._get_current_object()
+    socketio = app.config["socketio"]
+    db.engine.echo = False
+    rng = random.Random(7)
+
+    # Use a real serialized stock as the template for the old payload.
+    sample = Stock.query.first()
+    template = sample.to_dict() if sample else {"id": 1, "ticker_symbol": "AAPL", "company_name": "Apple Inc.",
+                                               "market_price": 100.0, "last_updated": None}
+
+    # Simulated sockets are registered straight with the Socket.IO manager
+    # and the engine.io send is swapped for a counter, so the measurement
+    # covers room lookup and packet encoding but no network I/O.
+    server = socketio.server
+    received = {}
+
+    def count_packet(eio_sid, pkt):
+        stats = received.setdefault(eio_sid, [0, 0])
+        stats[0] += 1
+        stats[1] += len(pkt.encode())
+
+    eio_sids = [f"bench-{i}" for i in range(client_count)]
+    for eio_sid in eio_sids:
+        sid = server.manager.connect(eio_sid, "/")
+        for stock_id in rng.sample(range(1, stock_count + 1), watch_count):
+            server.manager.enter_room(sid, "/", stock_room(stock_id))
+
+    batches = [
+        {stock_id: Decimal(rng.randint(100, 100000)) / 100
+         for stock_id in rng.sample(range(1, stock_count + 1), changed_count)}
+        for _ in range(ticks)
+    ]
+
+    def broadcast(changed):
+        for stock_id, price in changed.items():
+            socketio.emit("stock_update", dict(template, id=stock_id, market_price=float(price)))
+
+    def rooms(changed):
+        emit_price_deltas(socketio, changed)
+
+    results = {}
+    original_send = server._send_eio_packet
+    server._send_eio_packet = count_packet
+    try:
+        for name, emit in (("broadcast", broadcast), ("rooms", rooms)):
+            received.clear()
+            started = time.perf_counter()
+            for changed in batches:
+                emit(changed)
+            elapsed = time.perf_counter() - started
+            messages = sum(stats[0] for stats in received.values())
+            size = sum(stats[1] for stats in received.values())
+            results[name] = (elapsed, messages, size)
+    finally:
+        server._send_eio_packet = original_send
+        for eio_sid in eio_sids:
+            server.manager.disconnect(server.manager.sid_from_eio_sid(eio_sid, "/"), "/")
+
+    print(f"{client_count} sockets, {watch_count}/{stock_count} tickers each, "
+          f"{changed_count} changes x {ticks} flushes")
+    for name, (elapsed, messages, size) in results.items():
+        rate = messages / elapsed if elapsed > 0 else float("inf")
+        print(f"  {name:9}: {elapsed * 1000:8.1f} ms, {messages:9d} messages, {rate:10.0f} msg/s, "
+              f"{size / client_count / ticks:9.0f} bytes/client/flush")
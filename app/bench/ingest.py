@@ -0,0 +1,82 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+from app.services.ingest import DECODER, IngestPipeline, FrameRecorder, read_frames
+from app.services.price_history import BarAggregator
+
+
+def _record_synthetic(path, frames, tickers, trades_per_frame):
+    # Finnhub trade frames, written in the recorder's format.
+    symbols = [f"SYM{i}" for i in range(tickers)]
+    prices = {symbol: random.uniform(10, 500) for symbol in symbols}
+    recorder = FrameRecorder(path)
+    now_ms = int(time.time() * 1000)
+    for n in range(frames):
+        data = []
+        for _ in range(trades_per_frame):
+            symbol = random.choice(symbols)
+            prices[symbol] *= random.uniform(0.999, 1.001)
+            data.append({"s": symbol, "p": round(prices[symbol], 2), "v": random.randint(1, 500),
+                         "t": now_ms + n, "c": None})
+        recorder.write(json.dumps({"type": "trade", "data": data}))
+    recorder.close()
+
+
+def _legacy(frames, bars):
+    # The previous on_message(): parse on the socket thread, feed the bars
+    # one trade at a time and keep only the newest price per ticker.
+    updates, lock = {}, threading.Lock()
+    for frame in frames:
+        data = json.loads(frame)
+        for trade in data.get("data") or ():
+            timestamp = trade["t"] / 1000.0
+            with lock:
+                updates[trade["s"]] = (trade["p"], datetime.utcfromtimestamp(timestamp))
+            bars.add_trade(trade["s"], trade["p"], trade.get("v"), timestamp)
+    return updates
+
+
+def bench_ingest(path, frames, tickers, trades_per_frame, capacity):
+    """
+    Replays a recorded frame file through the ingest pipeline and through
+    the old parse-on-the-socket-thread handler.
+    """
+    generated = path is None
+    if generated:
+        fd, path = tempfile.mkstemp(suffix=".frames")
+        os.close(fd)
+        _record_synthetic(path, frames, tickers, trades_per_frame)
+    try:
+        recorded = [frame for _, frame in read_frames(path)]
+    finally:
+        if generated:
+            os.remove(path)
+    trades = sum(len((json.loads(frame).get("data") or ())) for frame in recorded)
+    volume = sum(t.get("v") or 0 for frame in recorded for t in (json.loads(frame).get("data") or ()))
+    print(f"{len(recorded)} frames, {trades} trades (decoder: {DECODER})")
+
+    started = time.perf_counter()
+    updates = _legacy(recorded, BarAggregator())
+    legacy_time = time.perf_counter() - started
+    print(f"  socket-thread parse: {len(recorded) / legacy_time:10.0f} frames/s {trades / legacy_time:10.0f} trades/s"
+          f"  flushes the last price of {len(updates)} tickers, no high/low/volume")
+
+    pipeline = IngestPipeline(capacity=capacity, cache=None, bars=BarAggregator()).start()
+    started = time.perf_counter()
+    for frame in recorded:
+        pipeline.feed(frame)
+    feed_time = time.perf_counter() - started
+    idle = pipeline.wait_idle(timeout=60)
+    total_time = time.perf_counter() - started
+    pipeline.stop()
+    stats = pipeline.drain()
+    print(f"  ingest pipeline:     {len(recorded) / total_time:10.0f} frames/s {pipeline.trades / total_time:10.0f} trades/s"
+          f"  kept {sum(s.trades for s in stats.values())} of {trades} trades,"
+          f" {sum(s.volume for s in stats.values())} of {volume} volume")
+    print(f"  reader stage:        {len(recorded) / feed_time:10.0f} frames/s on the socket thread")
+    print(f"  dropped {pipeline.ring.dropped} frames, {pipeline.errors} decode errors"
+          f"{'' if idle else ', decoder still busy after 60s'}")
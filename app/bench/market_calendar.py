@@ -0,0 +1,39 @@
+from datetime import datetime, time as clock
+from app.services.market_calendar import MarketCalendar, WINDOW_AFTER, WINDOW_BEFORE
+from .utils import timed
+
+
+def _pytz_check():
+    # The previous is_market_open_now(): a timezone lookup and a local
+    # clock conversion on every call, and no holidays.
+    import pytz
+    now_et = datetime.now(pytz.timezone("US/Eastern"))
+    if now_et.weekday() >= 5:
+        return False
+    return clock(9, 30) <= now_et.time() <= clock(16, 0)
+
+
+def bench_calendar(calls):
+    """
+    Times `calls` market-open checks with the per-call pytz conversion and
+    with the precomputed session table.
+    """
+    calendar = MarketCalendar()
+    today = datetime.utcnow().date()
+    build_time, sessions = timed(lambda: calendar.build(today - WINDOW_BEFORE, today + WINDOW_AFTER), repeat=1)
+
+    def pytz_loop():
+        for _ in range(calls):
+            _pytz_check()
+
+    def table_loop():
+        for _ in range(calls):
+            calendar.is_open()
+
+    pytz_time, _ = timed(pytz_loop, repeat=3)
+    table_time, _ = timed(table_loop, repeat=3)
+    print(f"session table: {sessions} sessions built in {build_time * 1000:.1f} ms")
+    print(f"{calls} is-open checks")
+    print(f"  pytz per call:   {pytz_time * 1e6 / calls:6.2f} us/call")
+    print(f"  session table:   {table_time * 1e6 / calls:6.2f} us/call  ({pytz_time / table_time:.1f}x)")
+
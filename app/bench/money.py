@@ -0,0 +1,116 @@
+import random
+from decimal import Decimal, ROUND_HALF_UP
+from app.services.money import amount_cents, from_cents, to_cents, to_units
+from .utils import timed
+
+_CENT = Decimal("0.01")
+
+
+def _holdings(count, rng):
+    # Values as the ORM returns them from Numeric(15,4) and Numeric(10,2).
+    return [
+        (Decimal(rng.randint(1, 1000000)).scaleb(-4), Decimal(rng.randint(100, 100000)).scaleb(-2))
+        for _ in range(count)
+    ]
+
+
+def bench_money(holding_count, fill_count):
+    """
+    Times the valuation and fill arithmetic with Decimal(str(...)) round
+    trips (the previous code) against plain Decimal products (what
+    Portfolio.holdings_value and holdings_values do) and integer cents and
+    quantity units, and checks that all give the same amounts. The integer
+    paths are timed converting every Decimal column value as it is used
+    (what apply_fill does), with prices already in cents and, for
+    reference, on values converted up front, which no production path has.
+    """
+    rng = random.Random(18)
+    holdings = _holdings(holding_count, rng)
+    cached = [(quantity, to_cents(price)) for quantity, price in holdings]
+    loaded = [(to_units(quantity), price_cents) for quantity, price_cents in cached]
+
+    def decimal_valuation():
+        total = Decimal("0.00")
+        for quantity, price in holdings:
+            total += Decimal(str(quantity)) * Decimal(str(price))
+        return total.quantize(_CENT, rounding=ROUND_HALF_UP)
+
+    def plain_decimal_valuation():
+        # Exact: Numeric(15,4) x Numeric(10,2) fits the Decimal context.
+        total = Decimal(0)
+        for quantity, price in holdings:
+            total += quantity * price
+        return to_cents(total)
+
+    def cents_valuation():
+        total = 0
+        for quantity, price in holdings:
+            total += to_units(quantity) * to_cents(price)
+        return to_cents(Decimal(total).scaleb(-6))
+
+    def cached_valuation():
+        # Prices from the price cache already carry their cents.
+        total = 0
+        for quantity, price_cents in cached:
+            total += to_units(quantity) * price_cents
+        return to_cents(Decimal(total).scaleb(-6))
+
+    def integer_valuation():
+        total = 0
+        for units, price_cents in loaded:
+            total += units * price_cents
+        return to_cents(Decimal(total).scaleb(-6))
+
+    fills = _holdings(fill_count, rng)
+    opening = Decimal("100000000.00")
+
+    def decimal_fills():
+        balance, held = opening, Decimal("0.0000")
+        for quantity, price in fills:
+            quantity, price = Decimal(str(quantity)), Decimal(str(price))
+            # A Numeric(15,2) balance keeps each debit at cent precision.
+            balance -= (quantity * price).quantize(_CENT, rounding=ROUND_HALF_UP)
+            held += quantity
+        return balance, held
+
+    def cents_fills():
+        balance, held = to_cents(opening), 0
+        for quantity, price in fills:
+            units = to_units(quantity)
+            balance -= amount_cents(units, to_cents(price))
+            held += units
+        return from_cents(balance), Decimal(held).scaleb(-4)
+
+    fills_loaded = [(to_units(quantity), to_cents(price)) for quantity, price in fills]
+
+    def integer_fills():
+        balance, held = to_cents(opening), 0
+        for units, price_cents in fills_loaded:
+            balance -= amount_cents(units, price_cents)
+            held += units
+        return from_cents(balance), Decimal(held).scaleb(-4)
+
+    decimal_time, decimal_value = timed(decimal_valuation)
+    plain_time, plain_value = timed(plain_decimal_valuation)
+    cents_time, cents_value = timed(cents_valuation)
+    cached_time, cached_value = timed(cached_valuation)
+    integer_time, integer_value = timed(integer_valuation)
+    decimal_fill_time, decimal_fill = timed(decimal_fills)
+    cents_fill_time, cents_fill = timed(cents_fills)
+    integer_fill_time, integer_fill = timed(integer_fills)
+
+    def row(label, seconds, baseline):
+        print(f"  {label:32} {seconds * 1000:8.1f} ms  ({baseline / seconds:.1f}x)")
+
+    print(f"valuation of {holding_count} holdings")
+    row("Decimal(str()) loop", decimal_time, decimal_time)
+    row("Decimal products", plain_time, decimal_time)
+    row("cents, converting each value", cents_time, decimal_time)
+    row("cents, prices already in cents", cached_time, decimal_time)
+    row("cents, converted up front (ref)", integer_time, decimal_time)
+    print(f"  identical values: {to_cents(decimal_value) == plain_value == cents_value == cached_value == integer_value}")
+    print(f"fill loop over {fill_count} fills")
+    row("Decimal(str()) loop", decimal_fill_time, decimal_fill_time)
+    row("cents, converting each value", cents_fill_time, decimal_fill_time)
+    row("cents, converted up front (ref)", integer_fill_time, decimal_fill_time)
+    print(f"  identical balances: {decimal_fill == cents_fill == integer_fill}")
@@ -0,0 +1,33 @@
+import time
+import finnhub
+from app.services.fake_finnhub import FakeFinnhubServer
+from app.services.quote_fetcher import QuoteRefresher
+
+
+def bench_quotes(symbol_count, latency, workers):
+    """
+    Compares the old one-client-per-symbol serial loop with the pooled,
+    concurrent QuoteRefresher against a local fake Finnhub server.
+    The rate limit is lifted so only the fetch strategy is measured.
+    """
+    symbols = [f"SYM{i}" for i in range(symbol_count)]
+    server = FakeFinnhubServer(latency=latency).start()
+    try:
+        started = time.perf_counter()
+        for symbol in symbols:
+            client = finnhub.Client(api_key="bench")
+            client.API_URL = server.url
+            client.quote(symbol)
+        serial = time.perf_counter() - started
+
+        refresher = QuoteRefresher(api_key="bench", base_url=server.url,
+                                   max_workers=workers, calls_per_minute=10 ** 9)
+        started = time.perf_counter()
+        quotes = refresher.fetch(symbols)
+        pooled = time.perf_counter() - started
+    finally:
+        server.stop()
+
+    print(f"{symbol_count} symbols, {latency * 1000:.0f} ms upstream latency")
+    print(f"  {'serial, new client per symbol:':34}{serial:.2f}s ({symbol_count / serial:.0f} quotes/s)")
+    print(f"  {f'pooled, {workers} workers:':34}{pooled:.2f}s ({len(quotes) / pooled:.0f} quotes/s)")
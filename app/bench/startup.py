@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Modules the web process should not load until something actually needs them.
+LAZY_MODULES = ["finnhub", "gevent", "flask_apscheduler", "apscheduler", "alembic", "flask_migrate", "pytz", "numpy"]
+
+_FIRST_REQUEST = """
+import json, sys, time
+started = time.perf_counter()
+import app
+application = app.app
+created = time.perf_counter()
+from app.models import db
+with application.app_context():
+    db.engine.echo = False
+client = application.test_client()
+status = client.get("/api/stocks/").status_code
+finished = time.perf_counter()
+sys.__stdout__.write("\\n" + json.dumps({
+    "create_ms": (created - started) * 1000,
+    "first_request_ms": (finished - created) * 1000,
+    "status": status,
+    "loaded": [name for name in %r if name in sys.modules],
+}) + "\\n")
+""" % (LAZY_MODULES,)
+
+
+def _run(args, env):
+    started = time.perf_counter()
+    result = subprocess.run(args, env=env, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    return elapsed, result
+
+
+def _import_profile(env):
+    """
+    `python -X importtime -c "import app; app.app"`: total time spent
+    importing modules for the package and the app it builds, and the
+    heaviest top-level imports, in milliseconds.
+    """
+    _, result = _run([sys.executable, "-X", "importtime", "-c", "import app; app.app"], env)
+    top = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            top.append((int(cumulative) / 1000, name.strip()))
+    total = sum(ms for ms, name in top)
+    return total, sorted(top, reverse=True)[:5]
+
+
+def bench_startup(repeat, max_import_ms, max_routes_ms, max_first_request_ms):
+    """
+    Cold-start benchmark, each measurement in a fresh interpreter (best of
+    `repeat`):
+      - imports for app.app   (python -X importtime)
+      - flask routes          (CLI wall time)
+      - create_app + first GET /api/stocks/
+    Returns False if any measurement exceeds its threshold.
+    """
+    env = dict(os.environ, FLASK_APP="app", APP_ROLE="web")
+    # Set by the flask CLI running this command; the children must not inherit it.
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    env.pop("FINNHUB_API_KEY", None)
+
+    imports, routes, requests = [], [], []
+    for _ in range(repeat):
+        imports.append(_import_profile(env))
+        routes.append(_run([sys.executable, "-m", "flask", "routes"], env)[0])
+        _, result = _run([sys.executable, "-c", _FIRST_REQUEST], env)
+        requests.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    import_ms, heaviest = min(imports, key=lambda item: item[0])
+    routes_ms = min(routes)
+    first = min(requests, key=lambda item: item["create_ms"] + item["first_request_ms"])
+
+    checks = [
+        ("imports for app.app", import_ms, max_import_ms),
+        ("flask routes", routes_ms, max_routes_ms),
+        ("create_app + first request", first["create_ms"] + first["first_request_ms"], max_first_request_ms),
+    ]
+    print(f"startup, best of {repeat}")
+    ok = True
+    for label, value, limit in checks:
+        passed = value <= limit
+        ok = ok and passed
+        print(f"  {label:28} {value:8.1f} ms  (limit {limit:.0f} ms) {'ok' if passed else 'OVER'}")
+    print(f"    create_app {first['create_ms']:.1f} ms, first request {first['first_request_ms']:.1f} ms "
+          f"(HTTP {first['status']})")
+    print("  heaviest top-level imports:")
+    for ms, name in heaviest:
+        print(f"    {ms:8.1f} ms  {name}")
+    if first["loaded"]:
+        ok = False
+        print(f"  loaded eagerly: {', '.join(first['loaded'])}")
+    return ok
@@ -0,0 +1,36 @@
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.models import db
+
+
+@contextmanager
+def count_queries():
+    """
+    Counts the SQL statements executed inside the block.
+    Yields a dict whose 'count' is filled in as statements run.
+    """
+    counter = {"count": 0}
+    engine = db.engine
+
+    def before_cursor_execute(*args):
+        counter["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def timed(fn, repeat=5):
+    """
+    Runs fn `repeat` times and returns (best seconds, last result).
+    """
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
@@ -0,0 +1,67 @@
+import random
+from decimal import Decimal, ROUND_HALF_UP
+from app.models import db, User, Portfolio, Holding, Stock
+from app.services.price_cache import price_cache
+from app.services.valuation import holdings_values
+from .utils import count_queries, timed
+
+
+def bench_valuation(portfolio_count, holding_count):
+    """
+    Values one user's portfolios through the per-holding ORM loop
+    (Portfolio.holdings_value) and through the aggregate valuation query.
+    Synthetic rows are flushed inside a transaction that is rolled back.
+    """
+    # Measure the database paths, not the in-process price cache.
+    price_cache.clear()
+    db.engine.echo = False
+    rng = random.Random(42)
+    try:
+        user = User(first_name="Bench", last_name="User", username="bench_valuation",
+                    email="bench_valuation@example.com", password="bench")
+        db.session.add(user)
+        stocks = [
+            Stock(ticker_symbol=f"BV{i}", company_name=f"Bench {i}",
+                  market_price=Decimal(rng.randint(100, 100000)) / 100)
+            for i in range(holding_count)
+        ]
+        db.session.add_all(stocks)
+        db.session.flush()
+        for p in range(portfolio_count):
+            portfolio = Portfolio(user_id=user.id, name=f"Bench {p}",
+                                  portfolio_balance=Decimal("1000.00"),
+                                  initial_investment=Decimal("5000.00"))
+            db.session.add(portfolio)
+            db.session.flush()
+            db.session.add_all(
+                Holding(portfolio_id=portfolio.id, stock_id=stock.id,
+                        quantity=Decimal(rng.randint(1, 100000)) / 10000)
+                for stock in stocks
+            )
+        db.session.flush()
+
+        cent = Decimal("0.01")
+
+        def orm_path():
+            db.session.expire_all()
+            portfolios = Portfolio.query.filter_by(user_id=user.id).all()
+            return {p.id: p.holdings_value().quantize(cent, rounding=ROUND_HALF_UP) for p in portfolios}
+
+        def aggregate_path():
+            db.session.expire_all()
+            values = holdings_values(user_id=user.id)
+            return {p_id: value.quantize(cent, rounding=ROUND_HALF_UP) for p_id, value in values.items()}
+
+        with count_queries() as orm_queries:
+            orm_path()
+        with count_queries() as aggregate_queries:
+            aggregate_path()
+        orm_time, orm_result = timed(orm_path)
+        aggregate_time, aggregate_result = timed(aggregate_path)
+    finally:
+        db.session.rollback()
+
+    print(f"{portfolio_count} portfolios x {holding_count} holdings")
+    print(f"  per-holding ORM loop: {orm_time * 1000:8.1f} ms, {orm_queries['count']} queries")
+    print(f"  aggregate query:      {aggregate_time * 1000:8.1f} ms, {aggregate_queries['count']} queries")
+    print(f"  identical values:     {orm_result == aggregate_result}")
@@ -11,4 +11,5 @@ class Config:
     # so the connection uri must be updated here (for production)
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         'DATABASE_URL').replace('postgres://', 'postgresql://')
-    SQLALCHEMY_ECHO = True
+    # Statement logging is expensive; opt in with SQLALCHEMY_ECHO=1.
+    SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO') == '1'
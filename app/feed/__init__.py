@@ -0,0 +1,85 @@
+import click
+from flask.cli import AppGroup
+
+# Creates a feed group for the local Finnhub stand-in
+# So we can type `flask feed --help`. Like `flask bench`, each command
+# imports its module when it runs.
+feed_commands = AppGroup('feed')
+
+
+def _faults(disconnect_every, refuse, stall_every, stall_for, quiet):
+    from .server import Faults
+    return Faults(disconnect_every, refuse, stall_every, stall_for, quiet)
+
+
+def _feed(file, speed, loop, symbols, rate, trades_per_frame):
+    from .server import RecordedFeed, SyntheticFeed
+    if file:
+        return RecordedFeed(file, speed=speed, loop=loop)
+    return SyntheticFeed(symbols=symbols, rate=rate, trades_per_frame=trades_per_frame)
+
+
+def feed_options(command):
+    # Options shared by every command that starts a server.
+    for option in reversed([
+        click.option('--file', default=None, help='Recorded frame file (FINNHUB_RECORD_FILE); synthetic if omitted.'),
+        click.option('--speed', default=1.0, help='Replay speed for --file, 0 for no gaps.'),
+        click.option('--loop/--no-loop', default=True, help='Start --file over at the end.'),
+        click.option('--symbols', default=100, help='Synthetic: subscribed symbols that trade.'),
+        click.option('--rate', default=1000, help='Synthetic: trades per second, 0 for max rate.'),
+        click.option('--trades-per-frame', default=10, help='Synthetic: trades per frame.'),
+    ]):
+        command = option(command)
+    return command
+
+
+def fault_options(command):
+    # Failures the server injects, see app.feed.server.Faults.
+    for option in reversed([
+        click.option('--disconnect-every', default=None, type=float, help='Drop each connection after N seconds.'),
+        click.option('--refuse', default=0, help='Refuse N reconnect attempts after each drop.'),
+        click.option('--stall-every', default=None, type=float, help='Go silent every N seconds...'),
+        click.option('--stall-for', default=0.0, help='...for this many seconds.'),
+        click.option('--quiet', default=0, help='Subscribed symbols that never trade.'),
+    ]):
+        command = option(command)
+    return command
+
+
+# Creates the `flask feed serve` command; point FINNHUB_WS_URL at it
+@feed_commands.command('serve')
+@click.option('--host', default='127.0.0.1', help='Interface to listen on.')
+@click.option('--port', default=8765, help='Port to listen on.')
+@feed_options
+@fault_options
+def serve(host, port, file, speed, loop, symbols, rate, trades_per_frame,
+          disconnect_every, refuse, stall_every, stall_for, quiet):
+    from .server import FakeFinnhubServer
+    server = FakeFinnhubServer(_feed(file, speed, loop, symbols, rate, trades_per_frame), host, port,
+                               _faults(disconnect_every, refuse, stall_every, stall_for, quiet))
+    print(f"Serving a fake Finnhub feed on {server.url} "
+          f"(FINNHUB_WS_URL={server.url} FINNHUB_API_URL={server.api_url})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+# Creates the `flask feed replay` command
+@feed_commands.command('replay')
+@click.option('--duration', default=30.0, help='Seconds to measure.')
+@click.option('--flush-interval', default=1.0, help='Seconds between DB flushes.')
+@click.option('--heartbeat', default=None, type=float, help='FINNHUB_HEARTBEAT_SECONDS for this run.')
+@click.option('--stale', default=None, type=float, help='FINNHUB_STALE_SECONDS for this run.')
+@feed_options
+@fault_options
+def replay(duration, flush_interval, heartbeat, stale, file, speed, loop, symbols, rate, trades_per_frame,
+           disconnect_every, refuse, stall_every, stall_for, quiet):
+    """Drive the ingest, DB and Socket.IO path against a local feed.
+
+    Writes prices to the configured database. REST backfill runs as if
+    the market were open.
+    """
+    from .replay import replay_feed
+    replay_feed(_feed(file, speed, loop, symbols, rate, trades_per_frame), duration, flush_interval,
+                _faults(disconnect_every, refuse, stall_every, stall_for, quiet), heartbeat, stale)
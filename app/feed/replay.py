@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from app.models import db, Stock
+from app.services import feed_watchdog, finnhub_ws
+from app.services.broker import PRICES_CHANNEL, get_broker
+from app.services.ingest import IngestPipeline
+from .server import FakeFinnhubServer
+
+
+def rss_bytes():
+    """
+    Resident set size of this process; the peak where /proc is missing.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def oldest_update(tickers):
+    """
+    Seconds since the least recently updated of `tickers` was written.
+    """
+    if not tickers:
+        return 0.0
+    oldest = db.session.query(func.min(Stock.last_updated)).filter(Stock.ticker_symbol.in_(tickers)).scalar()
+    db.session.rollback()
+    return (datetime.utcnow() - oldest).total_seconds() if oldest else float("inf")
+
+
+def replay_feed(feed, duration, flush_interval, faults=None, heartbeat=None, stale=None):
+    """
+    Runs run_finnhub_ws against a local FakeFinnhubServer streaming `feed`
+    (and serving REST quotes for backfill), optionally injecting `faults`.
+    Reports throughput, trade-to-publish latency, reconnects, the worst
+    last_updated lag and memory growth.
+    """
+    app = current_app._get_current_object()
+    server = FakeFinnhubServer(feed, faults=faults).start()
+    pipeline = IngestPipeline()
+    finnhub_ws.UPDATE_INTERVAL_SECONDS = flush_interval
+    feed_watchdog.HEARTBEAT_SECONDS = heartbeat or feed_watchdog.HEARTBEAT_SECONDS
+    feed_watchdog.STALE_SECONDS = stale or feed_watchdog.STALE_SECONDS
+    # Backfill quotes come from the same server.
+    os.environ["FINNHUB_API_URL"] = server.api_url
+
+    lock = threading.Lock()
+    latencies = []
+    published = {"batches": 0, "prices": 0}
+
+    def on_prices(message):
+        # Runs after the app's own handler has emitted the deltas.
+        received = time.time()
+        if message.get("source", "ws") != "ws":
+            return  # a REST backfill, not a feed flush
+        with lock:
+            published["batches"] += 1
+            for _, ticker, price in message["prices"]:
+                published["prices"] += 1
+                sent = server.sent_at(ticker, float(price))
+                if sent is not None:
+                    latencies.append(received - sent)
+
+    get_broker().subscribe(PRICES_CHANNEL, on_prices)
+    stop = threading.Event()
+    threading.Thread(target=finnhub_ws.run_finnhub_ws, args=(app, server.url, pipeline, lambda: True, stop),
+                     daemon=True).start()
+
+    deadline = time.monotonic() + 15
+    while server.sent_trades == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if server.sent_trades == 0:
+        print("No trades were sent: does anybody hold, watch or have orders on a stock, and does the feed file trade them?")
+        stop.set()
+        server.stop()
+        return
+
+    # Measure from the first flush on, once imports and subscriptions are done.
+    time.sleep(flush_interval)
+    with lock:
+        latencies.clear()
+        published.update(batches=0, prices=0)
+    started = time.monotonic()
+    sent_start, trades_start, rss_start = server.sent_trades, pipeline.trades, rss_bytes()
+    connects_start, quotes_start = server.connects, server.quote_requests
+    rss_peak, max_lag = rss_start, 0.0
+    # Symbols that never trade are only written by backfill, after a stale window.
+    settled = feed_watchdog.STALE_SECONDS + feed_watchdog.WATCHDOG_SECONDS
+    while time.monotonic() - started < duration:
+        time.sleep(min(1.0, duration))
+        rss_peak = max(rss_peak, rss_bytes())
+        if time.monotonic() - started >= settled:
+            max_lag = max(max_lag, oldest_update(sorted(server.symbols)))
+    elapsed = time.monotonic() - started
+    sent, ingested, rss_end = server.sent_trades - sent_start, pipeline.trades - trades_start, rss_bytes()
+    stop.set()
+    server.stop()
+
+    with lock:
+        ordered = sorted(latencies)
+        batches, prices = published["batches"], published["prices"]
+    print(f"\n{elapsed:.1f}s against {server.url}, {server.connects} connection(s)")
+    print(f"  sent:      {sent} trades ({sent / elapsed:.0f}/s)")
+    print(f"  ingested:  {ingested} trades ({ingested / elapsed:.0f}/s), "
+          f"{pipeline.ring.dropped} frames dropped, {pipeline.errors} decode errors")
+    print(f"  published: {batches} batches, {prices} prices")
+    print(f"  outages:   {server.connects - connects_start} reconnects, {server.drops} drops, "
+          f"{server.refused} refused, {server.quote_requests - quotes_start} REST backfill quotes")
+    if elapsed >= settled:
+        print(f"  last_updated lag of {len(server.symbols)} subscribed symbols: max {max_lag:.1f}s "
+              f"(stale window {feed_watchdog.STALE_SECONDS:.0f}s)")
+    print(f"  trade-to-publish latency over {len(ordered)} prices (flush every {flush_interval}s): "
+          f"p50 {percentile(ordered, 0.5) * 1000:.0f} ms, p90 {percentile(ordered, 0.9) * 1000:.0f} ms, "
+          f"p99 {percentile(ordered, 0.99) * 1000:.0f} ms, max {percentile(ordered, 1.0) * 1000:.0f} ms")
+    print(f"  memory:    {rss_start / 2**20:.1f} MiB -> {rss_end / 2**20:.1f} MiB "
+          f"(peak {rss_peak / 2**20:.1f} MiB, {(rss_end - rss_start) / 2**20:+.1f} MiB)")
@@ -0,0 +1,424 @@
+# app/feed/server.py
+"""
+A local stand-in for Finnhub's trade WebSocket.
+
+Speaks just enough RFC 6455 (handshake, masked client frames, ping/pong,
+close) and Finnhub's protocol: clients send {"type": "subscribe",
+"symbol": ...} / {"type": "unsubscribe", ...} and receive
+{"type": "trade", "data": [{"s", "p", "v", "t"}...]} for the symbols they
+are subscribed to, plus {"type": "ping"} when the feed is idle.
+
+Trades come from a feed: SyntheticFeed (a random walk at a fixed rate) or
+RecordedFeed (a FINNHUB_RECORD_FILE capture, replayed at any speed). Every
+trade is stamped with its send time, so latency can be measured downstream.
+
+The same port answers GET /api/v1/quote?symbol=... like Finnhub's REST
+API (FINNHUB_API_URL=http://host:port/api/v1), and Faults can drop,
+refuse or stall connections and silence symbols.
+"""
+import base64
+import hashlib
+import json
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+from app.services.ingest import read_frames
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+# Finnhub pings idle connections; the client does not need to answer.
+IDLE_PING_SECONDS = 10
+# Send times remembered per symbol for latency lookups.
+SENT_HISTORY = 4096
+
+
+class SyntheticFeed:
+    """
+    Random-walk trades over the first `symbols` subscribed tickers, in
+    frames of `trades_per_frame`, at `rate` trades per second (0: as fast
+    as the connection takes them).
+    """
+
+    def __init__(self, symbols=100, rate=1000, trades_per_frame=10, duration=None):
+        self.symbols = symbols
+        self.rate = rate
+        self.trades_per_frame = trades_per_frame
+        self.duration = duration
+
+    def frames(self, subscribed):
+        """
+        Yield (offset seconds, [trade]) for one connection.
+        """
+        prices = {}
+        interval = self.trades_per_frame / self.rate if self.rate else 0
+        n = 0
+        while True:
+            offset = n * interval
+            if self.duration is not None and offset >= self.duration:
+                return
+            symbols = sorted(subscribed)[:self.symbols]
+            trades = []
+            for symbol in random.choices(symbols, k=self.trades_per_frame) if symbols else ():
+                price = prices.get(symbol) or random.uniform(10, 500)
+                price = prices[symbol] = max(0.01, price * random.uniform(0.999, 1.001))
+                trades.append({"s": symbol, "p": round(price, 2), "v": random.randint(1, 500), "c": None})
+            n += 1
+            yield offset, trades
+
+
+class RecordedFeed:
+    """
+    Replays a recorded frame file. `speed` scales the recorded gaps
+    (1: real time, 0: no gaps); `loop` starts over at the end.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+
+    def frames(self, subscribed):
+        elapsed = 0.0
+        while True:
+            first = None
+            for ts, frame in read_frames(self.path):
+                first = ts if first is None else first
+                try:
+                    message = json.loads(frame)
+                except ValueError:
+                    continue
+                offset = elapsed + (ts - first) / self.speed if self.speed else 0
+                data = message.get("data") if isinstance(message, dict) else None
+                yield offset, data or []
+            if not self.loop or first is None:
+                return
+            elapsed = offset
+
+
+class Faults:
+    """
+    Failures to inject, for exercising reconnects and backfill:
+
+        disconnect_every  drop every connection, without a close frame,
+                          this many seconds after it opens
+        refuse            after each drop, answer this many upgrade
+                          requests with 503
+        stall_every       every this many seconds, go silent (no trades,
+        stall_for         no pings) for stall_for seconds
+        quiet             the first `quiet` subscribed symbols never trade
+    """
+
+    def __init__(self, disconnect_every=None, refuse=0, stall_every=None, stall_for=0, quiet=0):
+        self.disconnect_every = disconnect_every
+        self.refuse = refuse
+        self.stall_every = stall_every
+        self.stall_for = stall_for
+        self.quiet = quiet
+
+    def stalled(self, elapsed):
+        return bool(self.stall_every) and elapsed % self.stall_every >= self.stall_every - self.stall_for
+
+
+class WebSocketClosed(Exception):
+    pass
+
+
+class _Connection(socketserver.BaseRequestHandler):
+    """
+    One client: the handler thread reads its frames, a sender thread
+    streams trades for its subscriptions.
+    """
+
+    def setup(self):
+        self.subscribed = set()
+        self.closed = threading.Event()
+        self._send_lock = threading.Lock()
+        self._buffer = b""
+
+    def handle(self):
+        server = self.server.feed_server
+        if not self._handshake():
+            return
+        server._opened(self)
+        sender = threading.Thread(target=self._stream, daemon=True)
+        sender.start()
+        try:
+            while not self.closed.is_set():
+                opcode, payload = self._read_message()
+                if opcode == OP_CLOSE:
+                    self._send_frame(OP_CLOSE, payload[:2])
+                    break
+                if opcode == OP_PING:
+                    self._send_frame(OP_PONG, payload)
+                elif opcode == OP_TEXT:
+                    self._on_text(payload.decode("utf-8"))
+        except (WebSocketClosed, OSError):
+            pass
+        finally:
+            self.closed.set()
+            server._closed(self)
+
+    def _recv(self, size):
+        while len(self._buffer) < size:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                raise WebSocketClosed()
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def _handshake(self):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        head, _, self._buffer = request.partition(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        target = lines[0].split(" ")[1] if len(lines[0].split(" ")) > 1 else "/"
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key or headers.get("upgrade", "").lower() != "websocket":
+            if urlsplit(target).path.endswith("/quote"):
+                self._respond("200 OK", self.server.feed_server.quote(target))
+            else:
+                self._respond("400 Bad Request")
+            return False
+        if self.server.feed_server._refuse():
+            self._respond("503 Service Unavailable")
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + _GUID).encode()).digest()).decode()
+        self.request.sendall(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode())
+        return True
+
+    def _respond(self, status, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.request.sendall(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+
+    def _read_frame(self):
+        first, second = self._recv(2)
+        fin, opcode = first & 0x80, first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self._recv(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._recv(8))[0]
+        mask = self._recv(4) if second & 0x80 else None
+        payload = self._recv(length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return fin, opcode, payload
+
+    def _read_message(self):
+        fin, opcode, payload = self._read_frame()
+        # Control frames may arrive between the fragments of a message.
+        while not fin:
+            fin, more_opcode, more = self._read_frame()
+            if more_opcode == OP_CONTINUATION:
+                payload += more
+            elif more_opcode == OP_PING:
+                self._send_frame(OP_PONG, more)
+                fin = False
+        return opcode, payload
+
+    def _send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        with self._send_lock:
+            self.request.sendall(header + payload)
+
+    def send_text(self, text):
+        self._send_frame(OP_TEXT, text.encode("utf-8"))
+
+    def _on_text(self, text):
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        symbol = message.get("symbol")
+        if message.get("type") == "subscribe" and symbol:
+            self.subscribed.add(symbol)
+            self.server.feed_server.symbols.add(symbol)
+        elif message.get("type") == "unsubscribe":
+            self.subscribed.discard(symbol)
+
+    def _drop(self):
+        # Like a network failure: no close frame, the peer just sees EOF.
+        self.closed.set()
+        try:
+            self.request.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _stream(self):
+        server = self.server.feed_server
+        faults = server.faults
+        started = time.monotonic()
+        idle_since = time.time()
+        try:
+            for offset, trades in server.feed.frames(self.subscribed):
+                if self.closed.is_set():
+                    return
+                wait = started + offset - time.monotonic()
+                if wait > 0:
+                    self.closed.wait(wait)
+                elapsed = time.monotonic() - started
+                if faults.disconnect_every and elapsed >= faults.disconnect_every:
+                    server._dropped()
+                    self._drop()
+                    return
+                if faults.stalled(elapsed):
+                    # Frames produced during a stall are lost, as in an outage.
+                    idle_since = time.time()
+                    self.closed.wait(0.01)
+                    continue
+                quiet = set(sorted(self.subscribed)[:faults.quiet]) if faults.quiet else ()
+                trades = [trade for trade in trades if trade.get("s") in self.subscribed and trade.get("s") not in quiet]
+                now = time.time()
+                if not trades:
+                    if now - idle_since >= IDLE_PING_SECONDS:
+                        self.send_text('{"type":"ping"}')
+                        idle_since = now
+                    elif not self.subscribed:
+                        self.closed.wait(0.05)
+                    continue
+                stamp = int(now * 1000)
+                data = [dict(trade, t=stamp) for trade in trades]
+                self.send_text(json.dumps({"type": "trade", "data": data}))
+                server._sent(data, now)
+                idle_since = now
+        except (WebSocketClosed, OSError):
+            self.closed.set()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeFinnhubServer:
+    """
+    Serves `feed` on ws://host:port (port 0 picks a free one), with
+    optional Faults.
+    """
+
+    def __init__(self, feed, host="127.0.0.1", port=0, faults=None):
+        self.feed = feed
+        self.faults = faults or Faults()
+        self._server = _TCPServer((host, port), _Connection)
+        self._server.feed_server = self
+        self._lock = threading.Lock()
+        self.connections = set()
+        self.symbols = set()  # every symbol ever subscribed
+        self.connects = 0
+        self.drops = 0
+        self.refused = 0
+        self.quote_requests = 0
+        self._refusing = 0
+        self.sent_frames = 0
+        self.sent_trades = 0
+        self._sent_at = {}  # symbol -> deque of (price, epoch seconds)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"ws://{host}:{port}"
+
+    @property
+    def api_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-finnhub", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.closed.set()
+
+    def _opened(self, connection):
+        with self._lock:
+            self.connections.add(connection)
+            self.connects += 1
+
+    def _closed(self, connection):
+        with self._lock:
+            self.connections.discard(connection)
+
+    def _dropped(self):
+        with self._lock:
+            self.drops += 1
+            self._refusing = self.faults.refuse
+
+    def _refuse(self):
+        with self._lock:
+            if self._refusing <= 0:
+                return False
+            self._refusing -= 1
+            self.refused += 1
+            return True
+
+    def quote(self, target):
+        """
+        Finnhub's /quote response for the symbol in the request target,
+        priced at the last trade sent.
+        """
+        symbol = (parse_qs(urlsplit(target).query).get("symbol") or [""])[0]
+        with self._lock:
+            self.quote_requests += 1
+            history = self._sent_at.get(symbol)
+            price = history[-1][0] if history else round(random.uniform(10, 500), 2)
+        return {"c": price, "d": 0, "dp": 0, "h": price, "l": price, "o": price, "pc": price, "t": int(time.time())}
+
+    def _sent(self, trades, when):
+        with self._lock:
+            self.sent_frames += 1
+            self.sent_trades += len(trades)
+            for trade in trades:
+                history = self._sent_at.get(trade["s"])
+                if history is None:
+                    history = self._sent_at[trade["s"]] = deque(maxlen=SENT_HISTORY)
+                history.append((trade["p"], when))
+
+    def sent_at(self, symbol, price):
+        """
+        When `symbol` last traded at `price`, among its recent trades; None
+        if it is no longer remembered.
+        """
+        with self._lock:
+            history = list(self._sent_at.get(symbol, ()))
+        for sent_price, when in reversed(history):
+            if sent_price == price:
+                return when
+        return None
@@ -1,87 +1,98 @@
 # app/jobs/execute_pending_orders.py
-
-from datetime import datetime
-from decimal import Decimal
-from app.models import Order, OrderStatusEnum, OrderTypeEnum, Stock, Holding, db
+import os
+from app.models import Stock
 from app.jobs.is_market_open import is_market_open_now
+from app.services.order_book import order_book
+from app.services.order_execution import fill_pending_orders
+from app.services.money import from_cents
+
+# "book" walks the in-memory order book; "vector" evaluates every pending
+# order in one NumPy pass (see app/services/order_vector.py).
+ORDER_EVALUATION = os.getenv("ORDER_EVALUATION", "book")
 
-def fill_order_immediately(order, fill_price):
+def execute_pending_orders():
     """
-    Fills the order immediately: updates its status, records fill details,
-    updates portfolio cash and holdings.
+    Execute the pending orders whose conditions are met.
+    Orders are looked up through the in-memory order book instead of
+    scanning the orders table:
+      - Market orders (target_price is None) fill if the market is open.
+      - Buy limits fill when current price <= target_price.
+      - Sell limits fill when current price >= target_price.
+    Orders scheduled for the future stay in the book until they are due.
     """
-    now = datetime.utcnow()
-    order.status = OrderStatusEnum.executed
-    order.executed_price = fill_price
-    order.executed_at = now
+    if ORDER_EVALUATION == "vector":
+        fill_orders(vector_fills())
+        return
 
-    portfolio = order.portfolio
-    quantity = Decimal(str(order.quantity))
-    fill_price_decimal = Decimal(str(fill_price))
-    
-    if order.order_type == OrderTypeEnum.buy:
-        cost = quantity * fill_price_decimal
-        # Check funds here if needed; for now we assume that was verified earlier.
-        portfolio.user.cash_balance -= cost
+    # Pick up orders placed or cancelled through the web processes.
+    order_book.sync()
+    order_book.release_due()
 
-        # Update holdings: if a holding exists, add quantity; else, create a new one.
-        holding = next((h for h in portfolio.holdings if h.stock_id == order.stock_id), None)
-        if holding:
-            holding.quantity += quantity
-        else:
-            new_holding = Holding(
-                portfolio_id=portfolio.id,
-                stock_id=order.stock_id,
-                quantity=quantity,
-                created_at=now,
-                updated_at=now
-            )
-            db.session.add(new_holding)
-    elif order.order_type == OrderTypeEnum.sell:
-        proceeds = quantity * fill_price_decimal
-        portfolio.user.cash_balance += proceeds
-        holding = next((h for h in portfolio.holdings if h.stock_id == order.stock_id), None)
-        if holding:
-            holding.quantity -= quantity
-            # Optionally remove holding if quantity becomes 0
-    # (Optional: add notifications, logging, etc.)
+    market_orders = order_book.market_orders() if is_market_open_now() else {}
+    limit_stock_ids = order_book.limit_stock_ids()
+    stock_ids = limit_stock_ids | set(market_orders)
+    if not stock_ids:
+        return
 
-def execute_pending_orders():
+    # One query for the prices of every stock that has something resting on it.
+    prices = dict(
+        Stock.query
+        .with_entities(Stock.id, Stock.market_price)
+        .filter(Stock.id.in_(stock_ids))
+        .all()
+    )
+
+    fills = {}  # order_id -> fill price
+    for stock_id in limit_stock_ids:
+        current_price = prices.get(stock_id)
+        if current_price is None:
+            continue  # No stock info available; skip
+        for order_id in order_book.crossing(stock_id, current_price):
+            fills[order_id] = current_price
+    for stock_id, order_ids in market_orders.items():
+        current_price = prices.get(stock_id)
+        if current_price is None:
+            continue
+        for order_id in order_ids:
+            fills[order_id] = current_price
+
+    fill_orders(fills)
+
+
+def vector_fills(market_open=None):
     """
-    Fetch all pending orders and execute them if conditions are met.
-    For market orders (target_price is None), execute immediately if the market is open.
-    For limit orders, check:
-      - Buy: current price <= target_price
-      - Sell: current price >= target_price
+    Same rules as the book path, evaluated over columnar arrays: one
+    query for the pending orders, one for their prices, one vectorized
+    mask. Returns {order_id: fill price}.
     """
-    pending_orders = Order.query.filter(Order.status == OrderStatusEnum.pending).all()
+    from app.services.order_vector import PendingOrderArrays, price_vector
 
-    for order in pending_orders:
-        # Skip orders scheduled for the future
-        if order.scheduled_time and order.scheduled_time > datetime.utcnow():
-            continue
+    orders = PendingOrderArrays.load()
+    if not len(orders):
+        return {}
+    prices = dict(
+        Stock.query
+        .with_entities(Stock.id, Stock.market_price)
+        .filter(Stock.id.in_(set(orders.stock_id.tolist())))
+        .all()
+    )
+    if market_open is None:
+        market_open = is_market_open_now()
+    order_ids, cents = orders.fillable(price_vector(prices), market_open=market_open)
+    return {order_id: from_cents(price) for order_id, price in zip(order_ids.tolist(), cents.tolist())}
 
-        stock = Stock.query.get(order.stock_id)
-        if not stock:
-            continue  # No stock info available; skip
 
-        # Convert current market price to Decimal for safe comparison
-        current_price = Decimal(str(stock.market_price))
-        
-        if order.target_price is None:
-            # Market order: execute if the market is open.
-            if is_market_open_now():
-                fill_order_immediately(order, current_price)
-        else:
-            # Limit order: convert target_price to Decimal
-            target_price = Decimal(str(order.target_price))
-            if order.order_type == OrderTypeEnum.buy:
-                # For a buy limit order, execute if the current price is at or below target.
-                if current_price <= target_price:
-                    fill_order_immediately(order, current_price)
-            elif order.order_type == OrderTypeEnum.sell:
-                # For a sell limit order, execute if the current price is at or above target.
-                if current_price >= target_price:
-                    fill_order_immediately(order, current_price)
-    
-    db.session.commit()
+def fill_orders(fills):
+    """
+    Fill a batch of matched orders in a single transaction.
+    `fills` maps order_id -> fill price. Orders that are no longer pending
+    (cancelled or filled elsewhere) are skipped. Rows are locked and
+    conflicts retried by the order execution service. Returns the filled orders.
+    """
+    if not fills:
+        return []
+
+    orders = fill_pending_orders(fills)
+    for order_id in fills:
+        order_book.remove(order_id)
+    return orders
@@ -1,20 +1,10 @@
 # app/jobs/is_market_open.py
-import pytz
-from datetime import datetime, time
+from app.services.market_calendar import market_calendar
 
 def is_market_open_now():
     """
-    Simple check: Monday–Friday, 9:30am–4:00pm US/Eastern (no holiday checks).
+    True during an NYSE session: 9:30am-4:00pm US/Eastern on trading days,
+    closing at 1:00pm on early-close days and closed on holidays.
+    A bisect lookup in the precomputed session table.
     """
-    eastern = pytz.timezone("US/Eastern")
-    now_et = datetime.now(eastern)
-
-    # Monday=0, Tuesday=1, ... Sunday=6
-    if now_et.weekday() >= 5:  # Saturday or Sunday
-        return False
-
-    market_open = time(9, 30)  # 9:30 AM
-    market_close = time(16, 0) # 4:00 PM
-    current_time = now_et.time()
-
-    return (market_open <= current_time <= market_close)
+    return market_calendar.is_open()
@@ -1,31 +1,79 @@
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.models import db, Stock
-import finnhub  # Import the finnhub package directly
+from app.services.price_writer import write_prices, ticker_index
+from app.services.price_cache import price_cache
+from app.services.money import from_cents, to_cents
+from app.services.quote_fetcher import get_quote_refresher
+from app.services.order_book import order_book
+from app.services.live_updates import active_viewers, publish_price_batch
 from flask import current_app
 
+# Stocks without resting orders or viewers are re-polled at most this often.
+BACKGROUND_POLL_MINUTES = int(os.getenv("PRICE_POLL_BACKGROUND_MINUTES", "30"))
+
+def priority_stock_ids():
+    """
+    Stocks whose prices matter right now: those with resting orders and
+    those open in somebody's browser.
+    """
+    return order_book.stock_ids() | active_viewers.stock_ids()
+
+def refresh_quotes(symbols, ids=None):
+    """
+    Fetch REST quotes for `symbols`, write them to the stocks table and the
+    price cache, and publish them to the web processes like a feed flush.
+    `ids` maps tickers to stock ids (default: the ticker index).
+    Returns {ticker: price} for the symbols that got a price.
+    Must run inside an application context.
+    """
+    refresher = get_quote_refresher()
+    quotes = refresher.fetch(symbols)
+    prices = {}  # stock_id -> price
+    polled = {}  # ticker -> stock_id
+    for symbol, quote in quotes.items():
+        current_price = quote.get("c")
+        stock_id = ids.get(symbol) if ids is not None else ticker_index.lookup(symbol)
+        if current_price and stock_id:
+            prices[stock_id] = from_cents(to_cents(current_price))
+            polled[symbol] = stock_id
+
+    now = datetime.utcnow()
+    write_prices(prices, now=now)
+    db.session.commit()
+    ticker_index.remember(prices)
+    for symbol, stock_id in polled.items():
+        price_cache.update(symbol, prices[stock_id], stock_id=stock_id, source="rest", timestamp=now)
+    refresher.mark_polled(quotes.keys(), now)
+    if prices:
+        publish_price_batch(prices, {stock_id: symbol for symbol, stock_id in polled.items()}, source="rest")
+    return {symbol: prices[stock_id] for symbol, stock_id in polled.items()}
+
 def update_stock_prices():
     """
     Uses Finnhub's REST API to fetch the latest quote for each seeded stock
     and updates the market price and last_updated timestamp in the DB.
+    Quotes are fetched concurrently through the shared, rate-limited
+    QuoteRefresher; symbols the WebSocket feed is already keeping fresh are
+    skipped, and all new prices are written with one bulk UPDATE.
+    Priority stocks (priority_stock_ids) are polled on every run and
+    fetched first; the others at most every BACKGROUND_POLL_MINUTES.
     This function must run inside an application context.
     """
     with current_app.app_context():
         print("Running scheduled price update...")
-        stocks = Stock.query.all()
-        now = datetime.utcnow()
-        for stock in stocks:
-            try:
-                # Reinitialize the client for each call to avoid caching issues.
-                api_key = os.getenv("FINNHUB_API_KEY")
-                client = finnhub.Client(api_key=api_key)
-                quote = client.quote(stock.ticker_symbol)
-                print(f"Quote for {stock.ticker_symbol}: {quote}")  # Debug output
-                current_price = quote.get("c")
-                if current_price is not None:
-                    stock.market_price = current_price
-                    stock.last_updated = now
-                    print(f"Updated {stock.ticker_symbol} to {current_price}")
-            except Exception as e:
-                print(f"Error updating {stock.ticker_symbol}: {e}")
-        db.session.commit()
+        refresher = get_quote_refresher()
+        stocks = Stock.query.with_entities(Stock.id, Stock.ticker_symbol).all()
+        ids = {ticker: stock_id for stock_id, ticker in stocks}
+        priority = priority_stock_ids()
+        stale = refresher.stale_symbols(ids.keys())
+        urgent = [symbol for symbol in stale if ids[symbol] in priority]
+        background = refresher.due_symbols(
+            [symbol for symbol in stale if ids[symbol] not in priority],
+            timedelta(minutes=BACKGROUND_POLL_MINUTES), datetime.utcnow())
+        symbols = urgent + background
+
+        # The pool takes symbols in order, so priority ones get the rate limit's tokens first.
+        prices = refresh_quotes(symbols, ids)
+        print(f"Updated {len(prices)} of {len(symbols)} polled stocks ({len(urgent)} priority, "
+              f"{len(stocks) - len(stale)} fresh from WS, {len(stale) - len(symbols)} not due)")
@@ -5,4 +5,5 @@ from .stock import Stock
 from .holding import Holding
 from .watchlist import Watchlist
 from .watchlist_stock import WatchlistStock
-from .order import Order, OrderTypeEnum, OrderStatusEnum
\ No newline at end of file
+from .order import Order, OrderTypeEnum, OrderStatusEnum
+from .price_bar import PriceBar, BAR_INTERVALS
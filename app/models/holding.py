@@ -19,6 +19,10 @@ class Holding(db.Model):
     quantity = db.Column(db.Numeric(15,4), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Optimistic lock, see Portfolio.version.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
 
     def to_dict(self):
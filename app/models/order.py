@@ -15,7 +15,20 @@ class OrderStatusEnum(enum.Enum):
 class Order(db.Model):
     __tablename__ = 'orders'
     if environment == "production":
-        __table_args__ = {'schema': SCHEMA}
+        __table_args__ = (
+            db.Index('idx_orders_portfolio_created', 'portfolio_id', 'created_at'),
+            db.Index('idx_orders_status_stock', 'status', 'stock_id'),
+            db.Index('idx_orders_updated_at', 'updated_at'),
+            db.Index('idx_orders_portfolio_idempotency_key', 'portfolio_id', 'idempotency_key', unique=True),
+            {'schema': SCHEMA}
+        )
+    else:
+        __table_args__ = (
+            db.Index('idx_orders_portfolio_created', 'portfolio_id', 'created_at'),
+            db.Index('idx_orders_status_stock', 'status', 'stock_id'),
+            db.Index('idx_orders_updated_at', 'updated_at'),
+            db.Index('idx_orders_portfolio_idempotency_key', 'portfolio_id', 'idempotency_key', unique=True),
+        )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     portfolio_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('portfolios.id')), nullable=False)
@@ -29,6 +42,12 @@ class Order(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     executed_at = db.Column(db.DateTime, nullable=True)          # When the order was actually filled
+    idempotency_key = db.Column(db.String(64), nullable=True)    # Client-supplied; replays return the original order
+    # Optimistic lock, see Portfolio.version: two sweeps that both read the
+    # order as pending cannot both fill it.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     def to_dict(self):
         return {
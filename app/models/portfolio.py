@@ -1,6 +1,8 @@
 from datetime import datetime
 from .db import db, environment, SCHEMA, add_prefix_for_prod
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
+from app.services.money import to_cents, cents_to_float
+from app.services.price_cache import price_cache
 
 class Portfolio(db.Model):
     __tablename__ = 'portfolios'
@@ -16,53 +18,70 @@ class Portfolio(db.Model):
     initial_investment = db.Column(db.Numeric(15,2), default=Decimal("0.00"))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Optimistic lock: every UPDATE checks and bumps it, so a concurrent
+    # change to the balance raises StaleDataError instead of being lost.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Relationships
     user = db.relationship('User', backref='portfolios')
     holdings = db.relationship('Holding', backref='portfolio', cascade="all, delete-orphan")
     orders = db.relationship('Order', backref='portfolio', cascade="all, delete-orphan")
 
-    def to_dict(self):
-        # Calculate the total value of holdings.
-        holdings_value = Decimal("0.00")
+    def holdings_value(self):
+        """
+        Value of the holdings at the latest known prices, as an unrounded Decimal.
+        Quantity times price in Decimal is exact at these scales; to_dict()
+        rounds the sum to a cent once.
+        """
+        total = Decimal(0)
         if self.holdings:
             for holding in self.holdings:
-                if holding.stock and holding.stock.market_price is not None:
-                    try:
-                        price = Decimal(str(holding.stock.market_price))
-                    except Exception:
-                        price = Decimal("0.00")
-                    try:
-                        qty = Decimal(str(holding.quantity))
-                    except Exception:
-                        qty = Decimal("0.00")
-                    holdings_value += qty * price
+                # Whichever of the cache and the stock row is newer, as in Stock.to_dict().
+                stock = holding.stock
+                price, _ = price_cache.resolve_id(
+                    holding.stock_id,
+                    stock.market_price if stock else None,
+                    stock.last_updated if stock else None,
+                )
+                if price is None:
+                    continue
+                if holding.quantity is not None:
+                    total += holding.quantity * price
+        return total
+
+    def to_dict(self, holdings_value=None, include=("holdings", "orders")):
+        # Calculate the total value of holdings, unless the valuation service
+        # already computed it for many portfolios in one query.
+        # `include` names the relationships to embed; the others are never loaded.
+        if holdings_value is None:
+            holdings_value = self.holdings_value()
 
-        # Use portfolio_balance as current cash balance (ensure it's a Decimal).
-        cash_balance = self.portfolio_balance if self.portfolio_balance is not None else Decimal("0.00")
+        # All amounts below are integer cents.
+        # Use portfolio_balance as current cash balance.
+        cash_balance = to_cents(self.portfolio_balance) if self.portfolio_balance is not None else 0
         # Use initial_investment if it exists; otherwise, default it to cash_balance.
-        initial_investment = self.initial_investment if self.initial_investment is not None else cash_balance
+        initial_investment = to_cents(self.initial_investment) if self.initial_investment is not None else cash_balance
 
-        # Total portfolio value: cash available + value of holdings.
-        total_value = cash_balance + holdings_value
+        # Total portfolio value: cash available + value of holdings (rounded to a cent).
+        total_value = cash_balance + to_cents(holdings_value)
         # Gains/Losses: the change relative to the initial investment.
         gains_loss = total_value - initial_investment
 
-        # Round to two decimal places.
-        cash_balance = cash_balance.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        total_value = total_value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        gains_loss = gains_loss.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-        return {
+        data = {
             "id": self.id,
             "user_id": self.user_id,
             "name": self.name,
-            "portfolio_balance": float(cash_balance),
-            "initial_investment": float(initial_investment),
-            "portfolio_value": float(total_value),
-            "gains_loss": float(gains_loss),
+            "portfolio_balance": cents_to_float(cash_balance),
+            "initial_investment": cents_to_float(initial_investment),
+            "portfolio_value": cents_to_float(total_value),
+            "gains_loss": cents_to_float(gains_loss),
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            "holdings": [holding.to_dict() for holding in self.holdings] if self.holdings else [],
-            "orders": [order.to_dict() for order in self.orders] if self.orders else []
         }
+        if "holdings" in include:
+            data["holdings"] = [holding.to_dict() for holding in self.holdings] if self.holdings else []
+        if "orders" in include:
+            data["orders"] = [order.to_dict() for order in self.orders] if self.orders else []
+        return data
@@ -0,0 +1,44 @@
+from datetime import datetime
+from .db import db, environment, SCHEMA, add_prefix_for_prod
+
+# Bar intervals kept in price_bars, with their length in seconds.
+BAR_INTERVALS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+
+class PriceBar(db.Model):
+    __tablename__ = 'price_bars'
+    # One row per stock, interval and bucket start. The unique index doubles as
+    # the lookup index for chart queries; on Postgres it also carries the OHLCV
+    # columns so those reads are index-only.
+    if environment == "production":
+        __table_args__ = (
+            db.Index('idx_price_bars_stock_interval_start', 'stock_id', 'interval', 'start', unique=True,
+                     postgresql_include=['open', 'high', 'low', 'close', 'volume']),
+            {'schema': SCHEMA}
+        )
+    else:
+        __table_args__ = (
+            db.Index('idx_price_bars_stock_interval_start', 'stock_id', 'interval', 'start', unique=True,
+                     postgresql_include=['open', 'high', 'low', 'close', 'volume']),
+        )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    stock_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('stocks.id')), nullable=False)
+    interval = db.Column(db.String(3), nullable=False)  # 1m, 5m, 1h or 1d
+    start = db.Column(db.DateTime, nullable=False)      # bucket start, UTC
+    open = db.Column(db.Numeric(10,2), nullable=False)
+    high = db.Column(db.Numeric(10,2), nullable=False)
+    low = db.Column(db.Numeric(10,2), nullable=False)
+    close = db.Column(db.Numeric(10,2), nullable=False)
+    volume = db.Column(db.Numeric(20,4), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "start": self.start.isoformat(),
+            "open": float(self.open),
+            "high": float(self.high),
+            "low": float(self.low),
+            "close": float(self.close),
+            "volume": float(self.volume),
+        }
@@ -1,5 +1,6 @@
 from datetime import datetime
 from .db import db, environment, SCHEMA
+from app.services.price_cache import price_cache
 
 class Stock(db.Model):
     __tablename__ = 'stocks'
@@ -30,13 +31,15 @@ class Stock(db.Model):
     watchlist_stocks = db.relationship('WatchlistStock', backref='stock', cascade="all, delete-orphan")
 
     def to_dict(self):
+        # Prefer the live price from the in-process cache when it is newer than the row.
+        market_price, last_updated = price_cache.resolve(self.ticker_symbol, self.market_price, self.last_updated)
         return {
             "id": self.id,
             "ticker_symbol": self.ticker_symbol,
             "company_name": self.company_name,
             "sector": self.sector,
-            "market_price": float(self.market_price) if self.market_price is not None else None,
-            "last_updated": self.last_updated.isoformat() if self.last_updated else None,
+            "market_price": float(market_price) if market_price is not None else None,
+            "last_updated": last_updated.isoformat() if last_updated else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
@@ -0,0 +1,105 @@
+# app/services/adaptive_scheduler.py
+"""
+Market-aware cadence for the worker's periodic jobs, on top of
+flask_apscheduler.
+
+Every job declares how often it runs during a session, outside sessions
+(nights and weekends) and on exchange holidays; None pauses it for that
+phase. After each run the job's next run time is set from the current
+phase, and never later than the next phase change, so the fast cadence
+starts right at the open and paused jobs wake up when the phase ends.
+
+Job run time, start lag and run counts are exported through the metrics
+registry, which the worker serves at WORKER_METRICS_PORT.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from app.services.market_calendar import market_calendar
+from app.services.metrics import registry
+
+# Seconds between runs in each market phase; None pauses the job.
+Cadence = namedtuple("Cadence", ["session", "off_hours", "holiday"])
+
+# Job run time and start lag in seconds; refreshes can take a minute or more.
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+job_duration = registry.histogram(
+    "scheduler_job_duration_seconds", "Run time of scheduled jobs.", ["job"], buckets=JOB_BUCKETS)
+job_lag = registry.histogram(
+    "scheduler_job_lag_seconds", "Delay between a job's planned and actual start.", ["job"], buckets=JOB_BUCKETS)
+job_runs = registry.counter(
+    "scheduler_job_runs_total", "Scheduled job runs by market phase and outcome (ok, error, paused).",
+    ["job", "phase", "outcome"])
+job_next_run = registry.gauge(
+    "scheduler_job_next_run_seconds", "Seconds from the end of a job's last run to its next run.", ["job"])
+
+
+class AdaptiveScheduler:
+    """
+    Wraps an (unstarted or running) APScheduler and adds jobs whose
+    cadence follows the market calendar.
+    """
+
+    def __init__(self, scheduler, calendar=market_calendar):
+        self.scheduler = scheduler
+        self.calendar = calendar
+        self._planned = {}  # job id -> epoch seconds its next run is planned for
+
+    def add_job(self, job_id, func, cadence):
+        """
+        Schedule `func` with the given Cadence. The first run is immediate;
+        if the current phase pauses the job it only plans the next one.
+        """
+        now = time.time()
+        self._planned[job_id] = now
+        self.scheduler.add_job(
+            id=job_id,
+            func=self._wrap(job_id, func, cadence),
+            # The interval only matters if a run never gets to reschedule itself.
+            trigger="interval",
+            seconds=cadence.session or 60,
+            next_run_time=datetime.fromtimestamp(now, tz=timezone.utc),
+            coalesce=True,
+            misfire_grace_time=None,
+            replace_existing=True,
+        )
+
+    def next_run(self, cadence, now):
+        """
+        Epoch seconds of the next run for a job with `cadence` that just
+        finished at `now`.
+        """
+        interval = getattr(cadence, self.calendar.phase(now))
+        change = self.calendar.next_phase_change(now)
+        if interval is None:
+            return change
+        return min(now + interval, change)
+
+    def _wrap(self, job_id, func, cadence):
+        def run():
+            started = time.time()
+            phase = self.calendar.phase(started)
+            job_lag.observe(max(0.0, started - self._planned.get(job_id, started)), job=job_id)
+            outcome = "paused"
+            try:
+                if getattr(cadence, phase) is not None:
+                    outcome = "error"
+                    func()
+                    outcome = "ok"
+            finally:
+                finished = time.time()
+                if outcome != "paused":
+                    job_duration.observe(finished - started, job=job_id)
+                job_runs.inc(job=job_id, phase=phase, outcome=outcome)
+                self._reschedule(job_id, cadence, finished)
+        return run
+
+    def _reschedule(self, job_id, cadence, now):
+        planned = max(self.next_run(cadence, now), now + 1)
+        self._planned[job_id] = planned
+        job_next_run.set(round(planned - now, 3), job=job_id)
+        # The scheduler stores the trigger's next run before the job starts;
+        # modify_job waits for that and then overrides it.
+        self.scheduler.modify_job(job_id, next_run_time=datetime.fromtimestamp(planned, tz=timezone.utc))
@@ -0,0 +1,170 @@
+# app/services/broker.py
+"""
+Publish/subscribe between the process that owns the market data feed and
+every web process that serves sockets.
+
+BROKER_URL selects the backend:
+  - memory://          (default) handlers run in-process; single process only
+  - redis://host:6379  Redis (or any server speaking its pub/sub protocol)
+
+With APP_ROLE=web the feed runs in `flask worker`, another process, so the
+in-process broker cannot carry prices or viewer reports between them;
+warn_if_process_local() says so at startup.
+"""
+import json
+import os
+import threading
+import time
+
+BROKER_URL = os.getenv("BROKER_URL", "memory://")
+# A listener that lost Redis resubscribes after this long, doubling per
+# failed attempt up to the maximum.
+RESUBSCRIBE_MIN_SECONDS = 0.5
+RESUBSCRIBE_MAX_SECONDS = 30
+
+PRICES_CHANNEL = "prices"
+VIEWERS_CHANNEL = "viewers"
+
+
+class InMemoryBroker:
+    """
+    Calls subscribers synchronously in the publishing thread. Enough for a
+    single process and for exercising the publish path in benchmarks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = {}  # channel -> [handler]
+
+    def publish(self, channel, message):
+        with self._lock:
+            handlers = list(self._handlers.get(channel, ()))
+        # Round-trip through JSON so subscribers see what Redis would deliver.
+        payload = json.loads(json.dumps(message))
+        for handler in handlers:
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"Broker handler error on {channel}:", e)
+        return len(handlers)
+
+    def subscribe(self, channel, handler):
+        with self._lock:
+            self._handlers.setdefault(channel, []).append(handler)
+
+    def close(self):
+        with self._lock:
+            self._handlers.clear()
+
+
+class RedisBroker:
+    """
+    Redis pub/sub. Each subscribed channel gets a daemon listener thread
+    that decodes messages and calls the handlers, and resubscribes with
+    backoff when the connection drops (a Redis restart or failover).
+    Messages published while it is away are lost; both channels carry
+    snapshots that the next message supersedes.
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("BROKER_URL points at Redis but the redis package is not installed") from e
+        self._redis = redis.Redis.from_url(url)
+        self._connection_errors = (redis.ConnectionError, redis.TimeoutError)
+        self._lock = threading.Lock()
+        self._handlers = {}
+        self._threads = []
+        self._closed = False
+
+    def publish(self, channel, message):
+        return self._redis.publish(channel, json.dumps(message))
+
+    def subscribe(self, channel, handler):
+        with self._lock:
+            first = channel not in self._handlers
+            self._handlers.setdefault(channel, []).append(handler)
+        if first:
+            thread = threading.Thread(target=self._listen, args=(channel,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _listen(self, channel):
+        delay = RESUBSCRIBE_MIN_SECONDS
+        while not self._closed:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(channel)
+                if delay > RESUBSCRIBE_MIN_SECONDS:
+                    print(f"Broker resubscribed to {channel}")
+                delay = RESUBSCRIBE_MIN_SECONDS
+                for item in pubsub.listen():
+                    self._dispatch(channel, item)
+            except self._connection_errors as e:
+                if self._closed:
+                    return
+                print(f"Broker lost {channel}, resubscribing in {delay:.1f}s:", e)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(delay)
+            delay = min(delay * 2, RESUBSCRIBE_MAX_SECONDS)
+
+    def _dispatch(self, channel, item):
+        try:
+            payload = json.loads(item["data"])
+        except (TypeError, ValueError) as e:
+            print(f"Broker dropped undecodable message on {channel}:", e)
+            return
+        with self._lock:
+            handlers = list(self._handlers.get(channel, ()))
+        for handler in handlers:
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"Broker handler error on {channel}:", e)
+
+    def close(self):
+        self._closed = True
+        self._redis.close()
+
+
+def create_broker(url=BROKER_URL):
+    if url.startswith("memory://"):
+        return InMemoryBroker()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported BROKER_URL: {url}")
+
+
+_broker = None
+_broker_lock = threading.Lock()
+_warned = False
+
+
+def warn_if_process_local(url=BROKER_URL):
+    """
+    Warn (once per process) when `url` is the in-process broker although
+    the web app and the worker run in separate processes.
+    """
+    global _warned
+    if _warned or not url.startswith("memory://"):
+        return
+    _warned = True
+    print(f"WARNING: BROKER_URL={url} stays inside this process, so the web app and "
+          "`flask worker` cannot exchange live prices or viewer reports. Set BROKER_URL "
+          "to a Redis URL (e.g. redis://localhost:6379/0), or APP_ROLE=all for one process.")
+
+
+def get_broker():
+    """
+    Process-wide broker, created on first use.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = create_broker()
+        return _broker
@@ -0,0 +1,69 @@
+# app/services/fake_finnhub.py
+"""
+Local stand-in for the Finnhub REST API, used to benchmark the quote
+refresher offline. Only /quote is implemented.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeFinnhubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05):
+        super().__init__((host, port), _FakeFinnhubHandler)
+        self.latency = latency  # simulated upstream latency per request, in seconds
+        self.requests = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _FakeFinnhubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        with self.server._count_lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if not parsed.path.rstrip("/").endswith("/quote") or "symbol" not in params:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        previous_close = round(random.uniform(10, 500), 2)
+        current = round(previous_close * random.uniform(0.97, 1.03), 2)
+        body = json.dumps({
+            "c": current,
+            "h": max(current, previous_close),
+            "l": min(current, previous_close),
+            "o": previous_close,
+            "pc": previous_close,
+            "t": int(time.time()),
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
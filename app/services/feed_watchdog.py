@@ -0,0 +1,130 @@
+# app/services/feed_watchdog.py
+"""
+Keeps the Finnhub feed honest about outages.
+
+    Backoff       jittered exponential delays between reconnect attempts
+    FeedWatchdog  closes a connection that has gone silent (no frame, not
+                  even a ping, for FINNHUB_HEARTBEAT_SECONDS) and, while the
+                  market is open, backfills every wanted symbol the socket
+                  has not delivered a trade for in FINNHUB_STALE_SECONDS
+                  through the batched REST quote path
+
+A symbol that trades at an unchanged price has its last_updated rewritten
+by the flush (see price_writer.LAST_UPDATED_REFRESH_SECONDS), so during
+sessions a subscribed stock's last_updated lags by at most about
+FINNHUB_STALE_SECONDS plus one watchdog tick, connected or not.
+"""
+import os
+import random
+import threading
+import time
+
+from app.services.market_calendar import market_calendar
+from app.services.metrics import registry
+
+RECONNECT_BASE_SECONDS = float(os.getenv("FINNHUB_RECONNECT_BASE_SECONDS", "1"))
+RECONNECT_MAX_SECONDS = float(os.getenv("FINNHUB_RECONNECT_MAX_SECONDS", "60"))
+# A connection that stayed up this long starts the backoff over.
+STABLE_CONNECTION_SECONDS = 30
+HEARTBEAT_SECONDS = float(os.getenv("FINNHUB_HEARTBEAT_SECONDS", "30"))
+STALE_SECONDS = float(os.getenv("FINNHUB_STALE_SECONDS", "120"))
+WATCHDOG_SECONDS = 5
+
+reconnects = registry.counter("feed_reconnects_total", "Finnhub WebSocket reconnect attempts.")
+heartbeat_timeouts = registry.counter("feed_heartbeat_timeouts_total", "Connections closed for going silent.")
+backfilled = registry.counter("feed_backfilled_symbols_total", "Stale symbols refreshed through REST quotes.")
+stale_symbols = registry.gauge("feed_stale_symbols", "Wanted symbols without a fresh price at the last check.")
+
+
+class Backoff:
+    """
+    "Full jitter" backoff: the n-th consecutive delay is uniform in
+    [0, min(cap, base * 2**n)], so reconnecting clients spread out.
+    """
+
+    def __init__(self, base=RECONNECT_BASE_SECONDS, cap=RECONNECT_MAX_SECONDS):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+
+    def next(self):
+        # The exponent stops growing long before the float would overflow;
+        # past the cap it makes no difference anyway.
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** min(self.attempts, 30)))
+        self.attempts += 1
+        return delay
+
+    def reset(self):
+        self.attempts = 0
+
+
+class FeedWatchdog:
+    """
+    Heartbeat and per-symbol freshness for one feed. `wanted()` returns the
+    tickers that should be live, `backfill(tickers)` refreshes them (inside
+    an app context) and `close()` drops the current connection.
+    `heartbeat` and `stale` default to the module settings at creation.
+    """
+
+    def __init__(self, wanted, backfill, close, is_open=market_calendar.is_open, heartbeat=None, stale=None):
+        self.wanted = wanted
+        self.backfill = backfill
+        self.close = close
+        self.is_open = is_open
+        self.heartbeat = heartbeat or HEARTBEAT_SECONDS
+        self.stale = stale or STALE_SECONDS
+        self.connected = False
+        self.last_frame = time.monotonic()
+        self._written = {}  # ticker -> monotonic time its price was last written
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def opened(self):
+        self.connected = True
+        self.last_frame = time.monotonic()
+
+    def closed(self):
+        self.connected = False
+
+    def frame(self):
+        # Called for every frame on the socket thread; keep it an assignment.
+        self.last_frame = time.monotonic()
+
+    def written(self, tickers, now=None):
+        now = now or time.monotonic()
+        with self._lock:
+            for ticker in tickers:
+                self._written[ticker] = now
+
+    def stale_tickers(self, now=None):
+        now = now or time.monotonic()
+        with self._lock:
+            return sorted(
+                ticker for ticker in self.wanted()
+                if now - self._written.get(ticker, self._started) >= self.stale
+            )
+
+    def check(self, now=None):
+        """
+        One watchdog pass. Returns the tickers it backfilled.
+        """
+        now = now or time.monotonic()
+        if self.connected and now - self.last_frame >= self.heartbeat:
+            print(f"Feed silent for {now - self.last_frame:.0f}s, reconnecting")
+            heartbeat_timeouts.inc()
+            self.connected = False
+            self.close()
+        if not self.is_open():
+            stale_symbols.set(0)
+            return []
+        stale = self.stale_tickers(now)
+        stale_symbols.set(len(stale))
+        if not stale:
+            return []
+        refreshed = self.backfill(stale)
+        # Symbols REST could not price wait a full stale window too, rather
+        # than spending quota on every pass.
+        self.written(stale, now)
+        backfilled.inc(len(refreshed))
+        print(f"Backfilled {len(refreshed)} of {len(stale)} stale symbols over REST")
+        return refreshed
@@ -1,6 +0,0 @@
-# app/services/finnhub_api.py
-import os
-import finnhub
-
-FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
-finnhub_client = finnhub.Client(api_key=FINNHUB_API_KEY)
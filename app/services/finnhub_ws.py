@@ -1,108 +1,185 @@
 import os
-import json
+import socket
 import websocket
 import threading
 import time
-from datetime import datetime
-from app.models import db, Stock  # Ensure your models are properly defined
+from app.models import db
+from app.services.order_matching import match_price_batch
+from app.services.price_writer import flush_price_updates, ticker_index
+from app.services.price_history import bar_aggregator
+from app.services.live_updates import publish_price_batch
+from app.services.ingest import IngestPipeline, FrameRecorder
+from app.services.subscriptions import SubscriptionManager, SUBSCRIPTION_REFRESH_SECONDS
+from app.services.feed_watchdog import Backoff, FeedWatchdog, STABLE_CONNECTION_SECONDS, WATCHDOG_SECONDS, reconnects
+from app.services.market_calendar import market_calendar
+from app.jobs.update_stock_prices import refresh_quotes
 from flask import current_app
 
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
+# Point at `flask feed serve` to run against the local stand-in.
+FINNHUB_WS_URL = os.getenv("FINNHUB_WS_URL", "wss://ws.finnhub.io")
 # Change the update interval to 3 seconds (adjust as needed)
 UPDATE_INTERVAL_SECONDS = 3
+# Set to a path to append every raw frame to it, for `flask bench ingest --file`.
+RECORD_FILE = os.getenv("FINNHUB_RECORD_FILE")
 
-# Global dictionary to hold the latest update for each ticker.
-# Each key is the ticker symbol, and the value is a tuple (price, update_time)
-stock_updates = {}
-# Lock to synchronize access to stock_updates
-stock_updates_lock = threading.Lock()
 
-def run_finnhub_ws(app):
+def close_connection(ws_app):
+    """
+    End ws_app's connection from another thread. WebSocketApp.close()
+    closes the socket under run_forever, which then sleeps in select() for
+    up to ping_timeout; a shutdown wakes it, and it tears down itself.
+    Does nothing before the first connection attempt (ws_app is None).
+    """
+    if ws_app is None:
+        return
+    ws_app.keep_running = False
+    sock = ws_app.sock
+    if sock and sock.sock:
+        try:
+            sock.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def run_finnhub_ws(app, url=None, pipeline=None, market_open=None, stop=None):
     """
     Connect to Finnhub's WebSocket, subscribe to all symbols in the DB,
     collect stock price updates, and trigger live UI updates in batches.
+    `url` and `pipeline` default to Finnhub and a new IngestPipeline;
+    `market_open` (default: the market calendar) gates REST backfill.
+    Runs until `stop` (a threading.Event, default: never set) is set.
     """
+    stop = stop or threading.Event()
     with app.app_context():
-        finnhub_ws_url = f"wss://ws.finnhub.io?token={FINNHUB_API_KEY}"
+        finnhub_ws_url = f"{url or FINNHUB_WS_URL}?token={FINNHUB_API_KEY}"
+        # The socket thread only enqueues raw frames; a decoder thread parses
+        # them and keeps last/high/low/volume per ticker until the next flush.
+        if pipeline is None:
+            pipeline = IngestPipeline(recorder=FrameRecorder(RECORD_FILE) if RECORD_FILE else None)
+        pipeline.start()
 
         def on_message(ws, message):
-            try:
-                data = json.loads(message)
-                if data.get("data"):
-                    for trade in data["data"]:
-                        ticker = trade.get("s")
-                        price = trade.get("p")
-                        trade_timestamp = trade.get("t") / 1000.0
-                        trade_time = datetime.utcfromtimestamp(trade_timestamp)
-                        # Store/update the latest price for the ticker in our shared dictionary.
-                        with stock_updates_lock:
-                            stock_updates[ticker] = (price, trade_time)
-                else:
-                    print("Received non-trade message:", data)
-            except Exception as e:
-                print("WebSocket processing error:", e)
+            watchdog.frame()
+            pipeline.feed(message)
 
         def on_error(ws, error):
             print("WebSocket error:", error)
 
+        # Only symbols somebody holds, watches, has orders on or is viewing.
+        subscriptions = SubscriptionManager()
+
         def on_close(ws, close_status_code, close_msg):
             print("WebSocket closed:", close_status_code, close_msg)
+            watchdog.closed()
+            subscriptions.disconnect()
 
         def on_open(ws):
+            if stop.is_set():
+                ws.close()
+                return
             print("Global WS connection opened")
-            # Subscribe to all ticker symbols from the DB.
-            all_stocks = Stock.query.all()
-            for stock in all_stocks:
-                symbol = stock.ticker_symbol
-                subscribe_message = json.dumps({"type": "subscribe", "symbol": symbol})
-                ws.send(subscribe_message)
-                print(f"Subscribed to {symbol}")
+            watchdog.opened()
+            # Subscriptions do not survive the connection; start from none.
+            # They go out in paced batches, hot symbols first.
+            subscriptions.connect(ws.send)
+            subscriptions.refresh()
+
+        # The current connection attempt; None until the first one.
+        ws_app = None
+
+        # Reconnects when the feed goes silent and, during sessions, keeps
+        # every wanted stock's price written at least every FINNHUB_STALE_SECONDS,
+        # over REST when the socket is not delivering it.
+        watchdog = FeedWatchdog(
+            wanted=lambda: subscriptions.target,
+            backfill=refresh_quotes,
+            close=lambda: close_connection(ws_app),
+            is_open=market_open or market_calendar.is_open,
+        )
+
+        def watch_feed():
+            while not stop.wait(WATCHDOG_SECONDS):
+                with app.app_context():
+                    try:
+                        watchdog.check()
+                    except Exception as e:
+                        print("Feed watchdog error:", e)
+            # Stopping: end the current connection so the reconnect loop exits.
+            close_connection(ws_app)
+
+        # Picks up new interest (and drops stale symbols) between reconnects.
+        def refresh_subscriptions():
+            while not stop.wait(SUBSCRIPTION_REFRESH_SECONDS):
+                with app.app_context():
+                    try:
+                        subscriptions.refresh()
+                    except Exception as e:
+                        print("Subscription refresh error:", e)
 
         # Function that will run in a separate thread to process batched updates.
         def process_stock_updates():
-            while True:
-                # Wait for the defined interval (3 seconds) before processing updates.
-                time.sleep(UPDATE_INTERVAL_SECONDS)
+            # Wait for the defined interval (3 seconds) before processing updates.
+            while not stop.wait(UPDATE_INTERVAL_SECONDS):
                 # Use the app context because we're doing DB operations.
                 with app.app_context():
-                    # Retrieve and clear the updates atomically.
-                    with stock_updates_lock:
-                        updates = stock_updates.copy()
-                        stock_updates.clear()
-                    for ticker, (price, update_time) in updates.items():
-                        stock = Stock.query.filter_by(ticker_symbol=ticker).first()
-                        if stock:
-                            # Only update if the price has changed.
-                            if stock.market_price != price:
-                                stock.market_price = price
-                                stock.last_updated = datetime.utcnow()
-                                db.session.commit()
-                                print(f"WS Updated {ticker} to {price} at {update_time}")
-                                # Emit a 'stock_update' event for live UI updates.
-                                socketio = app.config.get("socketio")
-                                if socketio:
-                                    socketio.emit("stock_update", stock.to_dict())
-                        else:
-                            print(f"Ignored update for unseeded ticker: {ticker}")
+                    # One failed flush (DB or broker down) must not stop the
+                    # thread; the next interval starts from a clean session.
+                    try:
+                        flush_interval()
+                    except Exception as e:
+                        db.session.rollback()
+                        print("Price flush error:", e)
+
+        def flush_interval():
+            # Everything traded since the last flush, per ticker.
+            updates = {ticker: (stats.last, stats.time) for ticker, stats in pipeline.drain().items()}
+            # Resolve tickers in memory and write every changed price
+            # with one bulk UPDATE and a single commit.
+            ticked, changed = flush_price_updates(updates)
+            tickers = {ticker_index.lookup(ticker): ticker for ticker in updates}
+            # Hand the batch to every web process; each one sends
+            # {id, price, ts} deltas to its own ticker rooms.
+            if changed:
+                publish_price_batch(changed, tickers)
+            # A symbol trading at an unchanged price is live too; only
+            # symbols the socket stopped delivering need a REST backfill.
+            watchdog.written(tickers[stock_id] for stock_id in ticked)
+            # Persist the bars touched during this interval in one upsert.
+            bar_aggregator.flush()
+            # Fill the limit orders these prices crossed, in one transaction.
+            filled = match_price_batch(ticked)
+            if filled:
+                print(f"WS matched {len(filled)} orders across {len(ticked)} tickers")
 
         # Start the thread for processing updates.
         updater_thread = threading.Thread(target=process_stock_updates, daemon=True)
         updater_thread.start()
+        threading.Thread(target=refresh_subscriptions, daemon=True).start()
+        threading.Thread(target=watch_feed, daemon=True).start()
 
-        # Setup the WebSocketApp.
-        ws_app = websocket.WebSocketApp(
-            finnhub_ws_url,
-            on_message=on_message,
-            on_error=on_error,
-            on_close=on_close,
-        )
-        ws_app.on_open = on_open
-
-        # Implement a reconnection loop.
-        while True:
+        # Reconnect with jittered exponential backoff, so a Finnhub outage
+        # does not turn into a reconnect storm; a stable connection resets it.
+        backoff = Backoff()
+        while not stop.is_set():
+            # A fresh WebSocketApp per attempt; one whose handshake failed
+            # refuses to run again.
+            ws_app = websocket.WebSocketApp(
+                finnhub_ws_url,
+                on_message=on_message,
+                on_error=on_error,
+                on_close=on_close,
+            )
+            ws_app.on_open = on_open
+            connected_at = time.monotonic()
             try:
                 ws_app.run_forever(ping_interval=30, ping_timeout=10)
             except Exception as e:
                 print("WebSocket encountered exception:", e)
-            print("Reconnecting in 5 seconds...")
-            time.sleep(5)
+            if time.monotonic() - connected_at >= STABLE_CONNECTION_SECONDS:
+                backoff.reset()
+            delay = backoff.next()
+            print(f"Reconnecting in {delay:.1f} seconds...")
+            reconnects.inc()
+            stop.wait(delay)
+        pipeline.stop()
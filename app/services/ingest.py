@@ -0,0 +1,327 @@
+# app/services/ingest.py
+"""
+Staged ingest for the Finnhub trade feed.
+
+    reader     the WebSocket callback; only appends the raw frame to a
+               bounded ring buffer
+    decoder    one thread; parses frames in batches (orjson when it is
+               installed, the json module otherwise), updates the price
+               cache and the OHLCV bars, and folds every trade into
+    aggregator last/high/low/volume per ticker since the previous drain,
+               which the flush loop writes to the database
+
+When the ring is full the reader waits up to RING_PUT_TIMEOUT for the
+decoder, which pushes back on the socket, and only then drops the oldest
+frame. Depth, drops and per-stage latency go to the metrics registry, which
+the worker serves at WORKER_METRICS_PORT; the decoder publishes them once
+per batch so the reader stays a counter bump and an append.
+
+Frames can be recorded to a file (one "<epoch seconds>\\t<frame>" per line)
+and replayed through the same stages, see read_frames().
+"""
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+from app.services.metrics import registry
+from app.services.price_cache import price_cache
+from app.services.price_history import bar_aggregator
+
+try:
+    import orjson
+    loads = orjson.loads
+    DECODER = "orjson"
+except ImportError:
+    loads = json.loads
+    DECODER = "json"
+
+RING_CAPACITY = int(os.getenv("INGEST_RING_CAPACITY", "10000"))
+RING_PUT_TIMEOUT = float(os.getenv("INGEST_PUT_TIMEOUT", "0.5"))
+# Frames the decoder takes from the ring at a time.
+DECODE_BATCH = 256
+
+# Stage latencies are usually micro- to milliseconds.
+STAGE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+queue_depth = registry.gauge("ingest_queue_depth", "Frames waiting in the ingest ring buffer.")
+frames_total = registry.counter("ingest_frames_total", "Frames received from the feed.")
+frames_dropped = registry.counter("ingest_frames_dropped_total", "Frames dropped because the ring buffer stayed full.")
+decode_errors = registry.counter("ingest_decode_errors_total", "Frames that could not be decoded.")
+trades_total = registry.counter("ingest_trades_total", "Trades decoded from the feed.")
+stage_seconds = registry.histogram(
+    "ingest_stage_seconds",
+    "Ingest stage latency per decoder batch: queue (oldest frame's wait in the ring), decode and aggregate (per frame).",
+    ["stage"], buckets=STAGE_BUCKETS)
+
+# Everything traded in one ticker since the last drain.
+TickerStats = namedtuple("TickerStats", ["last", "high", "low", "volume", "trades", "time"])
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class FrameRing:
+    """
+    Bounded FIFO of (received at, raw frame). put() waits for room up to
+    `timeout` and then evicts the oldest frame.
+    """
+
+    def __init__(self, capacity=RING_CAPACITY, timeout=RING_PUT_TIMEOUT):
+        self.capacity = capacity
+        self.timeout = timeout
+        self.dropped = 0
+        self._frames = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def put(self, frame, received=None):
+        """
+        Returns False if a frame had to be dropped to make room.
+        """
+        item = (received or time.perf_counter(), frame)
+        kept = True
+        with self._lock:
+            if len(self._frames) >= self.capacity:
+                self._not_full.wait_for(lambda: len(self._frames) < self.capacity, self.timeout)
+                if len(self._frames) >= self.capacity:
+                    self._frames.popleft()
+                    self.dropped += 1
+                    kept = False
+            self._frames.append(item)
+            self._not_empty.notify()
+        return kept
+
+    def get_batch(self, limit=DECODE_BATCH, timeout=None):
+        """
+        Up to `limit` frames, oldest first; waits up to `timeout` for the
+        first one (forever if None). Returns [] on timeout.
+        """
+        with self._lock:
+            if not self._frames and not self._not_empty.wait_for(lambda: self._frames, timeout):
+                return []
+            batch = [self._frames.popleft() for _ in range(min(limit, len(self._frames)))]
+            self._not_full.notify_all()
+            return batch
+
+
+class TradeAggregator:
+    """
+    last/high/low/volume per ticker, accumulated from every trade and
+    handed out (and reset) by drain().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}  # ticker -> [last, high, low, volume, trades, epoch seconds]
+
+    def add_trades(self, trades):
+        """
+        Fold (ticker, price, volume, epoch seconds) tuples in, in order.
+        """
+        with self._lock:
+            stats = self._stats
+            for ticker, price, volume, ts in trades:
+                entry = stats.get(ticker)
+                if entry is None:
+                    stats[ticker] = [price, price, price, volume, 1, ts]
+                    continue
+                entry[0] = price
+                if price > entry[1]:
+                    entry[1] = price
+                if price < entry[2]:
+                    entry[2] = price
+                entry[3] += volume
+                entry[4] += 1
+                entry[5] = ts
+
+    def drain(self):
+        """
+        {ticker: TickerStats} since the previous drain.
+        """
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        return {
+            ticker: TickerStats(last, high, low, volume, trades, datetime.utcfromtimestamp(ts))
+            for ticker, (last, high, low, volume, trades, ts) in stats.items()
+        }
+
+
+class IngestPipeline:
+    """
+    The reader, decoder and aggregator stages wired together.
+    `cache` and `bars` default to the process-wide price cache and bar
+    aggregator; pass others (or None) to keep a replay side-effect free.
+    """
+
+    def __init__(self, capacity=RING_CAPACITY, timeout=RING_PUT_TIMEOUT, cache=price_cache, bars=bar_aggregator,
+                 recorder=None):
+        self.ring = FrameRing(capacity, timeout)
+        self.aggregator = TradeAggregator()
+        self.cache = cache
+        self.bars = bars
+        self.recorder = recorder
+        self.frames = 0     # fed by the reader
+        self.processed = 0  # through the decoder
+        self.trades = 0
+        self.errors = 0
+        self._reported = (0, 0)  # frames, dropped already counted in the metrics
+        self._thread = None
+        self._stopping = False
+
+    def feed(self, frame):
+        """
+        Reader stage: runs on the WebSocket thread, so it does nothing else.
+        """
+        self.frames += 1
+        if self.recorder:
+            self.recorder.write(frame)
+        self.ring.put(frame)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ingest-decoder", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._stopping = False
+
+    def _run(self):
+        while not self._stopping:
+            batch = self.ring.get_batch(timeout=0.2)
+            if batch:
+                # Losing one batch beats stopping ingest: the ring would fill
+                # and every feed() would then wait out RING_PUT_TIMEOUT.
+                try:
+                    self.process(batch)
+                except Exception as e:
+                    self.errors += len(batch)
+                    decode_errors.inc(len(batch))
+                    print("Ingest batch error:", e)
+            self.report()
+
+    def report(self):
+        """
+        Publish the reader's counters and the ring depth.
+        """
+        frames, dropped = self.frames, self.ring.dropped
+        if frames != self._reported[0] or dropped != self._reported[1]:
+            frames_total.inc(frames - self._reported[0])
+            frames_dropped.inc(dropped - self._reported[1])
+            self._reported = (frames, dropped)
+        queue_depth.set(len(self.ring))
+
+    def process(self, batch):
+        """
+        Decoder and aggregator stages for a list of (received at, frame).
+        Returns the number of trades.
+        """
+        decoded = time.perf_counter()
+        if batch:
+            stage_seconds.observe(decoded - batch[0][0], stage="queue")
+        trades = []
+        for _, frame in batch:
+            try:
+                message = loads(frame)
+            except ValueError:
+                self.errors += 1
+                decode_errors.inc()
+                continue
+            data = message.get("data") if isinstance(message, dict) else None
+            if not data:
+                if not isinstance(message, dict) or message.get("type") != "ping":
+                    print("Received non-trade message:", message)
+                continue
+            for trade in data:
+                try:
+                    ticker, price, volume, ts = trade["s"], trade["p"], trade.get("v") or 0, trade["t"]
+                except (KeyError, TypeError):
+                    ticker = None
+                # A null or string price would fail in the aggregator and
+                # take the whole batch (and the decoder thread) with it.
+                if not (isinstance(ticker, str) and _is_number(price) and _is_number(volume) and _is_number(ts)):
+                    self.errors += 1
+                    decode_errors.inc()
+                    continue
+                trades.append((ticker, price, volume, ts / 1000.0))
+        aggregated = time.perf_counter()
+        if batch:
+            stage_seconds.observe((aggregated - decoded) / len(batch), stage="decode")
+        if not trades:
+            self.processed += len(batch)
+            return 0
+
+        self.aggregator.add_trades(trades)
+        if self.bars is not None:
+            # Every trade counts towards the OHLCV bars, not just the last one.
+            self.bars.add_trades(trades)
+        if self.cache is not None:
+            # Readers see the newest price right away, before the next DB flush.
+            latest = {ticker: price for ticker, price, _, _ in trades}
+            for ticker, price in latest.items():
+                self.cache.update(ticker, price, source="ws")
+        stage_seconds.observe((time.perf_counter() - aggregated) / len(batch), stage="aggregate")
+        self.trades += len(trades)
+        self.processed += len(batch)
+        trades_total.inc(len(trades))
+        return len(trades)
+
+    def drain(self):
+        return self.aggregator.drain()
+
+    def wait_idle(self, timeout=10.0):
+        """
+        Block until every queued frame has been processed (for replays).
+        Returns False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.processed + self.ring.dropped >= self.frames:
+                return True
+            time.sleep(0.001)
+        return False
+
+
+class FrameRecorder:
+    """
+    Appends raw frames to a file, one "<epoch seconds>\\t<frame>" per line.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, frame):
+        if isinstance(frame, bytes):
+            frame = frame.decode("utf-8")
+        with self._lock:
+            self._file.write(f"{time.time():.6f}\t{frame}\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_frames(path):
+    """
+    Yield (epoch seconds, frame) from a recorded frame file.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            ts, _, frame = line.partition("\t")
+            yield float(ts), frame
@@ -0,0 +1,157 @@
+# app/services/leader.py
+"""
+Leader election so that exactly one process holds the upstream feed.
+
+On Postgres the lock is a session-level advisory lock, which works across
+hosts and is released by the server if the holder dies. Elsewhere (SQLite
+in development) it is an exclusive flock on a file, which only covers
+processes on one machine.
+
+The advisory lock lives as long as the leader's database connection. If
+that connection drops (a database restart, an idle timeout, a network
+blip) the server releases the lock and a standby takes over, so the leader
+re-checks it every LEADER_CHECK_SECONDS and stops its work once it is gone.
+"""
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.models import db
+
+# Standbys retry the lock this often.
+LEADER_RETRY_SECONDS = int(os.getenv("LEADER_RETRY_SECONDS", "15"))
+# The leader confirms it still holds the lock this often.
+LEADER_CHECK_SECONDS = int(os.getenv("LEADER_CHECK_SECONDS", "10"))
+LOCK_DIR = os.getenv("LEADER_LOCK_DIR", tempfile.gettempdir())
+
+
+class LeaderLock:
+    def __init__(self, name):
+        self.name = name
+        self.key = zlib.crc32(name.encode())  # advisory lock key, fits in a bigint
+        self._connection = None
+        self._file = None
+
+    @property
+    def held(self):
+        return self._connection is not None or self._file is not None
+
+    def try_acquire(self):
+        """
+        Take the lock without blocking. Must run inside an application
+        context. Returns True if this process is now the leader.
+        """
+        if self.held:
+            return True
+        if db.engine.dialect.name == "postgresql":
+            return self._try_advisory_lock()
+        return self._try_file_lock()
+
+    def still_held(self):
+        """
+        Whether the lock this process took is still its own. Must run inside
+        an application context. A lost advisory lock is forgotten, so the
+        next try_acquire() competes for it again.
+        """
+        if self._connection is None:
+            return self._file is not None
+        try:
+            # A bigint key shows up split into classid (high) and objid (low).
+            held = self._connection.execute(
+                text(
+                    "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND granted"
+                    " AND pid = pg_backend_pid() AND classid = 0 AND objid::bigint = :key AND objsubid = 1"
+                ),
+                {"key": self.key},
+            ).scalar()
+        except DBAPIError as e:
+            print(f"Lost the connection holding the {self.name} lock:", e)
+            held = 0
+        if not held:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+        return bool(held)
+
+    def release(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            finally:
+                self._connection.close()
+                self._connection = None
+        if self._file is not None:
+            import fcntl
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def _try_advisory_lock(self):
+        # The lock lives as long as this connection, so keep it checked out.
+        connection = db.engine.connect()
+        acquired = connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+        ).scalar()
+        if acquired:
+            self._connection = connection
+        else:
+            connection.close()
+        return bool(acquired)
+
+    def _try_file_lock(self):
+        import fcntl
+        handle = open(os.path.join(LOCK_DIR, f"{self.name}.lock"), "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self._file = handle
+        return True
+
+
+def run_as_leader(app, name, target, *args):
+    """
+    Block until this process wins the `name` lock, then run
+    `target(stop, *args)` in a thread, where `stop` is a threading.Event the
+    target must return soon after it is set. It is set when the lock is lost;
+    this process then waits for the target and stands by again.
+    Meant for a daemon thread: standbys keep retrying so one of them takes
+    over when the leader exits. Returns when the target does on its own.
+    """
+    lock = LeaderLock(name)
+    while True:
+        with app.app_context():
+            acquired = lock.try_acquire()
+        if acquired:
+            print(f"Process {os.getpid()} is the {name} leader")
+            stop = threading.Event()
+            thread = threading.Thread(target=target, args=(stop, *args), name=f"{name}-leader", daemon=True)
+            thread.start()
+            try:
+                while True:
+                    thread.join(LEADER_CHECK_SECONDS)
+                    if not thread.is_alive():
+                        return
+                    with app.app_context():
+                        if not lock.still_held():
+                            break
+                print(f"Process {os.getpid()} lost the {name} lock, standing by")
+                stop.set()
+                thread.join()
+            finally:
+                stop.set()
+                with app.app_context():
+                    lock.release()
+        time.sleep(LEADER_RETRY_SECONDS)
@@ -0,0 +1,201 @@
+# app/services/live_updates.py
+import os
+import socket
+import threading
+import time
+from decimal import Decimal
+
+from flask_login import current_user
+from flask_socketio import join_room, leave_room, rooms
+
+from app.models import db, Holding, Portfolio, Watchlist, WatchlistStock
+from app.services.broker import get_broker, PRICES_CHANNEL, VIEWERS_CHANNEL
+from app.services.price_cache import price_cache
+
+# Upper bound on ticker rooms a single socket may be in.
+MAX_ROOMS_PER_SOCKET = 200
+# Web processes report the tickers their sockets watch this often; reports
+# older than VIEWERS_TTL_SECONDS are forgotten.
+VIEWERS_REPORT_SECONDS = 30
+VIEWERS_TTL_SECONDS = 90
+
+
+def stock_room(stock_id):
+    return f"stock:{stock_id}"
+
+
+def watched_stock_ids(user_id):
+    """
+    Ids of every stock the user holds in any portfolio or has on any
+    watchlist, in one query.
+    """
+    held = db.session.query(Holding.stock_id).join(
+        Portfolio, Portfolio.id == Holding.portfolio_id
+    ).filter(Portfolio.user_id == user_id)
+    watched = db.session.query(WatchlistStock.stock_id).join(
+        Watchlist, Watchlist.id == WatchlistStock.watchlist_id
+    ).filter(Watchlist.user_id == user_id)
+    return [stock_id for (stock_id,) in held.union(watched).all()]
+
+
+def _stock_rooms():
+    return [room for room in rooms() if room.startswith("stock:")]
+
+
+def _join_stocks(stock_ids):
+    available = MAX_ROOMS_PER_SOCKET - len(_stock_rooms())
+    for stock_id in list(stock_ids)[:max(available, 0)]:
+        join_room(stock_room(stock_id))
+
+
+def register_socket_handlers(socketio):
+    """
+    Sockets join one room per ticker they care about; price updates are
+    only sent to those rooms. The first connection starts the viewer
+    reports for this process.
+    """
+    reporter = {"started": False}
+
+    @socketio.on("connect")
+    def on_connect(auth=None):
+        if not reporter["started"]:
+            reporter["started"] = True
+            socketio.start_background_task(report_viewers, socketio)
+        # Signed-in users are subscribed to their holdings and watchlists.
+        if current_user.is_authenticated:
+            _join_stocks(watched_stock_ids(current_user.id))
+
+    @socketio.on("subscribe")
+    def on_subscribe(data):
+        """
+        Join extra ticker rooms, e.g. for a stock detail page.
+        Payload: {"stock_ids": [1, 2]}
+        """
+        stock_ids = [int(i) for i in (data or {}).get("stock_ids", []) if str(i).isdigit()]
+        _join_stocks(stock_ids)
+        return {"rooms": len(_stock_rooms())}
+
+    @socketio.on("unsubscribe")
+    def on_unsubscribe(data):
+        for stock_id in (data or {}).get("stock_ids", []):
+            leave_room(stock_room(stock_id))
+        return {"rooms": len(_stock_rooms())}
+
+    @socketio.on("resync")
+    def on_resync():
+        """
+        Re-derive ticker rooms after the user's holdings or watchlists change.
+        """
+        for room in _stock_rooms():
+            leave_room(room)
+        if current_user.is_authenticated:
+            _join_stocks(watched_stock_ids(current_user.id))
+        return {"rooms": len(_stock_rooms())}
+
+
+def price_deltas(changed, timestamp=None):
+    """
+    Compact {id, price, ts} payloads for {stock_id: price}; ts is epoch
+    milliseconds.
+    """
+    ts = int((timestamp or time.time()) * 1000)
+    return {stock_id: {"id": stock_id, "price": float(price), "ts": ts} for stock_id, price in changed.items()}
+
+
+def emit_price_deltas(socketio, changed, timestamp=None):
+    """
+    Send one `stock_updates` event per ticker room with the flushed
+    deltas. Returns the number of emits.
+    """
+    deltas = price_deltas(changed, timestamp)
+    for stock_id, delta in deltas.items():
+        socketio.emit("stock_updates", [delta], to=stock_room(stock_id))
+    return len(deltas)
+
+
+def publish_price_batch(changed, tickers, timestamp=None, source="ws"):
+    """
+    Publish one flushed batch to every web process. `changed` is
+    {stock_id: price}, `tickers` maps those ids to ticker symbols and
+    `source` ("ws" or "rest") says where the prices came from.
+    """
+    ts = int((timestamp or time.time()) * 1000)
+    rows = [[stock_id, tickers.get(stock_id), str(price)] for stock_id, price in changed.items()]
+    return get_broker().publish(PRICES_CHANNEL, {"ts": ts, "prices": rows, "source": source})
+
+
+def subscribe_price_updates(socketio):
+    """
+    Apply published price batches in this process: refresh the local price
+    cache and send deltas to the sockets connected here.
+    """
+    def on_prices(message):
+        ts = message["ts"] / 1000
+        source = message.get("source", "ws")
+        changed = {}
+        for stock_id, ticker, price in message["prices"]:
+            changed[stock_id] = Decimal(price)
+            if ticker:
+                price_cache.update(ticker, price, stock_id=stock_id, source=source)
+        emit_price_deltas(socketio, changed, ts)
+
+    get_broker().subscribe(PRICES_CHANNEL, on_prices)
+
+
+def viewed_stock_ids(socketio):
+    """
+    Ids of the stocks whose rooms hold at least one socket of this process.
+    """
+    rooms = socketio.server.manager.rooms.get("/", {})
+    return sorted(
+        int(room.split(":", 1)[1])
+        for room, members in list(rooms.items())
+        if room and room.startswith("stock:") and members
+    )
+
+
+def report_viewers(socketio):
+    """
+    Publish this process's viewed stocks every VIEWERS_REPORT_SECONDS, so
+    the worker can refresh those prices first.
+    """
+    process = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        try:
+            get_broker().publish(VIEWERS_CHANNEL, {"process": process, "stock_ids": viewed_stock_ids(socketio)})
+        except Exception as e:
+            print("Viewer report error:", e)
+        socketio.sleep(VIEWERS_REPORT_SECONDS)
+
+
+class ActiveViewers:
+    """
+    Stocks watched by sockets in any web process, from their periodic
+    reports on VIEWERS_CHANNEL.
+    """
+
+    def __init__(self, ttl=VIEWERS_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._reports = {}  # process -> (received at, stock ids)
+
+    def update(self, process, stock_ids, now=None):
+        with self._lock:
+            self._reports[process] = (now or time.time(), frozenset(stock_ids))
+
+    def stock_ids(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            for process in [p for p, (seen, _) in self._reports.items() if now - seen > self.ttl]:
+                del self._reports[process]
+            return set().union(*(ids for _, ids in self._reports.values()))
+
+
+active_viewers = ActiveViewers()
+
+
+def subscribe_viewers():
+    """
+    Track viewer reports in this process (the worker).
+    """
+    get_broker().subscribe(VIEWERS_CHANNEL, lambda message: active_viewers.update(message["process"], message["stock_ids"]))
@@ -0,0 +1,245 @@
+# app/services/market_calendar.py
+"""
+NYSE trading sessions.
+
+Regular sessions run 9:30-16:00 America/New_York on weekdays. Full-day
+holidays and 13:00 early closes are derived from the exchange's rules, so
+there is no calendar data to maintain beyond the rare unscheduled closures
+in SPECIAL_CLOSURES.
+
+Sessions for a rolling window (a week back, a year ahead) are precomputed
+as sorted arrays of UTC epoch seconds, together with the holidays that
+fall on weekdays; is_open(), next_open() and phase() are bisect lookups
+and never touch timezone data.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date, datetime, time as clock, timedelta
+
+EXCHANGE_TIMEZONE = "America/New_York"
+OPEN_TIME = clock(9, 30)
+CLOSE_TIME = clock(16, 0)
+EARLY_CLOSE_TIME = clock(13, 0)
+
+# Market phases, see MarketCalendar.phase().
+SESSION, OFF_HOURS, HOLIDAY = "session", "off_hours", "holiday"
+
+WINDOW_BEFORE = timedelta(days=7)
+WINDOW_AFTER = timedelta(days=366)
+# Rebuild before a lookup gets this close to the end of the window, so
+# next_open() always has a following session to return.
+WINDOW_MARGIN = 14 * 24 * 3600
+
+# Closures announced outside the regular holiday rules.
+SPECIAL_CLOSURES = {
+    date(2012, 10, 29), date(2012, 10, 30),  # Hurricane Sandy
+    date(2018, 12, 5),                       # President George H. W. Bush
+    date(2025, 1, 9),                        # President Jimmy Carter
+}
+
+
+def _nth_weekday(year, month, weekday, n):
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _last_weekday(year, month, weekday):
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    # Anonymous Gregorian algorithm.
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day):
+    # Saturday holidays are observed on Friday, Sunday ones on Monday.
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def holidays(year):
+    """
+    Full-day NYSE closures in `year`.
+    """
+    days = {
+        _nth_weekday(year, 1, 0, 3),           # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),           # Washington's Birthday
+        _easter(year) - timedelta(days=2),     # Good Friday
+        _last_weekday(year, 5, 0),             # Memorial Day
+        _observed(date(year, 7, 4)),           # Independence Day
+        _nth_weekday(year, 9, 0, 1),           # Labor Day
+        _nth_weekday(year, 11, 3, 4),          # Thanksgiving
+        _observed(date(year, 12, 25)),         # Christmas
+    }
+    # A Saturday New Year's Day is not observed on the Friday before.
+    if date(year, 1, 1).weekday() != 5:
+        days.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return days | {day for day in SPECIAL_CLOSURES if day.year == year}
+
+
+def early_closes(year):
+    """
+    Days in `year` on which the market closes at 13:00.
+    """
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}  # day after Thanksgiving
+    # July 3 and Christmas Eve, when they are Monday to Thursday; on a
+    # Friday the holiday itself is observed that day instead.
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() < 4:
+            days.add(day)
+    return days
+
+
+# Sorted epoch arrays: session opens/closes, and the local-midnight
+# bounds of every weekday holiday; start/end bound the covered window.
+_Table = namedtuple("_Table", ["opens", "closes", "holiday_starts", "holiday_ends", "start", "end"])
+
+
+class MarketCalendar:
+    """
+    Precomputed session table: sorted open and close instants, one pair per
+    trading day, in UTC epoch seconds. The table covers a rolling window
+    and is rebuilt around any timestamp that falls outside it.
+    """
+
+    def __init__(self, timezone=EXCHANGE_TIMEZONE):
+        self.timezone = timezone
+        self._lock = threading.Lock()
+        self._table = None  # _Table, built on first lookup
+
+    def build(self, start, end):
+        """
+        Compute the sessions of every day in [start, end).
+        """
+        import pytz  # only needed to build the table, never for lookups
+        tz = pytz.timezone(self.timezone)
+
+        def epoch(day, at):
+            return tz.localize(datetime.combine(day, at)).timestamp()
+
+        opens, closes, holiday_starts, holiday_ends = [], [], [], []
+        closed, early = {}, {}
+        day = start
+        while day < end:
+            if day.year not in closed:
+                closed[day.year] = holidays(day.year)
+                early[day.year] = early_closes(day.year)
+            if day.weekday() < 5:
+                if day in closed[day.year]:
+                    holiday_starts.append(epoch(day, clock(0)))
+                    holiday_ends.append(epoch(day + timedelta(days=1), clock(0)))
+                else:
+                    opens.append(epoch(day, OPEN_TIME))
+                    closes.append(epoch(day, EARLY_CLOSE_TIME if day in early[day.year] else CLOSE_TIME))
+            day += timedelta(days=1)
+        self._table = _Table(opens, closes, holiday_starts, holiday_ends,
+                             epoch(start, clock(0)), epoch(end, clock(0)))
+        return len(opens)
+
+    def _covering(self, ts):
+        table = self._table
+        if table is None or not table.start <= ts < table.end - WINDOW_MARGIN:
+            with self._lock:
+                table = self._table
+                if table is None or not table.start <= ts < table.end - WINDOW_MARGIN:
+                    today = datetime.utcfromtimestamp(ts).date()
+                    self.build(today - WINDOW_BEFORE, today + WINDOW_AFTER)
+                    table = self._table
+        return table
+
+    def _sessions(self, ts):
+        table = self._covering(ts)
+        return table.opens, table.closes
+
+    def session(self, ts=None):
+        """
+        (open, close) epoch seconds of the session in progress at `ts`
+        (default: now), or None when the market is closed.
+        """
+        ts = time.time() if ts is None else ts
+        opens, closes = self._sessions(ts)
+        index = bisect_right(opens, ts) - 1
+        if index >= 0 and ts < closes[index]:
+            return opens[index], closes[index]
+        return None
+
+    def is_open(self, ts=None):
+        return self.session(ts) is not None
+
+    def next_open(self, ts=None):
+        """
+        Epoch seconds at which the first session after `ts` opens.
+        """
+        ts = time.time() if ts is None else ts
+        opens, _ = self._sessions(ts)
+        return opens[bisect_right(opens, ts)]
+
+    def next_close(self, ts=None):
+        """
+        Epoch seconds at which the current session, or the next one if the
+        market is closed, ends.
+        """
+        ts = time.time() if ts is None else ts
+        _, closes = self._sessions(ts)
+        return closes[bisect_right(closes, ts)]
+
+    def holiday(self, ts=None):
+        """
+        (start, end) epoch seconds of the weekday holiday `ts` falls on, or None.
+        """
+        ts = time.time() if ts is None else ts
+        table = self._covering(ts)
+        index = bisect_right(table.holiday_starts, ts) - 1
+        if index >= 0 and ts < table.holiday_ends[index]:
+            return table.holiday_starts[index], table.holiday_ends[index]
+        return None
+
+    def phase(self, ts=None):
+        """
+        SESSION while the market is open, HOLIDAY on weekdays the exchange
+        is closed for a holiday, OFF_HOURS otherwise (nights, weekends).
+        """
+        ts = time.time() if ts is None else ts
+        if self.is_open(ts):
+            return SESSION
+        if self.holiday(ts):
+            return HOLIDAY
+        return OFF_HOURS
+
+    def next_phase_change(self, ts=None):
+        """
+        Epoch seconds of the next moment phase() may change after `ts`.
+        """
+        ts = time.time() if ts is None else ts
+        current = self.session(ts)
+        if current:
+            return current[1]
+        holiday = self.holiday(ts)
+        if holiday:
+            return holiday[1]
+        table = self._covering(ts)
+        index = bisect_right(table.holiday_starts, ts)
+        upcoming = table.holiday_starts[index] if index < len(table.holiday_starts) else float("inf")
+        return min(self.next_open(ts), upcoming)
+
+
+# Process-wide calendar.
+market_calendar = MarketCalendar()
@@ -0,0 +1,83 @@
+# app/services/money.py
+"""
+Fixed-point money arithmetic.
+
+Prices and cash are handled as integer cents and share quantities as
+integer ten-thousandths of a share (the scale of holdings.quantity), so
+fill arithmetic is exact and rounds half up in one place.
+The columns stay Numeric: values read from them are Decimals, converted
+with to_cents()/to_units() where they are used and written back with
+from_cents()/from_units(). That conversion costs about as much as the
+Decimal arithmetic it replaces, so this is for correctness, not speed.
+Valuation, which only sums, multiplies the Decimals as loaded (exact at
+these scales, and faster) and rounds the total with to_cents() once.
+
+This module must not import the models, which use it.
+"""
+from decimal import Decimal
+
+CENTS = 100       # cents per dollar; prices and balances are Numeric(_, 2)
+UNITS = 10_000    # units per share; quantities are Numeric(15, 4)
+
+# Twice the scale, for rounding half up with integer arithmetic.
+_DOUBLE_CENTS = Decimal(2 * CENTS)
+_DOUBLE_UNITS = Decimal(2 * UNITS)
+
+
+def _scaled(value, scale, double):
+    # Numeric columns load as Decimal, so check for that first.
+    if type(value) is not Decimal:
+        if isinstance(value, int):
+            return value * scale
+        if isinstance(value, float):
+            # repr() is the shortest string that round-trips, so 0.1 stays 0.1.
+            value = Decimal(repr(value))
+        else:
+            value = Decimal(value)
+    # floor(x * scale + 1/2) without quantize(): int() truncates 2 * x * scale
+    # toward zero, and (n + 1) // 2 finishes the half-up rounding. Negative
+    # amounts round half away from zero, like ROUND_HALF_UP.
+    doubled = int(value * double)
+    if doubled >= 0:
+        return (doubled + 1) // 2
+    return -((1 - doubled) // 2)
+
+
+def to_cents(value):
+    """
+    Dollars (int, float, str or Decimal) to integer cents, rounding half up.
+    Raises decimal.InvalidOperation or ValueError for non-numbers.
+    """
+    return _scaled(value, CENTS, _DOUBLE_CENTS)
+
+
+def to_units(value):
+    """
+    Shares to integer ten-thousandths of a share, rounding half up.
+    """
+    return _scaled(value, UNITS, _DOUBLE_UNITS)
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def from_units(units):
+    return Decimal(units).scaleb(-4)
+
+
+def cents_to_float(cents):
+    # Integer division by 100 is correctly rounded, so this equals
+    # float(from_cents(cents)) without building a Decimal.
+    return cents / CENTS
+
+
+def amount_cents(units, price_cents):
+    """
+    Cost of `units` at `price_cents`, rounded half up to a cent.
+    """
+    product = units * price_cents
+    half = UNITS // 2
+    if product >= 0:
+        return (product + half) // UNITS
+    return -((-product + half) // UNITS)
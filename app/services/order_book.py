@@ -0,0 +1,257 @@
+# app/services/order_book.py
+import heapq
+import threading
+from bisect import bisect_right, insort
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app.models import db, Order, OrderStatusEnum, OrderTypeEnum
+from app.services.money import to_cents
+
+# Sentinel that sorts after every order id, used to bound bisect lookups.
+_MAX_ID = float("inf")
+
+# sync() re-reads this much history before its watermark, to cover commits
+# that landed out of order or with a slightly skewed clock.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# What the book remembers about a resting order. Targets are integer cents,
+# which keeps the ladder comparisons on plain ints.
+BookEntry = namedtuple("BookEntry", ["stock_id", "order_type", "target_cents", "scheduled_time"])
+
+
+def _target_cents(value):
+    return to_cents(value) if value is not None else None
+
+
+class OrderBook:
+    """
+    In-memory index of pending orders, kept per stock.
+
+    - Buy limit orders are kept sorted by target_price descending,
+      sell limit orders ascending, so a price tick only walks the
+      prefix of each ladder that the price actually crosses.
+    - Orders with a future scheduled_time wait in a time-ordered heap
+      and are released into the book once they become due.
+    - Market orders (no target_price) are kept in a plain set; they
+      fill at whatever the price is once the market is open.
+
+    The book is rebuilt from the orders table on startup. Within one
+    process the order routes keep it in sync directly; a worker process
+    that does not serve those routes calls sync(), which only reads the
+    orders changed since its last look.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._watermark = None  # latest orders.updated_at seen by rebuild/sync
+        self._clear()
+
+    def _clear(self):
+        self._entries = {}     # order_id -> BookEntry
+        self._bids = {}        # stock_id -> sorted [(-target_cents, order_id)]
+        self._asks = {}        # stock_id -> sorted [(target_cents, order_id)]
+        self._market = {}      # stock_id -> set(order_id)
+        self._scheduled = []   # heap of (scheduled_time, order_id)
+        self._waiting = {}     # order_id -> scheduled_time still sitting in the heap
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def __len__(self):
+        return len(self._entries)
+
+    def rebuild(self, rows=None):
+        """
+        Reload every pending order from the database, or from
+        (id, stock_id, order_type, target_price, scheduled_time) rows when
+        given. Reading the database needs an application context.
+        """
+        watermark = None
+        if rows is None:
+            watermark = db.session.query(func.max(Order.updated_at)).scalar()
+            rows = (
+                Order.query
+                .with_entities(Order.id, Order.stock_id, Order.order_type,
+                               Order.target_price, Order.scheduled_time)
+                .filter(Order.status == OrderStatusEnum.pending)
+                .all()
+            )
+        now = datetime.utcnow()
+        with self._lock:
+            self._clear()
+            for order_id, stock_id, order_type, target_price, scheduled_time in rows:
+                entry = BookEntry(
+                    stock_id,
+                    order_type,
+                    _target_cents(target_price),
+                    scheduled_time,
+                )
+                self._insert(order_id, entry, now)
+            self._loaded = True
+            self._watermark = watermark
+        print(f"Order book rebuilt with {len(rows)} pending orders")
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.rebuild()
+
+    def sync(self):
+        """
+        Apply orders created, updated, filled or cancelled by other processes
+        since the last rebuild/sync. Must run inside an application context.
+        Returns the number of rows read.
+        """
+        if not self._loaded:
+            self.rebuild()
+            return len(self)
+        query = Order.query.with_entities(
+            Order.id, Order.stock_id, Order.order_type, Order.target_price,
+            Order.scheduled_time, Order.status, Order.updated_at,
+        )
+        if self._watermark is not None:
+            query = query.filter(Order.updated_at >= self._watermark - SYNC_OVERLAP)
+        rows = query.all()
+        now = datetime.utcnow()
+        with self._lock:
+            for order_id, stock_id, order_type, target_price, scheduled_time, status, updated_at in rows:
+                current = self._entries.get(order_id)
+                entry = BookEntry(
+                    stock_id,
+                    order_type,
+                    _target_cents(target_price),
+                    scheduled_time,
+                )
+                if status == OrderStatusEnum.pending and current == entry:
+                    continue  # unchanged; keep its place in the ladder
+                self._remove(order_id)
+                if status == OrderStatusEnum.pending:
+                    self._insert(order_id, entry, now)
+                if updated_at and (self._watermark is None or updated_at > self._watermark):
+                    self._watermark = updated_at
+        return len(rows)
+
+    def upsert(self, order):
+        """
+        Add or refresh an order from its ORM object.
+        Orders that are no longer pending are dropped from the book.
+        """
+        if not self._loaded:
+            # Nothing to keep in sync yet; the first rebuild will read it.
+            return
+        with self._lock:
+            self._remove(order.id)
+            if order.status == OrderStatusEnum.pending:
+                entry = BookEntry(
+                    order.stock_id,
+                    order.order_type,
+                    _target_cents(order.target_price),
+                    order.scheduled_time,
+                )
+                self._insert(order.id, entry, datetime.utcnow())
+
+    def remove(self, order_id):
+        with self._lock:
+            self._remove(order_id)
+
+    def get(self, order_id):
+        return self._entries.get(order_id)
+
+    def crossing(self, stock_id, price):
+        """
+        Return the ids of limit orders on this stock that the given price fills:
+        buys whose target is at or above the price and sells whose target is
+        at or below it.
+        """
+        price = to_cents(price)
+        with self._lock:
+            matched = []
+            bids = self._bids.get(stock_id)
+            if bids:
+                end = bisect_right(bids, (-price, _MAX_ID))
+                matched.extend(order_id for _, order_id in bids[:end])
+            asks = self._asks.get(stock_id)
+            if asks:
+                end = bisect_right(asks, (price, _MAX_ID))
+                matched.extend(order_id for _, order_id in asks[:end])
+            return matched
+
+    def market_orders(self):
+        """
+        Return {stock_id: [order_id, ...]} for due market orders.
+        """
+        with self._lock:
+            return {stock_id: sorted(ids) for stock_id, ids in self._market.items() if ids}
+
+    def stock_ids(self):
+        """
+        Ids of every stock with a resting order, scheduled ones included.
+        """
+        with self._lock:
+            return {entry.stock_id for entry in self._entries.values()}
+
+    def limit_stock_ids(self):
+        with self._lock:
+            return {stock_id for stock_id, ladder in self._bids.items() if ladder} | \
+                   {stock_id for stock_id, ladder in self._asks.items() if ladder}
+
+    def release_due(self, now=None):
+        """
+        Move scheduled orders whose time has come into the book.
+        Returns the set of stock ids that received newly due orders.
+        """
+        now = now or datetime.utcnow()
+        touched = set()
+        with self._lock:
+            while self._scheduled and self._scheduled[0][0] <= now:
+                scheduled_time, order_id = heapq.heappop(self._scheduled)
+                if self._waiting.get(order_id) != scheduled_time:
+                    continue  # stale heap entry for a removed/updated order
+                del self._waiting[order_id]
+                entry = self._entries[order_id]
+                self._place(order_id, entry)
+                touched.add(entry.stock_id)
+        return touched
+
+    def _insert(self, order_id, entry, now):
+        self._entries[order_id] = entry
+        if entry.scheduled_time and entry.scheduled_time > now:
+            heapq.heappush(self._scheduled, (entry.scheduled_time, order_id))
+            self._waiting[order_id] = entry.scheduled_time
+        else:
+            self._place(order_id, entry)
+
+    def _place(self, order_id, entry):
+        if entry.target_cents is None:
+            self._market.setdefault(entry.stock_id, set()).add(order_id)
+        elif entry.order_type == OrderTypeEnum.buy:
+            insort(self._bids.setdefault(entry.stock_id, []), (-entry.target_cents, order_id))
+        else:
+            insort(self._asks.setdefault(entry.stock_id, []), (entry.target_cents, order_id))
+
+    def _remove(self, order_id):
+        entry = self._entries.pop(order_id, None)
+        if entry is None:
+            return
+        if order_id in self._waiting:
+            # Leave the heap entry behind; release_due skips it.
+            del self._waiting[order_id]
+            return
+        if entry.target_cents is None:
+            self._market.get(entry.stock_id, set()).discard(order_id)
+            return
+        if entry.order_type == OrderTypeEnum.buy:
+            ladder, key = self._bids.get(entry.stock_id, []), (-entry.target_cents, order_id)
+        else:
+            ladder, key = self._asks.get(entry.stock_id, []), (entry.target_cents, order_id)
+        index = bisect_right(ladder, key) - 1
+        if index >= 0 and ladder[index] == key:
+            del ladder[index]
+
+
+# Process-wide order book shared by the order routes and the matching jobs.
+order_book = OrderBook()
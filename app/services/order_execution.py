@@ -0,0 +1,249 @@
+# app/services/order_execution.py
+"""
+Order placement and fills that stay correct under concurrency.
+
+- Rows are locked in one global order: orders (by id), then portfolios
+  (by id), then holdings (by portfolio id, stock id), with SELECT ... FOR
+  UPDATE, so two fills can never deadlock on each other.
+- Portfolio, Holding and Order carry a version counter (version_id_col).
+  On databases without row locks (SQLite) a concurrent change to the same
+  row fails the UPDATE with StaleDataError instead of overwriting it, so
+  two sweeps cannot both fill an order they each read as pending.
+- Serialization failures, deadlocks, lock timeouts and stale versions
+  roll back and retry the whole unit of work with jittered backoff.
+- A client-supplied idempotency key makes repeated POST /api/orders calls
+  return the order created by the first one.
+"""
+import random
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.models import db, Order, OrderStatusEnum, OrderTypeEnum, Portfolio, Holding, Stock
+from app.jobs.is_market_open import is_market_open_now
+from app.services.metrics import registry
+from app.services.money import amount_cents, from_cents, from_units, to_cents, to_units
+
+MAX_RETRIES = 5
+RETRY_BASE_SECONDS = 0.01
+
+retries_total = registry.counter(
+    "order_execution_retries_total", "Order units of work retried after a concurrency failure.")
+
+# Postgres serialization_failure, deadlock_detected, lock_not_available.
+_RETRYABLE_PGCODES = {"40001", "40P01", "55P03"}
+
+
+class OrderRejected(Exception):
+    """
+    The order cannot be executed as requested; `status` is the HTTP status.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class OrderConflict(Exception):
+    """
+    Concurrent updates kept winning until the retries ran out.
+    """
+
+
+def _retryable(error):
+    if isinstance(error, StaleDataError):
+        return True
+    if isinstance(error, DBAPIError):
+        code = getattr(error.orig, "pgcode", None)
+        if code in _RETRYABLE_PGCODES:
+            return True
+        return "database is locked" in str(error.orig)
+    return False
+
+
+def run_with_retry(unit_of_work, retries=MAX_RETRIES):
+    """
+    Run `unit_of_work()` (which must commit) and retry it from scratch on
+    transient concurrency failures. OrderRejected is never retried.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return unit_of_work()
+        except OrderRejected:
+            db.session.rollback()
+            raise
+        except (StaleDataError, DBAPIError) as e:
+            db.session.rollback()
+            if isinstance(e, IntegrityError) or not _retryable(e):
+                raise
+            if attempt == retries:
+                raise OrderConflict(str(e)) from e
+            retries_total.inc()
+            time.sleep(RETRY_BASE_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def _lock_portfolios(portfolio_ids):
+    portfolios = (
+        Portfolio.query
+        .filter(Portfolio.id.in_(portfolio_ids))
+        .order_by(Portfolio.id)
+        .populate_existing()
+        .with_for_update()
+        .all()
+    )
+    return {portfolio.id: portfolio for portfolio in portfolios}
+
+
+def _lock_holdings(portfolio_ids, stock_ids):
+    holdings = (
+        Holding.query
+        .filter(Holding.portfolio_id.in_(portfolio_ids), Holding.stock_id.in_(stock_ids))
+        .order_by(Holding.portfolio_id, Holding.stock_id)
+        .populate_existing()
+        .with_for_update()
+        .all()
+    )
+    return {(holding.portfolio_id, holding.stock_id): holding for holding in holdings}
+
+
+def apply_fill(order, portfolio, holding, fill_price, now):
+    """
+    Execute `order` at `fill_price` against a locked portfolio and holding
+    (None if the portfolio has none for this stock). Raises OrderRejected
+    if the cash or shares are not there. Returns the holding afterwards.
+
+    The arithmetic runs on integer cents and quantity units; the cost is
+    rounded half up to a cent before it touches the balance.
+    """
+    units = to_units(order.quantity)
+    price = to_cents(fill_price)
+    amount = amount_cents(units, price)
+    balance = to_cents(portfolio.portfolio_balance or 0)
+    held = to_units(holding.quantity) if holding else 0
+
+    if order.order_type == OrderTypeEnum.buy:
+        if balance < amount:
+            raise OrderRejected("Insufficient funds in portfolio")
+        portfolio.portfolio_balance = from_cents(balance - amount)
+        if holding:
+            holding.quantity = from_units(held + units)
+        else:
+            holding = Holding(
+                portfolio_id=portfolio.id,
+                stock_id=order.stock_id,
+                quantity=from_units(units),
+                created_at=now,
+                updated_at=now
+            )
+            db.session.add(holding)
+    else:
+        if not holding or held < units:
+            raise OrderRejected("Not enough shares to sell")
+        portfolio.portfolio_balance = from_cents(balance + amount)
+        holding.quantity = from_units(held - units)
+
+    order.status = OrderStatusEnum.executed
+    order.executed_price = from_cents(price)
+    order.executed_at = now
+    return holding
+
+
+def place_order(portfolio_id, stock_id, order_type, quantity, target_price=None,
+                scheduled_time=None, idempotency_key=None, market_open=None):
+    """
+    Create an order, executing it at the market price when it has neither
+    a target price nor a scheduled time. `market_open` defaults to the
+    exchange clock.
+
+    Returns (order, replayed); replayed is True when `idempotency_key`
+    matched an earlier order, which is returned unchanged.
+    Raises OrderRejected or OrderConflict.
+    """
+    def unit_of_work():
+        if idempotency_key:
+            existing = Order.query.filter_by(portfolio_id=portfolio_id, idempotency_key=idempotency_key).first()
+            if existing:
+                return existing, True
+
+        now = datetime.utcnow()
+        order = Order(
+            portfolio_id=portfolio_id,
+            stock_id=stock_id,
+            order_type=OrderTypeEnum(order_type),
+            quantity=quantity,
+            target_price=target_price,
+            scheduled_time=scheduled_time,
+            status=OrderStatusEnum.pending,
+            idempotency_key=idempotency_key,
+            created_at=now,
+            updated_at=now
+        )
+
+        if target_price is None and scheduled_time is None:
+            if not (is_market_open_now() if market_open is None else market_open):
+                raise OrderRejected("Market is closed. Order not executed.")
+            stock = Stock.query.get(stock_id)
+            if not stock:
+                raise OrderRejected("Stock not found", 404)
+            portfolio = _lock_portfolios([portfolio_id])[portfolio_id]
+            holding = _lock_holdings([portfolio_id], [stock_id]).get((portfolio_id, stock_id))
+            apply_fill(order, portfolio, holding, stock.market_price, now)
+
+        db.session.add(order)
+        db.session.commit()
+        return order, False
+
+    try:
+        return run_with_retry(unit_of_work)
+    except IntegrityError:
+        # A concurrent request with the same idempotency key won the insert.
+        existing = idempotency_key and Order.query.filter_by(
+            portfolio_id=portfolio_id, idempotency_key=idempotency_key).first()
+        if not existing:
+            raise
+        return existing, True
+
+
+def fill_pending_orders(fills):
+    """
+    Fill a batch of matched orders in one transaction. `fills` maps
+    order_id -> fill price. Orders that are no longer pending (cancelled,
+    or filled by a racing sweep) are skipped; orders the portfolio can no
+    longer cover are cancelled. Returns the filled orders.
+    """
+    if not fills:
+        return []
+
+    def unit_of_work():
+        orders = (
+            Order.query
+            .filter(Order.id.in_(fills.keys()), Order.status == OrderStatusEnum.pending)
+            .order_by(Order.id)
+            .populate_existing()
+            .with_for_update()
+            .all()
+        )
+        if not orders:
+            return []
+        portfolio_ids = sorted({order.portfolio_id for order in orders})
+        portfolios = _lock_portfolios(portfolio_ids)
+        holdings = _lock_holdings(portfolio_ids, {order.stock_id for order in orders})
+
+        now = datetime.utcnow()
+        filled = []
+        for order in orders:
+            key = (order.portfolio_id, order.stock_id)
+            try:
+                holdings[key] = apply_fill(order, portfolios[order.portfolio_id], holdings.get(key),
+                                           fills[order.id], now)
+                filled.append(order)
+            except OrderRejected as e:
+                order.status = OrderStatusEnum.cancelled
+                print(f"Cancelled order {order.id}: {e.message}")
+        db.session.commit()
+        return filled
+
+    return run_with_retry(unit_of_work)
@@ -0,0 +1,39 @@
+# app/services/order_matching.py
+from app.models import db
+from app.jobs.execute_pending_orders import fill_orders
+from app.services.money import from_cents, to_cents
+from app.services.order_book import order_book
+
+
+def match_price_batch(prices):
+    """
+    Matching stage for the live price feed.
+
+    `prices` maps stock_id -> latest price for one coalesced batch of ticks.
+    Only the limit orders resting on those stocks are evaluated (through the
+    order book), and everything that crosses is filled in one transaction.
+    Market orders and orders on stocks that did not tick are left for the
+    execute_pending_orders sweep.
+
+    Must run inside an application context. Returns the filled orders.
+    """
+    if not prices:
+        return []
+    order_book.sync()
+    order_book.release_due()
+
+    fills = {}  # order_id -> fill price
+    for stock_id, price in prices.items():
+        # Fill at the same precision market_price is stored with.
+        fill_price = from_cents(to_cents(price))
+        for order_id in order_book.crossing(stock_id, fill_price):
+            fills[order_id] = fill_price
+
+    if not fills:
+        return []
+    try:
+        return fill_orders(fills)
+    except Exception as e:
+        db.session.rollback()
+        print("Order matching error:", e)
+        return []
@@ -0,0 +1,135 @@
+# app/services/order_vector.py
+"""
+Columnar evaluation of pending orders with NumPy.
+
+Pending orders are held as parallel arrays (order id, stock id, side,
+target price in integer cents, scheduled time in epoch seconds) and
+matched against a price vector indexed by stock id in one vectorized
+pass. The database does the conversion to integers, so loading builds
+no Decimal or datetime per order, and only the ids of the orders that
+fill come back out, so ORM objects are materialized for matches alone.
+"""
+import calendar
+from datetime import datetime
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import BigInteger, case, cast, extract, func
+
+from app.models import db, Order, OrderStatusEnum, OrderTypeEnum
+from app.services.money import to_cents
+
+BUY, SELL = 1, -1
+NO_PRICE = -1      # target_cents for market orders / price vector for unknown stocks
+NOT_SCHEDULED = 0  # scheduled_epoch for orders that are due right away
+
+
+def to_epoch(moment):
+    return calendar.timegm(moment.utctimetuple())
+
+
+class PendingOrderArrays:
+    __slots__ = ("order_id", "stock_id", "side", "target_cents", "scheduled_epoch")
+
+    def __init__(self, order_id, stock_id, side, target_cents, scheduled_epoch):
+        self.order_id = np.asarray(order_id, dtype=np.int64)
+        self.stock_id = np.asarray(stock_id, dtype=np.int64)
+        self.side = np.asarray(side, dtype=np.int8)
+        self.target_cents = np.asarray(target_cents, dtype=np.int64)
+        self.scheduled_epoch = np.asarray(scheduled_epoch, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.order_id)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build from (id, stock_id, side, target_cents, scheduled_epoch)
+        integer rows, as load() selects them, in one pass over the values.
+        """
+        count = len(rows)
+        table = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=count * 5).reshape(count, 5)
+        return cls(*table.T)
+
+    @classmethod
+    def load(cls):
+        """
+        Read every pending order without building ORM objects.
+        Must run inside an application context.
+        """
+        rows = (
+            Order.query
+            .with_entities(Order.id, Order.stock_id, *encoded_columns())
+            .filter(Order.status == OrderStatusEnum.pending)
+            .all()
+        )
+        return cls.from_rows(rows)
+
+    def fillable(self, price_cents, now=None, market_open=True):
+        """
+        `price_cents` is an int64 vector indexed by stock id (NO_PRICE where
+        unknown), see price_vector(). Returns (order ids, fill prices in
+        cents) for the orders that fill now:
+          - buy limits with price <= target, sell limits with price >= target
+          - market orders, if the market is open
+        Orders scheduled in the future are skipped.
+        """
+        if not len(self) or not len(price_cents):
+            return self.order_id[:0], self.target_cents[:0]
+        in_range = self.stock_id < len(price_cents)
+        price = np.where(in_range, price_cents[np.minimum(self.stock_id, len(price_cents) - 1)], NO_PRICE)
+
+        now_epoch = to_epoch(now or datetime.utcnow())
+        ready = (price != NO_PRICE) & (self.scheduled_epoch <= now_epoch)
+        limit = self.target_cents != NO_PRICE
+        crossed = limit & (
+            ((self.side == BUY) & (price <= self.target_cents))
+            | ((self.side == SELL) & (price >= self.target_cents))
+        )
+        if market_open:
+            crossed |= ~limit
+        mask = ready & crossed
+        return self.order_id[mask], price[mask]
+
+
+def encoded_columns():
+    """
+    Side, target cents and scheduled epoch of an order as integer SQL
+    expressions, with BUY/SELL, NO_PRICE and NOT_SCHEDULED as in the arrays.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        epoch = func.floor(extract("epoch", Order.scheduled_time))
+    else:
+        # SQLite keeps DateTime as ISO text. strftime rounds the fraction to
+        # milliseconds, which could carry into the next second, so drop it.
+        epoch = func.strftime("%s", func.substr(Order.scheduled_time, 1, 19))
+    return (
+        case((Order.order_type == OrderTypeEnum.buy, BUY), else_=SELL),
+        func.coalesce(cast(func.round(Order.target_price * 100), BigInteger), NO_PRICE),
+        func.coalesce(cast(epoch, BigInteger), NOT_SCHEDULED),
+    )
+
+
+def encode_row(order_id, stock_id, order_type, target_price, scheduled_time):
+    """
+    The integer row encoded_columns() produces, from Python values.
+    """
+    return (
+        order_id,
+        stock_id,
+        BUY if order_type == OrderTypeEnum.buy else SELL,
+        NO_PRICE if target_price is None else to_cents(target_price),
+        NOT_SCHEDULED if scheduled_time is None else to_epoch(scheduled_time),
+    )
+
+
+def price_vector(prices):
+    """
+    Dense int64 vector of cents indexed by stock id from {stock_id: price}.
+    """
+    size = max(prices) + 1 if prices else 0
+    vector = np.full(size, NO_PRICE, dtype=np.int64)
+    for stock_id, price in prices.items():
+        if price is not None:
+            vector[stock_id] = to_cents(price)
+    return vector
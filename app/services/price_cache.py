@@ -0,0 +1,109 @@
+# app/services/price_cache.py
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from app.services.money import from_cents, to_cents
+
+# Entries older than this are ignored and readers fall back to the database.
+MAX_AGE_SECONDS = 300
+
+# price is a Decimal at market_price precision and cents the same value as
+# an int; timestamp is the UTC time we received it; seq is the cache-wide
+# sequence number of the write.
+PriceEntry = namedtuple("PriceEntry", ["stock_id", "ticker", "price", "cents", "timestamp", "seq", "source"])
+
+
+class PriceCache:
+    """
+    Latest known price per stock, shared by everything in the process.
+
+    The WebSocket ingest and the REST refresher write here as soon as a
+    price arrives; serializers read from here and only fall back to
+    Stock.market_price (the durable copy) when the cache has nothing newer.
+    Entries are reachable by stock id and by ticker. Every write bumps a
+    cache-wide sequence number so readers can cheaply tell whether
+    anything changed.
+
+    This module must not import the models, which read from it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_ticker = {}
+        self._by_id = {}
+        self._ids = {}  # ticker -> stock_id, for writers that only know the ticker
+        self._seq = 0
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def bind(self, mapping):
+        """
+        Register ticker -> stock_id pairs so ticker-only writes are
+        reachable by id as well.
+        """
+        with self._lock:
+            self._ids.update(mapping)
+
+    def update(self, ticker, price, stock_id=None, source="ws", timestamp=None):
+        """
+        Record a new price and return its sequence number.
+        """
+        cents = to_cents(price)
+        price = from_cents(cents)
+        timestamp = timestamp or datetime.utcnow()
+        with self._lock:
+            if stock_id is None:
+                stock_id = self._ids.get(ticker)
+            else:
+                self._ids[ticker] = stock_id
+            self._seq += 1
+            entry = PriceEntry(stock_id, ticker, price, cents, timestamp, self._seq, source)
+            self._by_ticker[ticker] = entry
+            if stock_id is not None:
+                self._by_id[stock_id] = entry
+            return self._seq
+
+    def get(self, stock_id, max_age=MAX_AGE_SECONDS):
+        return self._fresh(self._by_id.get(stock_id), max_age)
+
+    def get_ticker(self, ticker, max_age=MAX_AGE_SECONDS):
+        return self._fresh(self._by_ticker.get(ticker), max_age)
+
+    def resolve(self, ticker, db_price, db_timestamp):
+        """
+        Return (price, timestamp) from whichever of the cache and the
+        database row is newer.
+        """
+        return self._newer(self.get_ticker(ticker), db_price, db_timestamp)
+
+    def resolve_id(self, stock_id, db_price, db_timestamp):
+        """
+        resolve() by stock id.
+        """
+        return self._newer(self.get(stock_id), db_price, db_timestamp)
+
+    @staticmethod
+    def _newer(entry, db_price, db_timestamp):
+        if entry and (db_timestamp is None or entry.timestamp >= db_timestamp):
+            return entry.price, entry.timestamp
+        return db_price, db_timestamp
+
+    def clear(self):
+        with self._lock:
+            self._by_ticker.clear()
+            self._by_id.clear()
+
+    @staticmethod
+    def _fresh(entry, max_age):
+        if entry is None:
+            return None
+        if max_age is not None and datetime.utcnow() - entry.timestamp > timedelta(seconds=max_age):
+            return None
+        return entry
+
+
+# Process-wide cache.
+price_cache = PriceCache()
@@ -0,0 +1,176 @@
+# app/services/price_history.py
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import db, PriceBar, BAR_INTERVALS
+from app.services.price_writer import ticker_index
+
+
+class _Bar:
+    __slots__ = ("open", "high", "low", "close", "volume")
+
+    def __init__(self, price, volume):
+        self.open = self.high = self.low = self.close = price
+        # Volume traded since the last flush; persisted as an increment.
+        self.volume = volume
+
+
+class BarAggregator:
+    """
+    Builds OHLCV bars from individual trades in memory.
+
+    Every trade updates its 1m bar and the enclosing 5m, 1h and 1d bars, so
+    the rolled-up intervals never need to be recomputed from history. Bars
+    touched since the last flush are upserted into price_bars in one
+    statement; closed bars are then dropped from memory. Volume is flushed
+    as an increment and highs/lows are merged with what is already stored,
+    so a restart in the middle of a bar does not lose earlier trades.
+    Day bars use UTC day boundaries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bars = {}     # (ticker, interval, start epoch) -> _Bar
+        self._dirty = set()
+
+    def add_trade(self, ticker, price, volume, timestamp):
+        """
+        Record one trade. `timestamp` is in epoch seconds.
+        """
+        self.add_trades([(ticker, price, volume, timestamp)])
+
+    def add_trades(self, trades):
+        """
+        Record (ticker, price, volume, epoch seconds) trades, in order.
+        """
+        # Fold the batch into per-minute OHLCV on the raw numbers first, so
+        # Decimal conversion and the four interval bars are paid per minute
+        # and ticker rather than per trade.
+        minutes = {}  # (ticker, minute start) -> [open, high, low, close, volume]
+        for ticker, price, volume, timestamp in trades:
+            if type(volume) is not int:
+                volume = Decimal(str(volume or 0))
+            key = (ticker, int(timestamp) - int(timestamp) % 60)
+            summary = minutes.get(key)
+            if summary is None:
+                minutes[key] = [price, price, price, price, volume]
+                continue
+            if price > summary[1]:
+                summary[1] = price
+            if price < summary[2]:
+                summary[2] = price
+            summary[3] = price
+            summary[4] += volume
+
+        with self._lock:
+            for (ticker, minute), (open_, high, low, close, volume) in minutes.items():
+                open_, high, low, close = (Decimal(str(price)) for price in (open_, high, low, close))
+                volume = Decimal(volume)
+                for interval, seconds in BAR_INTERVALS.items():
+                    key = (ticker, interval, minute - minute % seconds)
+                    bar = self._bars.get(key)
+                    if bar is None:
+                        bar = self._bars[key] = _Bar(open_, volume)
+                        bar.high, bar.low, bar.close = high, low, close
+                    else:
+                        bar.high = max(bar.high, high)
+                        bar.low = min(bar.low, low)
+                        bar.close = close
+                        bar.volume += volume
+                    self._dirty.add(key)
+
+    def __len__(self):
+        return len(self._bars)
+
+    def flush(self, now=None):
+        """
+        Upsert every bar touched since the last flush and forget closed bars.
+        Must run inside an application context. Returns the number of rows written.
+        If the upsert fails, the bars stay dirty with their volume, so the
+        next flush writes them again.
+        """
+        now = now or time.time()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = []
+            flushed = {}  # key -> volume taken out of the bar for this upsert
+            for key in dirty:
+                ticker, interval, start = key
+                stock_id = ticker_index.lookup(ticker)
+                if stock_id is None:
+                    continue
+                bar = self._bars[key]
+                rows.append({
+                    "stock_id": stock_id,
+                    "interval": interval,
+                    "start": datetime.utcfromtimestamp(start),
+                    "open": _cents(bar.open),
+                    "high": _cents(bar.high),
+                    "low": _cents(bar.low),
+                    "close": _cents(bar.close),
+                    "volume": bar.volume,
+                    "updated_at": datetime.utcnow(),
+                })
+                flushed[key] = bar.volume
+                bar.volume = Decimal(0)
+
+        if rows:
+            try:
+                db.session.execute(_upsert(rows))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print("Price bar flush error:", e)
+                # Put the volume back (trades may have added to it since)
+                # and keep every bar for the next flush.
+                with self._lock:
+                    for key, volume in flushed.items():
+                        self._bars[key].volume += volume
+                    self._dirty |= flushed.keys()
+                return 0
+
+        with self._lock:
+            # Bars whose bucket has ended are complete once written; one a
+            # late trade touched again waits for the next flush.
+            for key in [k for k in self._bars if k[2] + BAR_INTERVALS[k[1]] <= now and k not in self._dirty]:
+                del self._bars[key]
+        return len(rows)
+
+
+def _cents(value):
+    return value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _upsert(rows):
+    """
+    INSERT ... ON CONFLICT (stock_id, interval, start) DO UPDATE for the
+    dialects that support it (Postgres and SQLite).
+    """
+    table = PriceBar.__table__
+    if db.session.get_bind().dialect.name == "postgresql":
+        stmt = postgresql.insert(table).values(rows)
+        greatest, least = func.greatest, func.least
+    else:
+        stmt = sqlite.insert(table).values(rows)
+        # SQLite's two-argument max()/min() are scalar functions.
+        greatest, least = func.max, func.min
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=["stock_id", "interval", "start"],
+        set_={
+            "high": greatest(table.c.high, excluded.high),
+            "low": least(table.c.low, excluded.low),
+            "close": excluded.close,
+            "volume": table.c.volume + excluded.volume,
+            "updated_at": excluded.updated_at,
+        },
+    )
+
+
+# Process-wide aggregator fed by the WebSocket ingest.
+bar_aggregator = BarAggregator()
@@ -0,0 +1,180 @@
+# app/services/price_writer.py
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import Integer, Numeric, bindparam, column, values
+
+from app.models import db, Stock
+from app.services.money import from_cents, to_cents
+from app.services.price_cache import price_cache
+
+# How often an unknown ticker may trigger a reload of the ticker map.
+TICKER_RELOAD_SECONDS = 60
+# A stock that keeps trading at an unchanged price has only its
+# last_updated rewritten, at most this often.
+LAST_UPDATED_REFRESH_SECONDS = 60
+
+
+class TickerIndex:
+    """
+    In-memory ticker -> stock id map, plus the last price written for each
+    stock (and when) so unchanged prices never reach the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}          # ticker -> stock_id
+        self._prices = {}       # stock_id -> last persisted price (Decimal)
+        self._written = {}      # stock_id -> monotonic time its row was last written
+        self._loaded_at = None
+
+    def load(self):
+        """
+        (Re)load the map from the stocks table. Must run inside an app context.
+        """
+        rows = Stock.query.with_entities(Stock.id, Stock.ticker_symbol, Stock.market_price).all()
+        with self._lock:
+            self._ids = {ticker: stock_id for stock_id, ticker, _ in rows}
+            self._prices = {stock_id: price for stock_id, _, price in rows}
+            self._written = {}
+            self._loaded_at = time.monotonic()
+        price_cache.bind(self._ids)
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def lookup(self, ticker):
+        """
+        Return the stock id for a ticker, reloading the map (rate limited)
+        when the ticker is unknown so newly added stocks are picked up.
+        """
+        stock_id = self._ids.get(ticker)
+        if stock_id is None and (
+            not self.loaded or time.monotonic() - self._loaded_at > TICKER_RELOAD_SECONDS
+        ):
+            self.load()
+            stock_id = self._ids.get(ticker)
+        return stock_id
+
+    def last_price(self, stock_id):
+        return self._prices.get(stock_id)
+
+    def remember(self, prices, now=None):
+        now = now or time.monotonic()
+        with self._lock:
+            self._prices.update(prices)
+            self._written.update(dict.fromkeys(prices, now))
+
+    def written_before(self, stock_id, cutoff):
+        # Rows this process never wrote count as old.
+        return self._written.get(stock_id, float("-inf")) < cutoff
+
+
+ticker_index = TickerIndex()
+
+
+def _to_cents(price):
+    # market_price is Numeric(10, 2); compare and store at that precision.
+    return from_cents(to_cents(price))
+
+
+def write_prices(prices, now=None):
+    """
+    Persist {stock_id: price} with a single bulk UPDATE.
+    On Postgres this is one `UPDATE ... FROM (VALUES ...)` statement,
+    elsewhere one executemany. The caller owns the commit.
+    """
+    if not prices:
+        return
+    now = now or datetime.utcnow()
+    table = Stock.__table__
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        batch = values(
+            column("id", Integer), column("price", Numeric(10, 2)), name="price_batch"
+        ).data(list(prices.items()))
+        stmt = (
+            table.update()
+            .where(table.c.id == batch.c.id)
+            .values(market_price=batch.c.price, last_updated=now)
+        )
+        db.session.execute(stmt)
+    else:
+        stmt = (
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(market_price=bindparam("b_price"), last_updated=now)
+        )
+        db.session.execute(
+            stmt, [{"b_id": stock_id, "b_price": price} for stock_id, price in prices.items()]
+        )
+
+
+def touch_prices(stock_ids, now=None):
+    """
+    Set last_updated for `stock_ids` without changing their prices.
+    The caller owns the commit.
+    """
+    if not stock_ids:
+        return
+    table = Stock.__table__
+    db.session.execute(
+        table.update().where(table.c.id.in_(stock_ids)).values(last_updated=now or datetime.utcnow())
+    )
+
+
+def flush_price_updates(updates):
+    """
+    Write one coalesced batch of feed updates ({ticker: (price, trade_time)}).
+
+    Tickers are resolved through the in-memory ticker index, unchanged prices
+    are dropped, and the rest are written with one bulk UPDATE and one commit.
+    Stocks still trading at their stored price get last_updated rewritten
+    once LAST_UPDATED_REFRESH_SECONDS have passed, in the same commit.
+    Must run inside an application context.
+
+    Returns (ticked, changed): stock_id -> price for every known ticker in the
+    batch, and the subset whose price actually changed.
+    """
+    if not updates:
+        return {}, {}
+
+    ticked = {}
+    for ticker, (price, _) in updates.items():
+        stock_id = ticker_index.lookup(ticker)
+        if stock_id is None:
+            print(f"Ignored update for unseeded ticker: {ticker}")
+            continue
+        ticked[stock_id] = _to_cents(price)
+
+    changed = {
+        stock_id: price for stock_id, price in ticked.items()
+        if ticker_index.last_price(stock_id) != price
+    }
+    cutoff = time.monotonic() - LAST_UPDATED_REFRESH_SECONDS
+    touched = {
+        stock_id: price for stock_id, price in ticked.items()
+        if stock_id not in changed and ticker_index.written_before(stock_id, cutoff)
+    }
+    if not changed and not touched:
+        return ticked, changed
+
+    started = time.perf_counter()
+    try:
+        write_prices(changed)
+        touch_prices(list(touched))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print("WS price flush error:", e)
+        return ticked, {}
+    elapsed = time.perf_counter() - started
+    ticker_index.remember({**changed, **touched})
+    if not changed:
+        return ticked, changed
+
+    rate = len(changed) / elapsed if elapsed > 0 else float("inf")
+    print(f"WS flushed {len(changed)} prices in {elapsed * 1000:.1f} ms ({rate:.0f} rows/s)")
+    return ticked, changed
@@ -0,0 +1,136 @@
+# app/services/quote_fetcher.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.price_cache import price_cache
+
+# Finnhub's free tier allows 60 REST calls per minute.
+FINNHUB_CALLS_PER_MINUTE = int(os.getenv("FINNHUB_CALLS_PER_MINUTE", "60"))
+QUOTE_WORKERS = int(os.getenv("FINNHUB_QUOTE_WORKERS", "8"))
+# A WebSocket price newer than this is considered live and is not re-polled.
+WS_FRESH_SECONDS = 60
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `rate` tokens are added per second up to
+    `capacity`; acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, calls):
+        # Allow a burst of up to five seconds' worth of calls.
+        return cls(rate=calls / 60.0, capacity=max(1, calls // 12))
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class QuoteRefresher:
+    """
+    Fetches Finnhub quotes for many symbols concurrently.
+
+    One finnhub.Client (and so one pooled HTTP session) is shared by a
+    bounded thread pool, and every request first takes a token from a
+    bucket sized to the account's per-minute quota.
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_workers=QUOTE_WORKERS,
+                 calls_per_minute=FINNHUB_CALLS_PER_MINUTE):
+        # finnhub and requests load with the first refresher, not the app.
+        import finnhub
+        from requests.adapters import HTTPAdapter
+
+        self.client = finnhub.Client(api_key=api_key or os.getenv("FINNHUB_API_KEY"))
+        if base_url:
+            self.client.API_URL = base_url
+        # Keep one connection per worker alive instead of reconnecting each call.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.client._session.mount("https://", adapter)
+        self.client._session.mount("http://", adapter)
+        self.max_workers = max_workers
+        self.limiter = TokenBucket.per_minute(calls_per_minute)
+        self._last_polled = {}  # ticker -> datetime of our last REST poll
+
+    def _quote(self, symbol):
+        self.limiter.acquire()
+        try:
+            return symbol, self.client.quote(symbol)
+        except Exception as e:
+            print(f"Error fetching quote for {symbol}: {e}")
+            return symbol, None
+
+    def fetch(self, symbols):
+        """
+        Return {symbol: quote dict} for every symbol that could be fetched.
+        """
+        quotes = {}
+        if not symbols:
+            return quotes
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for symbol, quote in pool.map(self._quote, symbols):
+                if quote:
+                    quotes[symbol] = quote
+        return quotes
+
+    def stale_symbols(self, tickers):
+        """
+        Filter tickers down to the ones worth polling. A symbol is skipped
+        when the price cache holds a WebSocket price newer than our last
+        REST poll.
+        """
+        stale = []
+        for ticker in tickers:
+            entry = price_cache.get_ticker(ticker, max_age=WS_FRESH_SECONDS)
+            polled = self._last_polled.get(ticker)
+            if entry and entry.source == "ws" and polled and entry.timestamp > polled:
+                continue
+            stale.append(ticker)
+        return stale
+
+    def due_symbols(self, tickers, min_age, now):
+        """
+        Filter tickers down to the ones not REST-polled in the last
+        `min_age` (a timedelta) before `now`.
+        """
+        due = []
+        for ticker in tickers:
+            polled = self._last_polled.get(ticker)
+            if polled is None or now - polled >= min_age:
+                due.append(ticker)
+        return due
+
+    def mark_polled(self, symbols, when):
+        for symbol in symbols:
+            self._last_polled[symbol] = when
+
+
+_refresher = None
+
+
+def get_quote_refresher():
+    """
+    Process-wide refresher, created on first use.
+    """
+    global _refresher
+    if _refresher is None:
+        _refresher = QuoteRefresher(base_url=os.getenv("FINNHUB_API_URL"))
+    return _refresher
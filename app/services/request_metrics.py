@@ -0,0 +1,98 @@
+# app/services/request_metrics.py
+"""
+Per-request instrumentation, installed when REQUEST_METRICS=1.
+
+For every request it records wall time, SQL statement count, time spent
+in the database and response size into the metrics registry, labelled by
+method, route and status, and logs statement shapes that repeat more than
+N_PLUS_ONE_THRESHOLD times in one request (a likely N+1 query).
+"""
+import os
+import re
+import time
+from collections import Counter as ShapeCounter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.services.metrics import registry, COUNT_BUCKETS, SIZE_BUCKETS
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Request wall time.", ["method", "route", "status"])
+sql_statements = registry.histogram(
+    "http_request_sql_statements", "SQL statements executed per request.", ["method", "route"],
+    buckets=COUNT_BUCKETS)
+sql_seconds = registry.histogram(
+    "http_request_sql_seconds", "Time spent executing SQL per request.", ["method", "route"])
+response_bytes = registry.histogram(
+    "http_response_size_bytes", "Response body size.", ["method", "route"], buckets=SIZE_BUCKETS)
+n_plus_one = registry.counter(
+    "http_request_n_plus_one_total", "Requests that repeated one statement shape too often.", ["method", "route"])
+
+# Expanded IN lists vary in length; collapse them so they share a shape.
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\([^)]*\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\([^)]*\)s|%s|:\w+))+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    return _SPACES.sub(" ", _IN_LIST.sub("(?)", statement)).strip()
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else "<unmatched>"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "sql_shapes" in g:
+        conn.info.setdefault("request_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not (has_request_context() and "sql_shapes" in g):
+        return
+    started = conn.info.get("request_query_started")
+    if started:
+        g.sql_seconds += time.perf_counter() - started.pop()
+    g.sql_count += 1
+    g.sql_shapes[statement_shape(statement)] += 1
+
+
+def init_request_metrics(app):
+    """
+    Install the request hooks and the SQL event listeners.
+    """
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.sql_count = 0
+        g.sql_seconds = 0.0
+        g.sql_shapes = ShapeCounter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        if "request_started" not in g:
+            return response
+        route, method = _route(), request.method
+        request_seconds.observe(time.perf_counter() - g.request_started,
+                                method=method, route=route, status=response.status_code)
+        sql_statements.observe(g.sql_count, method=method, route=route)
+        sql_seconds.observe(g.sql_seconds, method=method, route=route)
+        # Streamed and file responses only know their size from the header.
+        size = response.calculate_content_length()
+        if size is None:
+            size = response.content_length
+        if size is not None:
+            response_bytes.observe(size, method=method, route=route)
+
+        repeated = [(count, shape) for shape, count in g.sql_shapes.items() if count > N_PLUS_ONE_THRESHOLD]
+        if repeated:
+            n_plus_one.inc(method=method, route=route)
+            for count, shape in sorted(repeated, reverse=True):
+                print(f"Possible N+1 on {method} {route}: {count}x {shape[:200]}")
+        return response
@@ -0,0 +1,199 @@
+# app/services/stock_search.py
+import os
+import threading
+import time
+from bisect import bisect_left
+from itertools import islice
+
+from sqlalchemy import event, inspect
+
+from app.models import Stock
+
+# Rebuild at least this often so stocks added by other processes show up.
+REBUILD_SECONDS = 300
+# Set STOCK_SEARCH_INDEX=0 to always search in SQL (pg_trgm on Postgres).
+INDEX_ENABLED = os.getenv("STOCK_SEARCH_INDEX", "1") != "0"
+
+# Match ranks, best first.
+EXACT_TICKER, TICKER_PREFIX, NAME_PREFIX, WORD_PREFIX, SUBSTRING = range(5)
+# Name and word prefixes up to this long match many stocks; their best
+# TOP_K (by ticker) are kept ready instead of scanned per keystroke.
+SHORT_PREFIX = 2
+# The search route's largest limit.
+TOP_K = 100
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class StockSearchIndex:
+    """
+    In-memory typeahead index over ticker symbols and company names.
+
+    - Exact tickers are a dict lookup.
+    - Ticker, name and per-word prefixes are ranges in sorted key lists,
+      found with bisect. Ticker ranges are read only up to the limit; for
+      name and word prefixes of up to SHORT_PREFIX characters the best
+      TOP_K stocks are precomputed.
+    - Substrings of 3+ characters go through a trigram -> stock ids index
+      and are verified against the text; shorter substrings fall back to
+      a scan that stops as soon as enough results are found.
+
+    Results are ranked exact ticker > ticker prefix > name prefix >
+    word prefix > substring, then by ticker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._dirty = True
+        self._tickers = {}      # upper ticker -> id
+        self._keys = {}         # id -> (upper ticker, lower name)
+        self._ticker_list = []  # sorted [(upper ticker, id)]
+        self._name_list = []    # sorted [(lower name, id)]
+        self._word_list = []    # sorted [(lower word, id)]
+        self._short_names = {}  # short name prefix -> [id] by ticker, at most TOP_K
+        self._short_words = {}  # short word prefix -> [id] by ticker, at most TOP_K
+        self._grams = {}        # trigram -> set(id)
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    @property
+    def stale(self):
+        return self._dirty or self._built_at is None or time.monotonic() - self._built_at > REBUILD_SECONDS
+
+    def build(self, rows=None):
+        """
+        Rebuild from (id, ticker_symbol, company_name) rows, read from the
+        stocks table when not given (needs an application context).
+        """
+        if rows is None:
+            rows = Stock.query.with_entities(Stock.id, Stock.ticker_symbol, Stock.company_name).all()
+        tickers, keys, grams = {}, {}, {}
+        ticker_list, name_list, word_list = [], [], []
+        for stock_id, ticker, name in rows:
+            ticker, name = ticker.upper(), (name or "").lower()
+            tickers[ticker] = stock_id
+            keys[stock_id] = (ticker, name)
+            ticker_list.append((ticker, stock_id))
+            name_list.append((name, stock_id))
+            word_list.extend((word, stock_id) for word in set(name.split()))
+            for gram in _trigrams(ticker.lower()) | _trigrams(name):
+                grams.setdefault(gram, set()).add(stock_id)
+        ticker_list.sort()
+        name_list.sort()
+        word_list.sort()
+        short_names = self._short_prefixes(name_list, keys)
+        short_words = self._short_prefixes(word_list, keys)
+        with self._lock:
+            self._tickers, self._keys, self._grams = tickers, keys, grams
+            self._ticker_list, self._name_list, self._word_list = ticker_list, name_list, word_list
+            self._short_names, self._short_words = short_names, short_words
+            self._built_at = time.monotonic()
+            self._dirty = False
+
+    def ensure_fresh(self):
+        if self.stale:
+            self.build()
+
+    def search(self, query, limit=20):
+        """
+        Return up to `limit` stock ids matching `query`, best first.
+        """
+        upper, lower = query.strip().upper(), query.strip().lower()
+        if not lower:
+            return []
+        with self._lock:
+            ranks = {}
+
+            def add(stock_id, rank):
+                if rank < ranks.get(stock_id, SUBSTRING + 1):
+                    ranks[stock_id] = rank
+
+            if upper in self._tickers:
+                add(self._tickers[upper], EXACT_TICKER)
+            # Each tier ranks below the previous ones and in ticker order
+            # within itself, so once `limit` stocks are in, the rest can wait.
+            # The ticker list is in ticker order: its first matches are its best.
+            for stock_id in islice(self._prefixed(self._ticker_list, upper), limit):
+                add(stock_id, TICKER_PREFIX)
+            tiers = (
+                (NAME_PREFIX, self._name_list, self._short_names),
+                (WORD_PREFIX, self._word_list, self._short_words),
+            )
+            for rank, keys, short in tiers:
+                if len(ranks) >= limit:
+                    break
+                if len(lower) <= SHORT_PREFIX and limit <= TOP_K:
+                    matches = short.get(lower, ())
+                else:
+                    matches = self._prefixed(keys, lower)
+                for stock_id in matches:
+                    add(stock_id, rank)
+
+            if len(ranks) < limit:
+                for stock_id in self._substring_matches(lower, limit - len(ranks), ranks):
+                    add(stock_id, SUBSTRING)
+
+            ordered = sorted(ranks, key=lambda stock_id: (ranks[stock_id], self._keys[stock_id][0]))
+            return ordered[:limit]
+
+    @staticmethod
+    def _short_prefixes(keys, key_of):
+        """
+        {prefix: [id]} for every prefix of up to SHORT_PREFIX characters of
+        the (key, id) pairs in `keys`, each list the TOP_K ids with the
+        smallest tickers.
+        """
+        short = {}
+        for key, stock_id in sorted(keys, key=lambda pair: key_of[pair[1]][0]):
+            for prefix in {key[:n] for n in range(1, SHORT_PREFIX + 1) if len(key) >= n}:
+                ids = short.setdefault(prefix, [])
+                if len(ids) < TOP_K and (not ids or ids[-1] != stock_id):
+                    ids.append(stock_id)
+        return short
+
+    @staticmethod
+    def _prefixed(keys, prefix):
+        start = bisect_left(keys, (prefix,))
+        for key, stock_id in keys[start:]:
+            if not key.startswith(prefix):
+                break
+            yield stock_id
+
+    def _substring_matches(self, lower, wanted, seen):
+        if len(lower) >= 3:
+            grams = sorted((self._grams.get(gram, set()) for gram in _trigrams(lower)), key=len)
+            candidates = set.intersection(*grams) if grams and grams[0] else set()
+        else:
+            candidates = self._keys.keys()
+        found = []
+        for stock_id in candidates:
+            if stock_id in seen:
+                continue
+            ticker, name = self._keys[stock_id]
+            if lower in ticker.lower() or lower in name:
+                found.append(stock_id)
+                if len(lower) < 3 and len(found) >= wanted:
+                    break
+        return found
+
+
+search_index = StockSearchIndex()
+
+
+# Any change to a ticker or a company name invalidates the index. Price
+# updates go through bulk UPDATEs and never reach these ORM events.
+@event.listens_for(Stock, "after_insert")
+@event.listens_for(Stock, "after_delete")
+def _stock_added_or_removed(mapper, connection, target):
+    search_index.mark_dirty()
+
+
+@event.listens_for(Stock, "after_update")
+def _stock_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.ticker_symbol.history.has_changes() or state.attrs.company_name.history.has_changes():
+        search_index.mark_dirty()
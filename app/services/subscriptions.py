@@ -0,0 +1,152 @@
+# app/services/subscriptions.py
+"""
+Which symbols the Finnhub WebSocket is subscribed to.
+
+The desired set is every stock somebody holds, watches, has a pending
+order on or has open in a browser (symbol_interest()). SubscriptionManager
+diffs it against what the connection is subscribed to and sends only the
+subscribe/unsubscribe messages needed, in paced batches. Finnhub limits
+the symbols per connection; past FINNHUB_MAX_SYMBOLS the least recently
+wanted symbols are left out, where stocks with pending orders or viewers
+count as wanted on every refresh and the rest when they first appear.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import or_, select, union
+
+from app.models import Stock, Holding, WatchlistStock, Order, OrderStatusEnum
+from app.services.live_updates import active_viewers
+from app.services.metrics import registry
+from app.services.order_book import order_book
+
+# Finnhub's free plan streams up to 50 symbols per connection.
+MAX_SYMBOLS = int(os.getenv("FINNHUB_MAX_SYMBOLS", "50"))
+SUBSCRIPTION_REFRESH_SECONDS = int(os.getenv("FINNHUB_SUBSCRIPTION_REFRESH_SECONDS", "30"))
+# Messages sent back to back, and the pause between batches.
+SUBSCRIBE_BATCH = 25
+SUBSCRIBE_PAUSE_SECONDS = 0.2
+
+active_symbols = registry.gauge("feed_subscriptions", "Symbols the Finnhub WebSocket is subscribed to.")
+subscription_messages = registry.counter(
+    "feed_subscription_messages_total", "Subscribe and unsubscribe messages sent upstream.", ["action"])
+unserved_symbols = registry.gauge(
+    "feed_subscriptions_unserved", "Wanted symbols left unsubscribed because of FINNHUB_MAX_SYMBOLS.")
+
+
+def symbol_interest():
+    """
+    (desired, hot) ticker sets. hot is the part of desired with pending
+    orders or viewers. Must run inside an application context.
+    """
+    interested = union(
+        select(Holding.stock_id).where(Holding.quantity > 0),
+        select(WatchlistStock.stock_id),
+        select(Order.stock_id).where(Order.status == OrderStatusEnum.pending),
+    )
+    viewed = active_viewers.stock_ids()
+    rows = (
+        Stock.query
+        .with_entities(Stock.id, Stock.ticker_symbol)
+        .filter(or_(Stock.id.in_(interested), Stock.id.in_(viewed)))
+        .all()
+    )
+    hot_ids = viewed | order_book.stock_ids()
+    desired = {ticker for _, ticker in rows}
+    hot = {ticker for stock_id, ticker in rows if stock_id in hot_ids}
+    return desired, hot
+
+
+class SubscriptionManager:
+    """
+    Keeps one connection's subscriptions in line with `interest()`, a
+    callable returning (desired, hot) ticker sets.
+    """
+
+    def __init__(self, interest=symbol_interest, limit=MAX_SYMBOLS, batch=SUBSCRIBE_BATCH,
+                 pause=SUBSCRIBE_PAUSE_SECONDS):
+        self.interest = interest
+        self.limit = limit
+        self.batch = batch
+        self.pause = pause
+        self.active = set()
+        self.target = set()
+        self._send = None
+        self._wanted = OrderedDict()  # ticker -> None, least recently wanted first
+        self._lock = threading.Lock()
+
+    def connect(self, send):
+        """
+        Start over on a new connection; `send` takes one text message.
+        """
+        with self._lock:
+            self._send = send
+            self.active = set()
+            active_symbols.set(0)
+
+    def disconnect(self):
+        with self._lock:
+            self._send = None
+            self.active = set()
+            active_symbols.set(0)
+
+    def plan(self, desired, hot=()):
+        """
+        (subscribe, unsubscribe) ticker lists that take the connection to
+        the `limit` most recently wanted of `desired`. Subscribes come most
+        recently wanted first, so a resubscription restores hot symbols first.
+        """
+        wanted = self._wanted
+        for ticker in [t for t in wanted if t not in desired]:
+            del wanted[ticker]
+        for ticker in sorted(desired):
+            if ticker not in wanted:
+                wanted[ticker] = None
+        for ticker in hot:
+            if ticker in wanted:
+                wanted.move_to_end(ticker)
+        ranked = list(reversed(wanted))
+        target = self.target = set(ranked[:self.limit] if self.limit else ranked)
+        unserved_symbols.set(len(wanted) - len(target))
+        return [t for t in ranked if t in target and t not in self.active], sorted(self.active - target)
+
+    def refresh(self):
+        """
+        Recompute the desired set and apply the difference. Returns
+        (subscribed, unsubscribed) counts. Must run inside an application
+        context.
+        """
+        desired, hot = self.interest()
+        return self.apply(desired, hot)
+
+    def apply(self, desired, hot=()):
+        with self._lock:
+            subscribe, unsubscribe = self.plan(desired, hot)
+            if self._send is None:
+                return 0, 0
+            # Unsubscribe first so the connection stays under the limit.
+            messages = [("unsubscribe", t) for t in unsubscribe] + [("subscribe", t) for t in subscribe]
+            sent = {"subscribe": 0, "unsubscribe": 0}
+            try:
+                for n, (action, ticker) in enumerate(messages):
+                    if n and n % self.batch == 0:
+                        time.sleep(self.pause)
+                    self._send(json.dumps({"type": action, "symbol": ticker}))
+                    if action == "subscribe":
+                        self.active.add(ticker)
+                    else:
+                        self.active.discard(ticker)
+                    sent[action] += 1
+            except Exception as e:
+                # The connection dropped; on_open starts over with connect().
+                print("Subscription update error:", e)
+            for action, count in sent.items():
+                if count:
+                    subscription_messages.inc(count, action=action)
+            active_symbols.set(len(self.active))
+        if messages:
+            print(f"Feed subscriptions: +{sent['subscribe']} -{sent['unsubscribe']} ({len(self.active)} active)")
+        return sent["subscribe"], sent["unsubscribe"]
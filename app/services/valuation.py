@@ -0,0 +1,39 @@
+# app/services/valuation.py
+from decimal import Decimal
+
+from app.models import db, Portfolio, Holding, Stock
+from app.services.price_cache import price_cache
+
+
+def holdings_values(user_id=None, portfolio_ids=None):
+    """
+    Value the holdings of many portfolios with one query over
+    (portfolio, stock, quantity, market_price, last_updated).
+
+    Returns {portfolio_id: Decimal}. Portfolios without holdings map to 0.
+    The result is meant for Portfolio.to_dict(holdings_value=...), which
+    applies the usual cash/initial-investment math and rounding.
+    Prices are resolved like Portfolio.holdings_value() and Stock.to_dict():
+    whichever of the price cache and the stock row is newer, and summed as
+    exact Decimal products, so every path reports the same value.
+    """
+    query = (
+        db.session.query(Portfolio.id, Holding.stock_id, Holding.quantity, Stock.market_price, Stock.last_updated)
+        .outerjoin(Holding, Holding.portfolio_id == Portfolio.id)
+        .outerjoin(Stock, Stock.id == Holding.stock_id)
+    )
+    if user_id is not None:
+        query = query.filter(Portfolio.user_id == user_id)
+    if portfolio_ids is not None:
+        query = query.filter(Portfolio.id.in_(portfolio_ids))
+
+    totals = {}  # portfolio_id -> Decimal
+    for portfolio_id, stock_id, quantity, market_price, last_updated in query.all():
+        total = totals.setdefault(portfolio_id, Decimal(0))
+        if stock_id is None or quantity is None:
+            continue
+        price, _ = price_cache.resolve_id(stock_id, market_price, last_updated)
+        if price is None:
+            continue
+        totals[portfolio_id] = total + quantity * price
+    return totals
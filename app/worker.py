@@ -0,0 +1,137 @@
+# app/worker.py
+"""
+Background worker: the job scheduler, the Finnhub price feed and order
+execution. Web processes (APP_ROLE=web) run none of these.
+
+    flask worker
+    python -m app.worker
+
+Several workers may run; they elect a leader and the others stand by.
+"""
+import os
+import threading
+
+
+def _optional_int(name):
+    # Unset or empty means the job is paused in that phase.
+    value = os.getenv(name, "").strip()
+    return int(value) if value else None
+
+
+# REST quote refresh cadence, for symbols the WebSocket is not keeping fresh:
+# during sessions, at night and on weekends, and on exchange holidays.
+PRICE_POLL_MINUTES = int(os.getenv("PRICE_POLL_MINUTES", "5"))
+PRICE_POLL_OFF_HOURS_MINUTES = int(os.getenv("PRICE_POLL_OFF_HOURS_MINUTES", "60"))
+PRICE_POLL_HOLIDAY_MINUTES = _optional_int("PRICE_POLL_HOLIDAY_MINUTES")
+# Pending order sweep cadence, in the same phases.
+ORDER_SWEEP_SECONDS = int(os.getenv("ORDER_SWEEP_SECONDS", "60"))
+ORDER_SWEEP_OFF_HOURS_SECONDS = int(os.getenv("ORDER_SWEEP_OFF_HOURS_SECONDS", "900"))
+ORDER_SWEEP_HOLIDAY_SECONDS = _optional_int("ORDER_SWEEP_HOLIDAY_SECONDS")
+# JOBS_MARKET_HOURS_ONLY=1 pauses both jobs outside sessions; =0 keeps them
+# running around the clock, on holidays at the off-hours cadence unless a
+# *_HOLIDAY_* setting says otherwise. Unset, the cadences above apply.
+MARKET_HOURS_ONLY = os.getenv("JOBS_MARKET_HOURS_ONLY", "").strip()
+# Port for the worker's Prometheus metrics (job, ingest and feed metrics);
+# unset serves none. Only the active worker listens.
+METRICS_PORT = _optional_int("WORKER_METRICS_PORT")
+
+
+def _cadence(session, off_hours, holiday):
+    from app.services.adaptive_scheduler import Cadence
+    if MARKET_HOURS_ONLY == "1":
+        return Cadence(session=session, off_hours=None, holiday=None)
+    if MARKET_HOURS_ONLY == "0" and holiday is None:
+        holiday = off_hours
+    return Cadence(session=session, off_hours=off_hours, holiday=holiday)
+
+
+def _in_app_context(app, job):
+    def run():
+        with app.app_context():
+            job()
+    return run
+
+
+def start_services(app, stop=None):
+    """
+    Start the scheduler and, when FINNHUB_API_KEY is set, the price feed,
+    which runs until `stop` (a threading.Event) is set. Returns the scheduler.
+    """
+    from flask_apscheduler import APScheduler
+    from app.jobs.execute_pending_orders import execute_pending_orders
+    from app.services.adaptive_scheduler import AdaptiveScheduler
+    from app.services.live_updates import subscribe_viewers
+    from app.services.order_book import order_book
+
+    with app.app_context():
+        order_book.rebuild()
+
+    # Web processes report which stocks their sockets watch; those are refreshed first.
+    subscribe_viewers()
+
+    scheduler = APScheduler()
+    scheduler.init_app(app)
+    # Jobs run fast in sessions, slowly at night and on weekends, and by
+    # default not at all on holidays.
+    jobs = AdaptiveScheduler(scheduler)
+    jobs.add_job(
+        "execute_pending_orders",
+        _in_app_context(app, execute_pending_orders),
+        _cadence(ORDER_SWEEP_SECONDS, ORDER_SWEEP_OFF_HOURS_SECONDS, ORDER_SWEEP_HOLIDAY_SECONDS),
+    )
+    if os.environ.get("FINNHUB_API_KEY"):
+        from app.jobs.update_stock_prices import update_stock_prices
+        from app.services.finnhub_ws import run_finnhub_ws
+        jobs.add_job(
+            "update_stock_prices",
+            _in_app_context(app, update_stock_prices),
+            _cadence(
+                PRICE_POLL_MINUTES * 60,
+                PRICE_POLL_OFF_HOURS_MINUTES * 60,
+                PRICE_POLL_HOLIDAY_MINUTES * 60 if PRICE_POLL_HOLIDAY_MINUTES is not None else None,
+            ),
+        )
+        threading.Thread(target=run_finnhub_ws, args=(app,), kwargs={"stop": stop}, daemon=True).start()
+    scheduler.start()
+    return scheduler
+
+
+def start_metrics(port):
+    """
+    Serve this process's metrics registry at :port/metrics. A port that is
+    taken (another process on the host got it first) is reported, not fatal.
+    """
+    from app.services.metrics import serve_metrics
+    try:
+        server = serve_metrics(port)
+    except OSError as e:
+        print(f"Worker metrics not served on port {port}:", e)
+        return None
+    print(f"Worker metrics at http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    return server
+
+
+def run_worker(app):
+    """
+    Wait for the worker leader lock, start the background services and
+    block. Only one worker is active at a time; one that loses the lock
+    stops its services and stands by.
+    """
+    from app.services.leader import run_as_leader
+
+    def serve(stop):
+        metrics_server = start_metrics(METRICS_PORT) if METRICS_PORT is not None else None
+        scheduler = start_services(app, stop)
+        stop.wait()
+        # Let a running job finish before another worker starts its own.
+        scheduler.shutdown()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+
+    run_as_leader(app, "worker", serve)
+
+
+if __name__ == "__main__":
+    from app import app
+    run_worker(app)
@@ -0,0 +1,39 @@
+"""Add trigram indexes for stock search
+
+Revision ID: 5b2d8f6e0c13
+Revises: 3e9a7c51d2f0
+Create Date: 2026-10-18 13:41:05.207731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import os
+environment = os.getenv("FLASK_ENV")
+SCHEMA = os.environ.get("SCHEMA")
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2d8f6e0c13'
+down_revision = '3e9a7c51d2f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm GIN indexes let ILIKE '%q%' use an index. Postgres only;
+    # other databases rely on the in-memory search index.
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    table = f"{SCHEMA}.stocks" if environment == "production" else "stocks"
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    op.execute(f"CREATE INDEX IF NOT EXISTS idx_stocks_ticker_trgm ON {table} USING gin (ticker_symbol gin_trgm_ops);")
+    op.execute(f"CREATE INDEX IF NOT EXISTS idx_stocks_company_name_trgm ON {table} USING gin (company_name gin_trgm_ops);")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    prefix = f"{SCHEMA}." if environment == "production" else ""
+    op.execute(f"DROP INDEX IF EXISTS {prefix}idx_stocks_company_name_trgm;")
+    op.execute(f"DROP INDEX IF EXISTS {prefix}idx_stocks_ticker_trgm;")
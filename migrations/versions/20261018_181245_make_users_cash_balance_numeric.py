@@ -0,0 +1,50 @@
+"""Make users.cash_balance numeric
+
+Revision ID: 2c8e4b7d9a16
+Revises: 6e1f0b9a2c47
+Create Date: 2026-10-18 18:12:45.370918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import os
+environment = os.getenv("FLASK_ENV")
+SCHEMA = os.environ.get("SCHEMA")
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8e4b7d9a16'
+down_revision = '6e1f0b9a2c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created from the model have VARCHAR(20) here, migrated ones
+    # NUMERIC(15,2) holding whatever floats were written. Either way, end up
+    # with NUMERIC(15,2) rounded to the cent.
+    if op.get_bind().dialect.name == "postgresql":
+        op.alter_column(
+            'users', 'cash_balance',
+            type_=sa.Numeric(precision=15, scale=2),
+            existing_nullable=True,
+            postgresql_using='ROUND(cash_balance::numeric, 2)',
+            schema=SCHEMA if environment == "production" else None,
+        )
+        return
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('cash_balance',
+                              existing_type=sa.String(length=20),
+                              type_=sa.Numeric(precision=15, scale=2),
+                              existing_nullable=True)
+    op.execute("UPDATE users SET cash_balance = ROUND(cash_balance, 2) WHERE cash_balance IS NOT NULL")
+
+
+def downgrade():
+    # The model declared VARCHAR(20) before this revision.
+    with op.batch_alter_table('users', schema=SCHEMA if environment == "production" else None) as batch_op:
+        batch_op.alter_column('cash_balance',
+                              existing_type=sa.Numeric(precision=15, scale=2),
+                              type_=sa.String(length=20),
+                              existing_nullable=True)
@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+import pytest
+
+# Config reads these on import, so they are set before the app is built.
+_db_dir = tempfile.mkdtemp(prefix="trading-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ["BROKER_URL"] = "memory://"
+os.environ.pop("REQUEST_METRICS", None)
+
+from app import create_app  # noqa: E402
+from app.models import db  # noqa: E402
+from app.services.order_book import order_book  # noqa: E402
+from app.services.price_cache import price_cache  # noqa: E402
+from app.services.price_writer import ticker_index  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app("web")
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+
+@pytest.fixture
+def database(app):
+    """
+    Empty tables on a throwaway SQLite database, and in-process caches
+    that know nothing about the previous test.
+    """
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        price_cache.clear()
+        ticker_index.load()
+        order_book.rebuild()
+        yield db
+        db.session.remove()
@@ -0,0 +1,62 @@
+import json
+import threading
+
+from app.services import broker
+from app.services.broker import RedisBroker
+
+
+class FlakyPubSub:
+    """
+    Stands in for redis-py's PubSub: the first `failures` subscriptions
+    lose their connection, later ones deliver `messages`.
+    """
+
+    def __init__(self, server):
+        self.server = server
+
+    def subscribe(self, channel):
+        self.server.subscribes += 1
+
+    def listen(self):
+        if self.server.subscribes <= self.server.failures:
+            raise ConnectionError("Connection closed by server.")
+        for message in self.server.messages:
+            yield {"type": "message", "data": json.dumps(message)}
+        self.server.drained.set()
+        self.server.broker._closed = True
+
+    def close(self):
+        pass
+
+
+class FlakyRedis:
+    def __init__(self, failures, messages):
+        self.failures = failures
+        self.messages = messages
+        self.subscribes = 0
+        self.drained = threading.Event()
+        self.broker = None
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FlakyPubSub(self)
+
+
+def test_listener_resubscribes_after_connection_errors(monkeypatch):
+    monkeypatch.setattr(broker, "RESUBSCRIBE_MIN_SECONDS", 0.01)
+    redis = FlakyRedis(failures=3, messages=[{"n": 1}, {"n": 2}])
+    # Skip __init__, which needs the redis package.
+    subject = RedisBroker.__new__(RedisBroker)
+    subject._redis = redis
+    subject._connection_errors = (ConnectionError,)
+    subject._lock = threading.Lock()
+    subject._handlers = {}
+    subject._threads = []
+    subject._closed = False
+    redis.broker = subject
+    received = []
+
+    subject.subscribe("prices", received.append)
+
+    assert redis.drained.wait(5)
+    assert redis.subscribes == 4
+    assert received == [{"n": 1}, {"n": 2}]
@@ -0,0 +1,161 @@
+"""
+Fault injection against the local Finnhub stand-in: run_finnhub_ws is
+pointed at a FakeFinnhubServer that drops, refuses or stalls connections
+and keeps symbols quiet, with every interval shortened to fractions of a
+second.
+"""
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.feed.server import FakeFinnhubServer, Faults, SyntheticFeed
+from app.jobs.update_stock_prices import refresh_quotes
+from app.models import db, User, Portfolio, Holding, Stock
+from app.services import feed_watchdog, finnhub_ws, quote_fetcher
+from app.services.broker import PRICES_CHANNEL, get_broker
+from app.services.feed_watchdog import Backoff, heartbeat_timeouts
+from app.services.ingest import IngestPipeline
+from app.services.price_cache import price_cache
+from app.services.price_writer import ticker_index
+
+TICKERS = ["AAA", "BBB", "CCC"]
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+@pytest.fixture
+def holdings(database):
+    """
+    One portfolio holding every ticker in TICKERS, so the feed subscribes to them.
+    """
+    user = User(first_name="Feed", last_name="Test", username="feed_test",
+                email="feed_test@example.com", password="password")
+    stocks = [Stock(ticker_symbol=ticker, company_name=ticker, market_price=Decimal("10.00")) for ticker in TICKERS]
+    db.session.add_all([user] + stocks)
+    db.session.flush()
+    portfolio = Portfolio(user_id=user.id, name="Feed", portfolio_balance=Decimal("1000.00"),
+                          initial_investment=Decimal("1000.00"))
+    db.session.add(portfolio)
+    db.session.flush()
+    db.session.add_all([Holding(portfolio_id=portfolio.id, stock_id=stock.id, quantity=Decimal(1)) for stock in stocks])
+    db.session.commit()
+    ticker_index.load()
+    return {stock.ticker_symbol: stock.id for stock in stocks}
+
+
+@pytest.fixture
+def feed(app, holdings, monkeypatch):
+    """
+    feed(faults, market_open=...) starts a fake server with `faults` and
+    run_finnhub_ws against it (REST quotes included), and returns the server.
+    """
+    monkeypatch.setattr(finnhub_ws, "UPDATE_INTERVAL_SECONDS", 0.2)
+    monkeypatch.setattr(finnhub_ws, "WATCHDOG_SECONDS", 0.1)
+    monkeypatch.setattr(quote_fetcher, "_refresher", None)
+    running = []
+
+    def start(faults, market_open=lambda: False):
+        server = FakeFinnhubServer(SyntheticFeed(rate=500), faults=faults).start()
+        monkeypatch.setenv("FINNHUB_API_URL", server.api_url)
+        stop = threading.Event()
+        thread = threading.Thread(target=finnhub_ws.run_finnhub_ws,
+                                  args=(app, server.url, IngestPipeline(), market_open, stop), daemon=True)
+        thread.start()
+        running.append((server, stop, thread))
+        return server
+
+    yield start
+    for server, stop, thread in running:
+        stop.set()
+        server.stop()
+        thread.join(timeout=5)
+
+
+def test_reconnects_back_off_after_drops_and_refusals(feed, monkeypatch):
+    delays = []  # (exponent, delay) per reconnect
+
+    class RecordingBackoff(Backoff):
+        def __init__(self):
+            super().__init__(base=0.02, cap=0.2)
+
+        def next(self):
+            exponent = self.attempts
+            delay = super().next()
+            delays.append((exponent, delay))
+            return delay
+
+    monkeypatch.setattr(finnhub_ws, "Backoff", RecordingBackoff)
+    server = feed(Faults(disconnect_every=0.3, refuse=2))
+
+    assert wait_for(lambda: server.drops >= 2 and server.connects >= 3)
+    assert server.refused >= 4
+    # None of these connections lasted long enough to reset the backoff,
+    # so every attempt widens the window, up to the cap.
+    exponents = [exponent for exponent, _ in delays]
+    assert exponents[:6] == list(range(6))
+    assert all(0 <= delay <= min(0.2, 0.02 * 2 ** exponent) for exponent, delay in delays)
+
+
+def test_watchdog_closes_a_stalled_connection(feed, monkeypatch):
+    monkeypatch.setattr(feed_watchdog, "HEARTBEAT_SECONDS", 0.5)
+    timeouts = heartbeat_timeouts.value()
+    # Silent (no trades, no pings) from 0.5s to 3s into every connection.
+    server = feed(Faults(stall_every=3, stall_for=2.5))
+
+    assert wait_for(lambda: server.connects >= 2)
+    assert heartbeat_timeouts.value() > timeouts
+    # The server never dropped anything: the client gave up on the silence.
+    assert server.drops == 0
+
+
+def test_quiet_symbols_are_backfilled_over_rest(app, feed, holdings, monkeypatch):
+    monkeypatch.setattr(feed_watchdog, "STALE_SECONDS", 1.0)
+    backfills = []  # (stale tickers, refreshed tickers) per watchdog backfill
+
+    def recording_refresh(symbols):
+        refreshed = refresh_quotes(symbols)
+        backfills.append((set(symbols), set(refreshed)))
+        return refreshed
+
+    monkeypatch.setattr(finnhub_ws, "refresh_quotes", recording_refresh)
+    published = []  # (source, tickers) per price batch sent to the web processes
+    get_broker().subscribe(PRICES_CHANNEL, lambda message: published.append(
+        (message["source"], {ticker for _, ticker, _ in message["prices"]})))
+    started = datetime.utcnow()
+    # The first subscribed symbol, AAA, never trades.
+    server = feed(Faults(quiet=1), market_open=lambda: True)
+
+    assert wait_for(lambda: any("AAA" in refreshed for _, refreshed in backfills))
+    assert server.quote_requests >= 1
+    assert price_cache.get_ticker("AAA").source == "rest"
+    db.session.rollback()
+    assert db.session.get(Stock, holdings["AAA"]).last_updated >= started
+    # Web processes get the backfilled price too.
+    assert any(source == "rest" and "AAA" in tickers for source, tickers in published)
+    # Symbols that trade are written by the feed itself.
+    assert wait_for(lambda: all(price_cache.get_ticker(t) for t in ("BBB", "CCC")))
+    assert {price_cache.get_ticker(t).source for t in ("BBB", "CCC")} == {"ws"}
+
+
+def test_a_failed_flush_does_not_stop_price_updates(feed, monkeypatch):
+    publishes = []
+
+    def flaky_publish(changed, tickers):
+        publishes.append(changed)
+        if len(publishes) == 1:
+            raise ConnectionError("broker unreachable")
+
+    monkeypatch.setattr(finnhub_ws, "publish_price_batch", flaky_publish)
+    feed(Faults())
+
+    assert wait_for(lambda: len(publishes) >= 2)
@@ -0,0 +1,49 @@
+import time
+
+from app.services.ingest import IngestPipeline
+
+
+def test_trades_with_bad_values_are_counted_not_aggregated():
+    pipeline = IngestPipeline(cache=None, bars=None)
+    pipeline.feed('{"type":"trade","data":['
+                  '{"s":"AAA","p":null,"v":1,"t":1700000000000},'
+                  '{"s":"AAA","p":"10.5","v":1,"t":1700000000000},'
+                  '{"s":"AAA","p":10.5,"v":null,"t":1700000000000},'
+                  '{"s":"AAA","p":10.5,"v":"2","t":1700000000000},'
+                  '{"s":null,"p":10.5,"v":1,"t":1700000000000},'
+                  '{"s":"AAA","p":11.0,"v":3,"t":1700000001000},'
+                  '{"s":"AAA","p":10.0,"v":2,"t":1700000002000}]}')
+
+    assert pipeline.process(pipeline.ring.get_batch(timeout=1)) == 3
+
+    assert pipeline.errors == 4
+    stats = pipeline.aggregator.drain()["AAA"]
+    assert (stats.last, stats.high, stats.low, stats.volume, stats.trades) == (10.0, 11.0, 10.0, 5, 3)
+
+
+def test_decoder_survives_a_failing_batch(monkeypatch):
+    pipeline = IngestPipeline(cache=None, bars=None)
+    process = pipeline.process
+    calls = []
+
+    def failing_once(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return process(batch)
+
+    monkeypatch.setattr(pipeline, "process", failing_once)
+    pipeline.start()
+    try:
+        pipeline.feed('{"type":"trade","data":[{"s":"AAA","p":10.5,"v":1,"t":1700000000000}]}')
+        deadline = time.monotonic() + 5
+        while not calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pipeline.feed('{"type":"trade","data":[{"s":"BBB","p":20.5,"v":1,"t":1700000000000}]}')
+        while pipeline.trades < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        pipeline.stop()
+
+    assert pipeline.errors == 1
+    assert set(pipeline.aggregator.drain()) == {"BBB"}
@@ -0,0 +1,27 @@
+import threading
+
+from app.services import leader
+from app.services.leader import LeaderLock, run_as_leader
+
+
+def test_leader_that_loses_the_lock_stops_and_stands_by(app, monkeypatch, tmp_path):
+    monkeypatch.setattr(leader, "LOCK_DIR", str(tmp_path))
+    monkeypatch.setattr(leader, "LEADER_CHECK_SECONDS", 0.05)
+    monkeypatch.setattr(leader, "LEADER_RETRY_SECONDS", 0.05)
+    terms = []  # the stop event of each term this process leads
+    # The first term's lock goes away (say its connection dropped).
+    monkeypatch.setattr(LeaderLock, "still_held", lambda self: len(terms) > 1)
+
+    def target(stop):
+        terms.append(stop)
+        if len(terms) == 1:
+            stop.wait()
+
+    thread = threading.Thread(target=run_as_leader, args=(app, "test", target), daemon=True)
+    thread.start()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert len(terms) == 2
+    # The first term was stopped; the second ended on its own.
+    assert terms[0].is_set()
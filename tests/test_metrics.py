@@ -0,0 +1,59 @@
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from app.services.adaptive_scheduler import job_duration, job_runs
+from app.worker import start_metrics
+
+
+@pytest.fixture
+def worker_metrics():
+    """
+    The worker's metrics listener on a free port; yields its base URL.
+    """
+    server = start_metrics(0)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def scrape(url):
+    with urlopen(url, timeout=5) as response:
+        assert response.headers["Content-Type"].startswith("text/plain")
+        return response.read().decode()
+
+
+def test_worker_serves_scheduler_metrics(worker_metrics):
+    job_duration.observe(0.2, job="metrics_test")
+    job_runs.inc(job="metrics_test", phase="session", outcome="ok")
+
+    body = scrape(f"{worker_metrics}/metrics")
+
+    assert 'scheduler_job_duration_seconds_count{job="metrics_test"} 1' in body
+    assert 'scheduler_job_runs_total{job="metrics_test",phase="session",outcome="ok"} 1' in body
+    with pytest.raises(HTTPError) as error:
+        urlopen(f"{worker_metrics}/other", timeout=5)
+    assert error.value.code == 404
+
+
+def test_worker_serves_ingest_and_feed_metrics(worker_metrics):
+    from app.services import feed_watchdog, subscriptions  # noqa: F401  registers the feed_* metrics
+    from app.services.ingest import IngestPipeline
+
+    pipeline = IngestPipeline(cache=None, bars=None)
+    pipeline.feed('{"type":"trade","data":[{"s":"AAA","p":10.5,"v":3,"t":1700000000000}]}')
+    pipeline.feed("not json")
+    pipeline.process(pipeline.ring.get_batch(timeout=1))
+    pipeline.report()
+
+    lines = scrape(f"{worker_metrics}/metrics").splitlines()
+    names = {line.split("{")[0].split(" ")[0] for line in lines if not line.startswith("#")}
+
+    # Depth and drops are there before anything was ever dropped.
+    assert "ingest_queue_depth 0" in lines
+    assert "ingest_frames_dropped_total" in names
+    for stage in ("queue", "decode", "aggregate"):
+        assert any(line.startswith(f'ingest_stage_seconds_count{{stage="{stage}"}}') for line in lines)
+    assert {"feed_reconnects_total", "feed_heartbeat_timeouts_total", "feed_stale_symbols",
+            "feed_subscriptions", "feed_subscriptions_unserved"} <= names
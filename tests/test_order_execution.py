@@ -0,0 +1,163 @@
+"""
+Order execution under concurrency: 100 immediate orders placed from 16
+threads while sweeps race to fill the same resting limit orders, then the
+invariants every portfolio must satisfy afterwards.
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func
+
+from app.models import db, User, Portfolio, Holding, Stock, Order, OrderStatusEnum, OrderTypeEnum
+from app.services.order_execution import place_order, fill_pending_orders, OrderRejected, OrderConflict
+
+PRICE = Decimal("10.00")
+CENT = Decimal("0.01")
+BALANCE = Decimal("300.00")
+PORTFOLIOS = 4
+ORDERS_PER_PORTFOLIO = 25
+LIMIT_ORDERS_PER_PORTFOLIO = 5
+THREADS = 16
+SWEEPS = 4
+
+
+@pytest.fixture
+def market(database):
+    """
+    A stock at PRICE and PORTFOLIOS portfolios with BALANCE cash each and
+    resting limit buys at PRICE. Returns (stock id, portfolio ids, limit order ids).
+    """
+    user = User(first_name="Order", last_name="Test", username="order_test",
+                email="order_test@example.com", password="password")
+    stock = Stock(ticker_symbol="ORD", company_name="Orders", market_price=PRICE)
+    db.session.add_all([user, stock])
+    db.session.flush()
+    portfolios = [
+        Portfolio(user_id=user.id, name=f"Orders {i}", portfolio_balance=BALANCE, initial_investment=BALANCE)
+        for i in range(PORTFOLIOS)
+    ]
+    db.session.add_all(portfolios)
+    db.session.flush()
+    pending = [
+        Order(portfolio_id=portfolio.id, stock_id=stock.id, order_type=OrderTypeEnum.buy,
+              quantity=Decimal(1), target_price=PRICE, status=OrderStatusEnum.pending)
+        for portfolio in portfolios for _ in range(LIMIT_ORDERS_PER_PORTFOLIO)
+    ]
+    db.session.add_all(pending)
+    db.session.commit()
+    return stock.id, [p.id for p in portfolios], [o.id for o in pending]
+
+
+def violations(portfolio_id, stock_id):
+    """
+    Invariants broken by one portfolio: its cash and holding must equal
+    what its executed orders imply, neither may go negative, and no
+    idempotency key may belong to two orders.
+    """
+    problems = []
+    portfolio = db.session.get(Portfolio, portfolio_id)
+    holding = Holding.query.filter_by(portfolio_id=portfolio_id, stock_id=stock_id).first()
+    held = Decimal(str(holding.quantity)) if holding else Decimal(0)
+    executed = (
+        Order.query
+        .with_entities(Order.order_type, Order.quantity, Order.executed_price)
+        .filter_by(portfolio_id=portfolio_id, status=OrderStatusEnum.executed)
+        .all()
+    )
+    cash, shares = BALANCE, Decimal(0)
+    for order_type, quantity, price in executed:
+        quantity = Decimal(str(quantity))
+        amount = quantity * Decimal(str(price))
+        if order_type == OrderTypeEnum.buy:
+            cash, shares = cash - amount, shares + quantity
+        else:
+            cash, shares = cash + amount, shares - quantity
+    actual_cash = Decimal(str(portfolio.portfolio_balance)).quantize(CENT)
+    if actual_cash < 0:
+        problems.append(f"negative balance {actual_cash}")
+    if actual_cash != cash.quantize(CENT):
+        problems.append(f"balance {actual_cash} != {cash.quantize(CENT)} implied by executed orders")
+    if held < 0:
+        problems.append(f"negative holding {held}")
+    if held != shares:
+        problems.append(f"holding {held} != {shares} implied by executed orders")
+    duplicates = (
+        db.session.query(Order.idempotency_key)
+        .filter(Order.portfolio_id == portfolio_id, Order.idempotency_key.isnot(None))
+        .group_by(Order.idempotency_key)
+        .having(func.count() > 1)
+        .all()
+    )
+    if duplicates:
+        problems.append(f"{len(duplicates)} idempotency keys used by more than one order")
+    return problems
+
+
+def test_concurrent_orders_keep_invariants(app, market):
+    stock_id, portfolio_ids, pending_ids = market
+    rng = random.Random(16)
+    tasks = []
+    for portfolio_id in portfolio_ids:
+        for i in range(ORDERS_PER_PORTFOLIO):
+            # Every tenth order retries the previous one's idempotency key.
+            key = f"test-{portfolio_id}-{i - 1 if i % 10 == 9 else i}"
+            tasks.append((portfolio_id, "buy" if rng.random() < 0.7 else "sell", rng.randint(1, 5), key))
+    rng.shuffle(tasks)
+
+    def place(task):
+        portfolio_id, order_type, quantity, key = task
+        with app.app_context():
+            try:
+                order, replayed = place_order(portfolio_id, stock_id, order_type, quantity,
+                                              idempotency_key=key, market_open=True)
+                return "replayed" if replayed else "placed"
+            except OrderRejected:
+                return "rejected"
+            except OrderConflict:
+                return "conflict"
+
+    def sweep():
+        with app.app_context():
+            try:
+                return len(fill_pending_orders({order_id: PRICE for order_id in pending_ids}))
+            except OrderConflict:
+                return 0
+
+    with ThreadPoolExecutor(max_workers=THREADS + SWEEPS) as pool:
+        sweepers = [pool.submit(sweep) for _ in range(SWEEPS)]
+        outcomes = list(pool.map(place, tasks))
+        swept = sum(future.result() for future in sweepers)
+
+    assert len(outcomes) == PORTFOLIOS * ORDERS_PER_PORTFOLIO
+    # Sells beyond the holding and buys beyond the cash must be refused.
+    assert "rejected" in outcomes
+    db.session.expire_all()
+    assert {pid: violations(pid, stock_id) for pid in portfolio_ids} == {pid: [] for pid in portfolio_ids}
+    # Every limit order was settled once: filled by exactly one sweep, or
+    # cancelled when its portfolio could no longer pay.
+    statuses = dict(
+        Order.query.with_entities(Order.status, func.count())
+        .filter(Order.id.in_(pending_ids)).group_by(Order.status).all()
+    )
+    assert OrderStatusEnum.pending not in statuses
+    assert statuses.get(OrderStatusEnum.executed, 0) == swept
+
+
+def test_idempotency_key_replay_returns_the_same_order(market):
+    stock_id, portfolio_ids, _ = market
+    portfolio_id = portfolio_ids[0]
+
+    first, replayed = place_order(portfolio_id, stock_id, "buy", 2, idempotency_key="once", market_open=True)
+    assert not replayed
+    balance = db.session.get(Portfolio, portfolio_id).portfolio_balance
+
+    again, replayed = place_order(portfolio_id, stock_id, "buy", 2, idempotency_key="once", market_open=True)
+
+    assert replayed
+    assert again.id == first.id
+    db.session.expire_all()
+    assert db.session.get(Portfolio, portfolio_id).portfolio_balance == balance
+    assert Order.query.filter_by(portfolio_id=portfolio_id, idempotency_key="once").count() == 1
+    assert violations(portfolio_id, stock_id) == []
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from app.models import db, User, Portfolio, Stock, Order, OrderStatusEnum, OrderTypeEnum
+from app.services.order_vector import PendingOrderArrays, encode_row
+
+
+def test_load_encodes_orders_in_sql_like_python(database):
+    user = User(first_name="Vector", last_name="Test", username="vector_test",
+                email="vector_test@example.com", password="password")
+    stock = Stock(ticker_symbol="VEC", company_name="Vector", market_price=Decimal("10.00"))
+    db.session.add_all([user, stock])
+    db.session.flush()
+    portfolio = Portfolio(user_id=user.id, name="Vector", portfolio_balance=Decimal("100.00"))
+    db.session.add(portfolio)
+    db.session.flush()
+    now = datetime.utcnow().replace(microsecond=999999)
+    specs = [
+        (OrderTypeEnum.buy, None, None),
+        (OrderTypeEnum.sell, Decimal("10.05"), None),
+        (OrderTypeEnum.buy, Decimal("0.29"), now - timedelta(minutes=5)),
+        (OrderTypeEnum.sell, Decimal("12345.67"), now + timedelta(minutes=5)),
+    ]
+    orders = [
+        Order(portfolio_id=portfolio.id, stock_id=stock.id, order_type=order_type, quantity=Decimal(1),
+              target_price=target_price, scheduled_time=scheduled_time, status=OrderStatusEnum.pending)
+        for order_type, target_price, scheduled_time in specs
+    ]
+    filled = Order(portfolio_id=portfolio.id, stock_id=stock.id, order_type=OrderTypeEnum.buy,
+                   quantity=Decimal(1), status=OrderStatusEnum.executed)
+    db.session.add_all(orders + [filled])
+    db.session.commit()
+
+    arrays = PendingOrderArrays.load()
+
+    expected = PendingOrderArrays.from_rows([
+        encode_row(order.id, order.stock_id, order.order_type, order.target_price, order.scheduled_time)
+        for order in orders
+    ])
+    order = np.argsort(arrays.order_id)
+    for column in PendingOrderArrays.__slots__:
+        assert getattr(arrays, column)[order].tolist() == getattr(expected, column).tolist(), column
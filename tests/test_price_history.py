@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+from sqlalchemy.exc import OperationalError
+
+from app.models import db, PriceBar, Stock
+from app.services.price_history import BarAggregator
+from app.services.price_writer import ticker_index
+
+# 2024-01-02 14:30:00 UTC, the start of a minute, hour and day bucket.
+MINUTE = 1704205800
+
+
+def test_failed_flush_keeps_trades_for_the_next_one(database, monkeypatch):
+    stock = Stock(ticker_symbol="AAA", company_name="AAA", market_price=Decimal("10.00"))
+    db.session.add(stock)
+    db.session.commit()
+    ticker_index.load()
+    bars = BarAggregator()
+    bars.add_trades([("AAA", 10.0, 5, MINUTE + 1), ("AAA", 11.0, 7, MINUTE + 2)])
+
+    execute = db.session.execute
+
+    def failing_execute(*args, **kwargs):
+        raise OperationalError("upsert", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(db.session, "execute", failing_execute)
+    # Long after every bucket closed: a failed write must not evict them.
+    assert bars.flush(now=MINUTE + 7 * 86400) == 0
+    assert len(bars) == 4
+
+    monkeypatch.setattr(db.session, "execute", execute)
+    bars.add_trade("AAA", 9.0, 3, MINUTE + 3)
+    assert bars.flush(now=MINUTE + 7 * 86400) == 4
+    assert len(bars) == 0
+
+    rows = PriceBar.query.filter_by(stock_id=stock.id).all()
+    assert {row.interval for row in rows} == {"1m", "5m", "1h", "1d"}
+    for row in rows:
+        assert (row.open, row.high, row.low, row.close) == (Decimal("10.00"), Decimal("11.00"),
+                                                            Decimal("9.00"), Decimal("9.00"))
+        assert row.volume == 15
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.models import db, Stock
+from app.services import price_writer
+from app.services.price_writer import flush_price_updates, ticker_index
+
+
+def test_unchanged_prices_refresh_last_updated_at_most_once_per_interval(database, monkeypatch):
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    stock = Stock(ticker_symbol="FLAT", company_name="Flat", market_price=Decimal("10.00"), last_updated=long_ago)
+    db.session.add(stock)
+    db.session.commit()
+    ticker_index.load()
+
+    def last_updated():
+        db.session.expire_all()
+        return db.session.get(Stock, stock.id).last_updated
+
+    ticked, changed = flush_price_updates({"FLAT": (10.0, datetime.utcnow())})
+
+    assert ticked == {stock.id: Decimal("10.00")}
+    assert changed == {}
+    touched = last_updated()
+    assert touched > long_ago
+
+    # Within the interval, an unchanged price writes nothing.
+    flush_price_updates({"FLAT": (10.0, datetime.utcnow())})
+    assert last_updated() == touched
+
+    monkeypatch.setattr(price_writer, "LAST_UPDATED_REFRESH_SECONDS", 0)
+    flush_price_updates({"FLAT": (10.0, datetime.utcnow())})
+    assert last_updated() > touched
+    assert db.session.get(Stock, stock.id).market_price == Decimal("10.00")
@@ -0,0 +1,82 @@
+import random
+import string
+
+from app.services.stock_search import StockSearchIndex
+
+ROWS = [
+    (1, "APP", "Appian Corp"),
+    (2, "AAPL", "Apple Inc."),
+    (3, "APPF", "AppFolio Inc."),
+    (4, "AMAT", "Applied Materials Inc."),
+    (5, "MSFT", "Microsoft Corp"),
+    (6, "GAPP", "Gap Apparel Co"),
+    (7, "SNAP", "Snap Inc."),
+    (8, "XAPP", "Xylem Applications"),
+]
+
+
+def index(rows=ROWS):
+    built = StockSearchIndex()
+    built.build(rows)
+    return built
+
+
+def test_results_are_ranked_by_match_kind_then_ticker():
+    # APP exact; APPF ticker prefix; AAPL, AMAT name prefix ("app..."); GAPP,
+    # XAPP word prefix ("apparel", "applications"); SNAP has no "app".
+    assert index().search("app") == [1, 3, 2, 4, 6, 8]
+    assert index().search("app", limit=3) == [1, 3, 2]
+
+
+def test_substrings_go_through_the_trigram_index():
+    # "ros" is inside "Microsoft" only; "pli" inside "Applied" and "Applications".
+    assert index().search("ros") == [5]
+    assert index().search("pli") == [4, 8]
+    assert index().search("zzz") == []
+
+
+def reference_search(rows, query, limit):
+    upper, lower = query.upper(), query.lower()
+    ranks = {}
+    for stock_id, ticker, name in rows:
+        ticker, name = ticker.upper(), name.lower()
+        if ticker == upper:
+            rank = 0
+        elif ticker.startswith(upper):
+            rank = 1
+        elif name.startswith(lower):
+            rank = 2
+        elif any(word.startswith(lower) for word in name.split()):
+            rank = 3
+        elif lower in ticker.lower() or lower in name:
+            rank = 4
+        else:
+            continue
+        ranks[stock_id] = (rank, ticker)
+    ordered = sorted(ranks, key=ranks.get)
+    # Substrings under 3 characters come from a scan that stops once it has
+    # enough, in no particular order.
+    ranked = [stock_id for stock_id in ordered if len(lower) >= 3 or ranks[stock_id][0] < 4]
+    return ranked[:limit], {stock_id for stock_id in ordered if ranks[stock_id][0] == 4}, min(limit, len(ordered))
+
+
+def test_bounded_prefix_search_matches_a_full_ranking():
+    rng = random.Random(10)
+    letters = "abcde"
+    tickers = set()
+    while len(tickers) < 600:
+        tickers.add("".join(rng.choice(letters.upper()) for _ in range(rng.randint(1, 4))))
+    rows = [
+        (stock_id, ticker, " ".join("".join(rng.choice(letters) for _ in range(rng.randint(1, 6)))
+                                    for _ in range(rng.randint(1, 3))))
+        for stock_id, ticker in enumerate(sorted(tickers, key=lambda _: rng.random()), start=1)
+    ]
+    built = index(rows)
+    queries = list(letters) + ["".join(pair) for pair in zip(rng.choices(letters, k=20), rng.choices(letters, k=20))]
+    queries += ["".join(rng.choices(letters, k=3)) for _ in range(20)]
+    for query in queries:
+        for limit in (1, 5, 20, 100):
+            ranked, substrings, count = reference_search(rows, query, limit)
+            found = built.search(query, limit)
+            assert found[:len(ranked)] == ranked, (query, limit)
+            assert len(found) == count and set(found[len(ranked):]) <= substrings, (query, limit)
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.models import db, User, Portfolio, Holding, Stock
+from app.services.price_cache import price_cache
+from app.services.valuation import holdings_values
+
+
+def test_aggregate_values_match_the_model_with_live_prices(database):
+    user = User(first_name="Value", last_name="Test", username="value_test",
+                email="value_test@example.com", password="password")
+    cached = Stock(ticker_symbol="AAA", company_name="AAA", market_price=Decimal("10.00"))
+    persisted = Stock(ticker_symbol="BBB", company_name="BBB", market_price=Decimal("20.00"))
+    db.session.add_all([user, cached, persisted])
+    db.session.flush()
+    held = Portfolio(user_id=user.id, name="Held", portfolio_balance=Decimal("100.00"))
+    empty = Portfolio(user_id=user.id, name="Empty", portfolio_balance=Decimal("100.00"))
+    db.session.add_all([held, empty])
+    db.session.flush()
+    db.session.add_all([
+        Holding(portfolio_id=held.id, stock_id=cached.id, quantity=Decimal("1.5")),
+        Holding(portfolio_id=held.id, stock_id=persisted.id, quantity=Decimal("2")),
+    ])
+    db.session.commit()
+    # A live price that has not been written to the stocks table yet.
+    price_cache.update("AAA", Decimal("12.34"), stock_id=cached.id)
+
+    values = holdings_values(user_id=user.id)
+
+    assert values == {held.id: Decimal("58.51"), empty.id: Decimal(0)}
+    assert values[held.id] == held.holdings_value()
+    assert held.to_dict(holdings_value=values[held.id]) == held.to_dict()
+
+
+def test_a_newer_database_price_beats_an_older_cached_one(database):
+    user = User(first_name="Value", last_name="Test", username="value_test",
+                email="value_test@example.com", password="password")
+    stock = Stock(ticker_symbol="AAA", company_name="AAA", market_price=Decimal("10.00"))
+    db.session.add_all([user, stock])
+    db.session.flush()
+    portfolio = Portfolio(user_id=user.id, name="Held", portfolio_balance=Decimal("100.00"))
+    db.session.add(portfolio)
+    db.session.flush()
+    db.session.add(Holding(portfolio_id=portfolio.id, stock_id=stock.id, quantity=Decimal("2")))
+    db.session.commit()
+    # A WS price, then a REST refresh written by another process.
+    price_cache.update("AAA", Decimal("12.34"), stock_id=stock.id, timestamp=datetime.utcnow() - timedelta(seconds=30))
+    stock.market_price = Decimal("11.00")
+    stock.last_updated = datetime.utcnow()
+    db.session.commit()
+
+    values = holdings_values(user_id=user.id)
+
+    assert values == {portfolio.id: Decimal("22.00")}
+    assert portfolio.holdings_value() == values[portfolio.id]
+    assert stock.to_dict()["market_price"] == 11.0